@@ -3,15 +3,27 @@
 """
 import asyncio
 import logging
+import signal
+from typing import List, Optional, Tuple
+from aiohttp import web
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from config import settings
 from database.session import create_tables
+from database.fsm_storage import create_fsm_storage
+from utils.middlewares import UserMiddleware
+from services.report_executor import report_executor
+from services.report_jobs import report_job_queue
+from services.send_queue import send_scheduler
+from services.notifications import status_notifier
+from services.track_index import track_code_index
+from services.sharding import ShardPool, poll_into
 import os
 from handlers.admin.main_menu import admin_main_router
 from handlers.admin.update_status import update_status_router
 from handlers.admin.reports import reports_router
 from handlers.admin.profile import admin_profile_router  # ИСПРАВЛЕНО
+from handlers.admin.search import search_router
 
 # Настройка логирования
 logging.basicConfig(
@@ -20,22 +32,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def main():
-    """Основная функция запуска бота"""
-    logger.info("Запуск бота...")
-    
-    # Создаем таблицы в базе данных
-    try:
-        await create_tables()
-        logger.info("✅ Таблицы базы данных созданы успешно")
-    except Exception as e:
-        logger.error(f"❌ Ошибка при создании таблиц: {e}")
-        return
-    
-    # Инициализация бота и диспетчера
-    bot = Bot(token=settings.BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
-    
+def register_routers(dp: Dispatcher):
+    """Регистрация роутеров обработчиков"""
     # Проверяем, какие файлы админа существуют
     admin_files = []
     handlers_dir = "handlers"
@@ -72,11 +70,15 @@ async def main():
     from handlers.client.other_menus import other_menus_router
     dp.include_router(other_menus_router)
     
+    from handlers.client.calculator import router as calculator_router
+    dp.include_router(calculator_router)
+    
     # 3. Новые админские роутеры
     dp.include_router(admin_main_router)
     dp.include_router(update_status_router)
     dp.include_router(reports_router)
     dp.include_router(admin_profile_router)  # ИСПРАВЛЕНО
+    dp.include_router(search_router)
     
     # 4. Существующие админские файлы - импортируем все найденные
     for admin_file in admin_files:
@@ -106,15 +108,167 @@ async def main():
                               "/stats - статистика")
         
         dp.include_router(admin_router)
+
+def create_bot() -> Bot:
+    """Бот; исходящие сообщения - с лимитами частоты Telegram"""
+    bot = Bot(token=settings.BOT_TOKEN)
+    send_scheduler.install(bot)
+    return bot
+
+def create_dispatcher() -> Dispatcher:
+    """Диспетчер со всеми обработчиками"""
+    dp = Dispatcher(storage=create_fsm_storage())
+    
+    # Пользователь загружается один раз на апдейт (с кэшем)
+    dp.update.outer_middleware(UserMiddleware())
+    
+    # Индекс трек-кодов строится в каждом процессе, обрабатывающем апдейты
+    dp.startup.register(track_code_index.start)
+    dp.shutdown.register(track_code_index.stop)
+    
+    register_routers(dp)
+    return dp
+
+def create_shard_worker(index: int, workers: int) -> Tuple[Bot, Dispatcher]:
+    """Бот и диспетчер процесса-обработчика (BOT_WORKERS > 1)"""
+    # Лимит бота делится между обработчиками и принимающим процессом
+    send_scheduler.set_global_rate(settings.SEND_GLOBAL_RATE / (workers + 1))
+    return create_bot(), create_dispatcher()
+
+def stop_signal() -> asyncio.Event:
+    """Событие, устанавливаемое по SIGINT/SIGTERM"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows
+    return stop_event
+
+async def run_webhook(bot: Bot, dp: Dispatcher, allowed_updates: List[str], pool: Optional[ShardPool] = None):
+    """
+    Прием обновлений через вебхук (встроенный aiohttp-сервер)
+    
+    Несколько процессов бота можно запустить на разных WEBHOOK_PORT за
+    обратным прокси: вебхук у всех один, Telegram проверяет только URL.
+    С pool обновления не обрабатываются здесь, а передаются обработчикам.
+    """
+    async def health(request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+    
+    async def receive(request: web.Request) -> web.Response:
+        if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != settings.WEBHOOK_SECRET:
+            return web.Response(status=401)
+        await pool.dispatch(await request.json())
+        return web.Response()
+    
+    app = web.Application()
+    app.router.add_get("/health", health)
+    if pool is not None:
+        app.router.add_post(settings.WEBHOOK_PATH, receive)
+    else:
+        # Апдейт обрабатывается внутри запроса: при остановке aiohttp дожидается
+        # начатых запросов, и ни один апдейт не теряется (тяжелые отчеты и
+        # рассылки и так выполняются в фоновых очередях)
+        SimpleRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            secret_token=settings.WEBHOOK_SECRET,
+            handle_in_background=False
+        ).register(app, path=settings.WEBHOOK_PATH)
+        setup_application(app, dp, bot=bot)
+    
+    runner = web.AppRunner(app, shutdown_timeout=settings.WEBHOOK_SHUTDOWN_TIMEOUT)
+    await runner.setup()
+    site = web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+    await site.start()
+    
+    await bot.set_webhook(
+        settings.WEBHOOK_BASE_URL.rstrip("/") + settings.WEBHOOK_PATH,
+        secret_token=settings.WEBHOOK_SECRET,
+        allowed_updates=allowed_updates,
+        max_connections=settings.WEBHOOK_MAX_CONNECTIONS
+    )
+    logger.info(f"Бот запущен (вебхук {settings.WEBHOOK_BASE_URL}{settings.WEBHOOK_PATH}). "
+                f"Сервер: {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}")
+    
+    # Остановка по SIGINT/SIGTERM: новые запросы не принимаются,
+    # начатые обработчики завершаются
+    try:
+        await stop_signal().wait()
+    finally:
+        logger.info("Остановка сервера вебхука...")
+        # Вебхук не удаляется: его продолжают обслуживать другие процессы
+        await runner.cleanup()
+
+async def run_sharded(bot: Bot, dp: Dispatcher, allowed_updates: List[str]):
+    """Прием обновлений и передача их BOT_WORKERS процессам-обработчикам"""
+    pool = ShardPool(settings.BOT_WORKERS, create_shard_worker)
+    pool.start()
+    send_scheduler.set_global_rate(settings.SEND_GLOBAL_RATE / (settings.BOT_WORKERS + 1))
+    try:
+        if settings.BOT_MODE == "webhook":
+            await run_webhook(bot, dp, allowed_updates, pool=pool)
+        else:
+            logger.info(f"Бот запущен ({settings.BOT_WORKERS} обработчиков). Ожидание сообщений...")
+            polling = asyncio.create_task(poll_into(bot, pool, allowed_updates))
+            await stop_signal().wait()
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+    finally:
+        # Обработчики доделывают полученные обновления
+        await asyncio.to_thread(pool.stop)
+
+async def main():
+    """Основная функция запуска бота"""
+    logger.info("Запуск бота...")
+    
+    if settings.BOT_MODE == "webhook" and not (settings.WEBHOOK_BASE_URL and settings.WEBHOOK_SECRET):
+        logger.error("❌ Для режима webhook нужны WEBHOOK_BASE_URL и WEBHOOK_SECRET")
+        return
+    if settings.BOT_WORKERS > 1 and settings.FSM_STORAGE.lower() == "memory":
+        logger.error("❌ Для нескольких обработчиков нужно общее хранилище FSM (sqlite или redis)")
+        return
+    
+    # Создаем таблицы в базе данных
+    try:
+        await create_tables()
+        logger.info("✅ Таблицы базы данных созданы успешно")
+    except Exception as e:
+        logger.error(f"❌ Ошибка при создании таблиц: {e}")
+        return
+    
+    # Инициализация бота и диспетчера
+    bot = create_bot()
+    dp = create_dispatcher()
+    
+    allowed_updates = settings.get_allowed_updates() or dp.resolve_used_update_types()
     
-    logger.info("Бот запущен. Ожидание сообщений...")
+    if settings.RUN_BACKGROUND_TASKS:
+        # Фоновая очередь отчетов (досылает результаты, прерванные перезапуском)
+        report_job_queue.start(bot)
+        # Сводки клиентам о смене статуса (продолжает прерванную рассылку)
+        status_notifier.start(bot)
     
     try:
-        await dp.start_polling(bot)
+        if settings.BOT_WORKERS > 1:
+            await run_sharded(bot, dp, allowed_updates)
+        elif settings.BOT_MODE == "webhook":
+            await run_webhook(bot, dp, allowed_updates)
+        else:
+            logger.info("Бот запущен. Ожидание сообщений...")
+            await dp.start_polling(bot, allowed_updates=allowed_updates)
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
     except Exception as e:
         logger.error(f"Ошибка запуска бота: {e}", exc_info=True)
+    finally:
+        await report_job_queue.stop()
+        await status_notifier.stop()
+        await send_scheduler.stop()
+        report_executor.shutdown()
+        await bot.session.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
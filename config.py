@@ -1,5 +1,5 @@
 import os
-from typing import Dict, Set
+from typing import Dict, List, Set
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,6 +12,89 @@ class Settings:
     DB_URL = os.getenv("DB_URL", "sqlite+aiosqlite:///database.db")
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     _ADMIN_IDS_STR = os.getenv("ADMIN_IDS", "")
+
+    # Режим получения обновлений: polling или webhook
+    BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+    WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")  # https://example.com
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # A-Z, a-z, 0-9, _ и -
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    WEBHOOK_SHUTDOWN_TIMEOUT = float(os.getenv("WEBHOOK_SHUTDOWN_TIMEOUT", "30"))  # секунды
+    # Типы обновлений через запятую (пусто - только используемые обработчиками)
+    _ALLOWED_UPDATES_STR = os.getenv("ALLOWED_UPDATES", "")
+    # Процессов-обработчиков обновлений (больше 1 - шардирование по пользователю)
+    BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+    # Фоновые очереди (отчеты, уведомления) - в одном процессе из нескольких
+    RUN_BACKGROUND_TASKS = os.getenv("RUN_BACKGROUND_TASKS", "true").lower() == "true"
+
+    # Пул соединений с базой (для MySQL/PostgreSQL и файловой SQLite)
+    DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # Настройки SQLite, применяемые к каждому соединению
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # мс
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # байт
+
+    # Построение отчетов в отдельных процессах
+    REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+    REPORT_MAX_CONCURRENCY = int(os.getenv("REPORT_MAX_CONCURRENCY", "2"))
+    REPORT_TIMEOUT = int(os.getenv("REPORT_TIMEOUT", "900"))  # секунды, 0 - без ограничения
+
+    # Кэш готовых выгрузок (каталог и максимальный размер в МБ)
+    EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "reports/cache")
+    EXPORT_CACHE_MAX_MB = int(os.getenv("EXPORT_CACHE_MAX_MB", "500"))
+
+    # Лимиты исходящих сообщений Telegram (сообщений в секунду)
+    SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+    SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+    SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3"))  # сообщений подряд в один чат
+    SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))  # повторов после RetryAfter
+
+    # Уведомления клиентов о смене статуса
+    NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "20"))  # сводок одновременно
+    NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "30"))  # секунды
+
+    # Тарифы калькулятора (JSON) и период проверки изменений файла, секунды
+    TARIFFS_FILE = os.getenv("TARIFFS_FILE", "tariffs.json")
+    TARIFFS_RELOAD_INTERVAL = float(os.getenv("TARIFFS_RELOAD_INTERVAL", "30"))
+
+    # Трек-коды: префикс и сколько номеров резервировать за одно обращение к базе
+    TRACK_CODE_PREFIX = os.getenv("TRACK_CODE_PREFIX", "CB")
+    TRACK_CODE_BLOCK_SIZE = int(os.getenv("TRACK_CODE_BLOCK_SIZE", "1000"))
+
+    # Фильтр Блума существующих трек-кодов (проверка без запроса к базе)
+    TRACK_INDEX_ENABLED = os.getenv("TRACK_INDEX_ENABLED", "true").lower() == "true"
+    TRACK_INDEX_CAPACITY = int(os.getenv("TRACK_INDEX_CAPACITY", "100000"))  # начальный расчет, кодов
+    TRACK_INDEX_ERROR_RATE = float(os.getenv("TRACK_INDEX_ERROR_RATE", "0.001"))  # доля ложных срабатываний
+    TRACK_INDEX_REFRESH = float(os.getenv("TRACK_INDEX_REFRESH", "10"))  # дочитка новых товаров, секунды
+    TRACK_INDEX_MAX_STALENESS = float(os.getenv("TRACK_INDEX_MAX_STALENESS", "30"))  # дольше без дочитки - проверка в базе, секунды
+
+    # Максимум строк в загружаемом манифесте склада
+    MANIFEST_MAX_ROWS = int(os.getenv("MANIFEST_MAX_ROWS", "20000"))
+
+    # Кэш пользователей (количество записей и время жизни в секундах)
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+
+    # Хранилище состояний FSM: memory, sqlite или redis
+    FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+    FSM_STORAGE_URL = os.getenv("FSM_STORAGE_URL", "fsm.db")
+    # Время жизни неактивного диалога в секундах (0 - без ограничения)
+    FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", "86400"))
+
+    @classmethod
+    def get_allowed_updates(cls) -> List[str]:
+        """Типы обновлений из ALLOWED_UPDATES"""
+        return [part.strip() for part in cls._ALLOWED_UPDATES_STR.split(",") if part.strip()]
     
     @classmethod
     def get_admin_ids(cls) -> Dict[int, str]:
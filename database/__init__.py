@@ -4,23 +4,43 @@
 from .session import (
     Base,
     engine,
+    create_engine_from_settings,
+    get_pool_stats,
     async_session_maker,
     get_async_session,
     create_tables,
     drop_tables
 )
-from .models import User, Product
-from .repository import UserRepository, ProductRepository
+from .models import User, Product, ProductDailyStat, ReportJob, ReportJobSubscriber, StatusNotification, Counter
+from .repository import (
+    UserRepository,
+    ProductRepository,
+    StatsRepository,
+    ReportJobRepository,
+    NotificationRepository,
+    CounterRepository
+)
 
 __all__ = [
     'Base',
     'engine',
+    'create_engine_from_settings',
+    'get_pool_stats',
     'async_session_maker',
     'get_async_session',
     'create_tables',
     'drop_tables',
     'User',
     'Product',
+    'ProductDailyStat',
+    'ReportJob',
+    'ReportJobSubscriber',
+    'StatusNotification',
+    'Counter',
     'UserRepository',
-    'ProductRepository'
+    'ProductRepository',
+    'StatsRepository',
+    'ReportJobRepository',
+    'NotificationRepository',
+    'CounterRepository'
 ]
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Дневная сводка по товарам (таблица product_daily_stats).
+
+Сводка обновляется триггерами базы данных при добавлении, изменении и
+удалении товаров, поэтому учитываются любые изменения - через ORM,
+массовые UPDATE или напрямую в базе. rebuild_daily_stats пересчитывает
+сводку по таблице products (первичное заполнение или восстановление).
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import text, select, func, delete, insert
+
+from database.models import Product, ProductDailyStat, ProductStatus
+
+logger = logging.getLogger(__name__)
+
+_STAT_COLUMNS = "day, status, product_count, total_value_usd, total_quantity, total_weight_kg, entered_count"
+
+# SQLite: UPSERT внутри триггеров (SQLite >= 3.24)
+_SQLITE_TRIGGERS = {
+    "trg_products_daily_stats_insert": f"""
+        CREATE TRIGGER trg_products_daily_stats_insert AFTER INSERT ON products
+        BEGIN
+            INSERT INTO product_daily_stats ({_STAT_COLUMNS})
+            VALUES (
+                date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP)), NEW.status, 1,
+                COALESCE(NEW.total_value_usd, 0), COALESCE(NEW.quantity, 0), COALESCE(NEW.weight_kg, 0), 1
+            )
+            ON CONFLICT(day, status) DO UPDATE SET
+                product_count = product_count + 1,
+                total_value_usd = total_value_usd + excluded.total_value_usd,
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_weight_kg = total_weight_kg + excluded.total_weight_kg,
+                entered_count = entered_count + 1;
+        END
+    """,
+    "trg_products_daily_stats_update": f"""
+        CREATE TRIGGER trg_products_daily_stats_update
+        AFTER UPDATE OF status, created_at, total_value_usd, quantity, weight_kg ON products
+        BEGIN
+            UPDATE product_daily_stats SET
+                product_count = product_count - 1,
+                total_value_usd = total_value_usd - COALESCE(OLD.total_value_usd, 0),
+                total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+                total_weight_kg = total_weight_kg - COALESCE(OLD.weight_kg, 0)
+            WHERE day = date(COALESCE(OLD.created_at, CURRENT_TIMESTAMP)) AND status = OLD.status;
+
+            INSERT INTO product_daily_stats ({_STAT_COLUMNS})
+            VALUES (
+                date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP)), NEW.status, 1,
+                COALESCE(NEW.total_value_usd, 0), COALESCE(NEW.quantity, 0), COALESCE(NEW.weight_kg, 0), 0
+            )
+            ON CONFLICT(day, status) DO UPDATE SET
+                product_count = product_count + 1,
+                total_value_usd = total_value_usd + excluded.total_value_usd,
+                total_quantity = total_quantity + excluded.total_quantity,
+                total_weight_kg = total_weight_kg + excluded.total_weight_kg;
+
+            INSERT INTO product_daily_stats ({_STAT_COLUMNS})
+            SELECT date('now'), NEW.status, 0, 0, 0, 0, 1
+            WHERE NEW.status IS NOT OLD.status
+            ON CONFLICT(day, status) DO UPDATE SET entered_count = entered_count + 1;
+        END
+    """,
+    "trg_products_daily_stats_delete": """
+        CREATE TRIGGER trg_products_daily_stats_delete AFTER DELETE ON products
+        BEGIN
+            UPDATE product_daily_stats SET
+                product_count = product_count - 1,
+                total_value_usd = total_value_usd - COALESCE(OLD.total_value_usd, 0),
+                total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+                total_weight_kg = total_weight_kg - COALESCE(OLD.weight_kg, 0)
+            WHERE day = date(COALESCE(OLD.created_at, CURRENT_TIMESTAMP)) AND status = OLD.status;
+        END
+    """,
+}
+
+# MySQL: INSERT ... ON DUPLICATE KEY UPDATE
+_MYSQL_TRIGGERS = {
+    "trg_products_daily_stats_insert": f"""
+        CREATE TRIGGER trg_products_daily_stats_insert AFTER INSERT ON products FOR EACH ROW
+            INSERT INTO product_daily_stats ({_STAT_COLUMNS})
+            VALUES (
+                DATE(COALESCE(NEW.created_at, UTC_TIMESTAMP())), NEW.status, 1,
+                COALESCE(NEW.total_value_usd, 0), COALESCE(NEW.quantity, 0), COALESCE(NEW.weight_kg, 0), 1
+            )
+            ON DUPLICATE KEY UPDATE
+                product_count = product_count + 1,
+                total_value_usd = total_value_usd + VALUES(total_value_usd),
+                total_quantity = total_quantity + VALUES(total_quantity),
+                total_weight_kg = total_weight_kg + VALUES(total_weight_kg),
+                entered_count = entered_count + 1
+    """,
+    "trg_products_daily_stats_update": f"""
+        CREATE TRIGGER trg_products_daily_stats_update AFTER UPDATE ON products FOR EACH ROW
+        BEGIN
+            UPDATE product_daily_stats SET
+                product_count = product_count - 1,
+                total_value_usd = total_value_usd - COALESCE(OLD.total_value_usd, 0),
+                total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+                total_weight_kg = total_weight_kg - COALESCE(OLD.weight_kg, 0)
+            WHERE day = DATE(COALESCE(OLD.created_at, UTC_TIMESTAMP())) AND status = OLD.status;
+
+            INSERT INTO product_daily_stats ({_STAT_COLUMNS})
+            VALUES (
+                DATE(COALESCE(NEW.created_at, UTC_TIMESTAMP())), NEW.status, 1,
+                COALESCE(NEW.total_value_usd, 0), COALESCE(NEW.quantity, 0), COALESCE(NEW.weight_kg, 0), 0
+            )
+            ON DUPLICATE KEY UPDATE
+                product_count = product_count + 1,
+                total_value_usd = total_value_usd + VALUES(total_value_usd),
+                total_quantity = total_quantity + VALUES(total_quantity),
+                total_weight_kg = total_weight_kg + VALUES(total_weight_kg);
+
+            IF NOT (NEW.status <=> OLD.status) THEN
+                INSERT INTO product_daily_stats ({_STAT_COLUMNS})
+                VALUES (UTC_DATE(), NEW.status, 0, 0, 0, 0, 1)
+                ON DUPLICATE KEY UPDATE entered_count = entered_count + 1;
+            END IF;
+        END
+    """,
+    "trg_products_daily_stats_delete": """
+        CREATE TRIGGER trg_products_daily_stats_delete AFTER DELETE ON products FOR EACH ROW
+            UPDATE product_daily_stats SET
+                product_count = product_count - 1,
+                total_value_usd = total_value_usd - COALESCE(OLD.total_value_usd, 0),
+                total_quantity = total_quantity - COALESCE(OLD.quantity, 0),
+                total_weight_kg = total_weight_kg - COALESCE(OLD.weight_kg, 0)
+            WHERE day = DATE(COALESCE(OLD.created_at, UTC_TIMESTAMP())) AND status = OLD.status
+    """,
+}
+
+
+def install_triggers(conn) -> None:
+    """Создание (пересоздание) триггеров сводки"""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        triggers = _SQLITE_TRIGGERS
+    elif dialect == "mysql":
+        triggers = _MYSQL_TRIGGERS
+    else:
+        raise RuntimeError(f"Триггеры сводки не поддерживаются для {dialect}")
+
+    for name, ddl in triggers.items():
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(text(ddl))
+
+
+def _as_date(value) -> date:
+    """date() в SQLite возвращает строку, в MySQL - дату"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def rebuild_daily_stats(conn) -> int:
+    """
+    Полный пересчет сводки по таблице products.
+
+    Количество переходов в статус восстанавливается приближенно: для
+    текущего статуса - по updated_at, для склада в Таджикистане - по
+    arrival_date (полной истории статусов в базе нет).
+
+    Returns:
+        int: количество строк сводки
+    """
+    rows = defaultdict(lambda: {
+        "product_count": 0, "total_value_usd": 0.0, "total_quantity": 0,
+        "total_weight_kg": 0.0, "entered_count": 0
+    })
+
+    created_day = func.date(Product.created_at)
+    cohort = conn.execute(
+        select(
+            created_day,
+            Product.status,
+            func.count(Product.id),
+            func.coalesce(func.sum(Product.total_value_usd), 0),
+            func.coalesce(func.sum(Product.quantity), 0),
+            func.coalesce(func.sum(Product.weight_kg), 0)
+        )
+        .where(Product.created_at.isnot(None), Product.status.isnot(None))
+        .group_by(created_day, Product.status)
+    )
+    for day, status, count, value, quantity, weight in cohort:
+        row = rows[(_as_date(day), status)]
+        row.update(product_count=count, total_value_usd=value,
+                   total_quantity=quantity, total_weight_kg=weight)
+
+    entered_day = func.date(func.coalesce(Product.updated_at, Product.created_at))
+    entered = conn.execute(
+        select(entered_day, Product.status, func.count(Product.id))
+        .where(Product.status.isnot(None), Product.status != ProductStatus.TAJIKISTAN_WAREHOUSE)
+        .group_by(entered_day, Product.status)
+    )
+    for day, status, count in entered:
+        if day is not None:
+            rows[(_as_date(day), status)]["entered_count"] += count
+
+    arrival_day = func.date(Product.arrival_date)
+    arrived = conn.execute(
+        select(arrival_day, func.count(Product.id))
+        .where(Product.arrival_date.isnot(None))
+        .group_by(arrival_day)
+    )
+    for day, count in arrived:
+        rows[(_as_date(day), ProductStatus.TAJIKISTAN_WAREHOUSE)]["entered_count"] += count
+
+    conn.execute(delete(ProductDailyStat))
+    if rows:
+        conn.execute(
+            insert(ProductDailyStat),
+            [{"day": day, "status": status, **values} for (day, status), values in rows.items()]
+        )
+    logger.info(f"Сводка product_daily_stats пересчитана: {len(rows)} строк")
+    return len(rows)
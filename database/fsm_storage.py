@@ -0,0 +1,220 @@
+"""
+Хранилище состояний FSM.
+
+SQLiteStorage хранит состояние и данные диалога в отдельной SQLite-базе
+(режим WAL), поэтому переживает перезапуск и может использоваться
+несколькими процессами бота одновременно. Неактивные диалоги удаляются
+по истечении FSM_STATE_TTL.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+
+import aiosqlite
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StateDataEncoder(json.JSONEncoder):
+    """JSON-кодировщик для данных FSM (Enum и даты сохраняются с тегом)"""
+
+    def default(self, obj):
+        if isinstance(obj, Enum):
+            return {"__enum__": f"{type(obj).__module__}:{type(obj).__name__}", "name": obj.name}
+        if isinstance(obj, datetime):
+            return {"__datetime__": obj.isoformat()}
+        if isinstance(obj, date):
+            return {"__date__": obj.isoformat()}
+        raise TypeError(
+            f"Объект типа {type(obj).__name__} нельзя сохранить в состоянии FSM. "
+            f"Сохраняйте идентификаторы, а не объекты"
+        )
+
+
+def _decode_hook(obj: Dict[str, Any]) -> Any:
+    """Восстановление значений, закодированных StateDataEncoder"""
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    if "__enum__" in obj:
+        import importlib
+        module_name, class_name = obj["__enum__"].split(":", 1)
+        enum_class = getattr(importlib.import_module(module_name), class_name)
+        return enum_class[obj["name"]]
+    return obj
+
+
+def dump_state_data(data: Dict[str, Any]) -> str:
+    """Сериализация данных FSM в компактный JSON"""
+    return json.dumps(data, cls=StateDataEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_state_data(raw: Optional[str]) -> Dict[str, Any]:
+    """Десериализация данных FSM"""
+    if not raw:
+        return {}
+    return json.loads(raw, object_hook=_decode_hook)
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище FSM на SQLite с истечением неактивных диалогов"""
+
+    # Как часто удалять устаревшие записи (секунды)
+    PURGE_INTERVAL = 600
+
+    def __init__(self, path: str = "fsm.db", state_ttl: Optional[int] = None):
+        self.path = path
+        self.state_ttl = state_ttl
+        self._connection: Optional[aiosqlite.Connection] = None
+        self._lock = asyncio.Lock()
+        self._last_purge = 0.0
+
+    @staticmethod
+    def _build_key(key: StorageKey) -> str:
+        """Строковый ключ записи"""
+        parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+        thread_id = getattr(key, "thread_id", None)
+        if thread_id:
+            parts.append(str(thread_id))
+        business_connection_id = getattr(key, "business_connection_id", None)
+        if business_connection_id:
+            parts.append(str(business_connection_id))
+        parts.append(key.destiny)
+        return ":".join(parts)
+
+    async def _get_connection(self) -> aiosqlite.Connection:
+        """Ленивое открытие соединения и создание таблицы"""
+        if self._connection is None:
+            connection = await aiosqlite.connect(self.path)
+            await connection.execute("PRAGMA journal_mode=WAL")
+            await connection.execute("PRAGMA synchronous=NORMAL")
+            await connection.execute("PRAGMA busy_timeout=5000")
+            await connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fsm_storage (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            await connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_fsm_storage_updated_at ON fsm_storage (updated_at)"
+            )
+            await connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _is_expired(self, updated_at: float) -> bool:
+        return bool(self.state_ttl) and updated_at < time.time() - self.state_ttl
+
+    async def _purge_expired(self, connection: aiosqlite.Connection) -> None:
+        """Удаление диалогов, неактивных дольше state_ttl"""
+        now = time.time()
+        if not self.state_ttl or now - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        cursor = await connection.execute(
+            "DELETE FROM fsm_storage WHERE updated_at < ?", (now - self.state_ttl,)
+        )
+        if cursor.rowcount:
+            logger.info(f"Удалено устаревших состояний FSM: {cursor.rowcount}")
+
+    async def _read(self, key: StorageKey) -> Optional[tuple]:
+        async with self._lock:
+            connection = await self._get_connection()
+            cursor = await connection.execute(
+                "SELECT state, data, updated_at FROM fsm_storage WHERE key = ?",
+                (self._build_key(key),)
+            )
+            row = await cursor.fetchone()
+        if row is None or self._is_expired(row[2]):
+            return None
+        return row
+
+    async def _write(self, key: StorageKey, column: str, value: Optional[str]) -> None:
+        async with self._lock:
+            connection = await self._get_connection()
+            now = time.time()
+            # Значения с истекшим сроком не должны "оживать" при частичной записи
+            other = "data" if column == "state" else "state"
+            threshold = now - self.state_ttl if self.state_ttl else 0
+            await connection.execute(
+                f"""
+                INSERT INTO fsm_storage (key, {column}, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    {column} = excluded.{column},
+                    {other} = CASE WHEN fsm_storage.updated_at < ? THEN NULL ELSE fsm_storage.{other} END,
+                    updated_at = excluded.updated_at
+                """,
+                (self._build_key(key), value, now, threshold)
+            )
+            # Пустые записи не храним
+            await connection.execute(
+                "DELETE FROM fsm_storage WHERE key = ? AND state IS NULL AND data IS NULL",
+                (self._build_key(key),)
+            )
+            await self._purge_expired(connection)
+            await connection.commit()
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        if isinstance(state, State):
+            state = state.state
+        await self._write(key, "state", state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        row = await self._read(key)
+        return row[0] if row else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._write(key, "data", dump_state_data(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        row = await self._read(key)
+        return load_state_data(row[1]) if row else {}
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+def create_fsm_storage() -> BaseStorage:
+    """
+    Создание хранилища FSM по настройкам FSM_STORAGE:
+        memory - в памяти процесса (как раньше)
+        sqlite - SQLiteStorage, путь из FSM_STORAGE_URL
+        redis  - RedisStorage aiogram, адрес из FSM_STORAGE_URL
+    """
+    backend = settings.FSM_STORAGE.lower()
+    ttl = settings.FSM_STATE_TTL or None
+
+    if backend == "memory":
+        return MemoryStorage()
+
+    if backend == "redis":
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(
+            settings.FSM_STORAGE_URL or "redis://localhost:6379/0",
+            state_ttl=ttl,
+            data_ttl=ttl,
+            # Enum и даты в данных состояния (стандартный json.dumps их не сериализует)
+            json_dumps=dump_state_data,
+            json_loads=load_state_data
+        )
+
+    if backend == "sqlite":
+        return SQLiteStorage(settings.FSM_STORAGE_URL or "fsm.db", state_ttl=ttl)
+
+    raise ValueError(f"Неизвестное хранилище FSM: {settings.FSM_STORAGE}")
@@ -0,0 +1,255 @@
+"""
+Версионные миграции схемы базы данных.
+
+Новые таблицы создаются через Base.metadata.create_all, а изменения
+существующей схемы (индексы, триггеры и т.д.) описываются здесь как
+пронумерованные миграции. Номер последней примененной миграции хранится
+в таблице schema_version.
+
+Использование:
+    python -m database.migrations upgrade   - применить новые миграции
+    python -m database.migrations status    - показать текущую версию
+    python -m database.migrations explain   - проверить планы запросов
+    python -m database.migrations backfill-stats - пересчитать дневную сводку
+    python -m database.migrations rebuild-search - перестроить поисковый индекс
+"""
+import asyncio
+import logging
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, Index, MetaData, Table, text, select, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from database.session import engine
+from database.models import Product, User, ProductStatus, ProductDailyStat
+from database.daily_stats import install_triggers, rebuild_daily_stats
+from database.search import install_search_index, rebuild_search_index, prefix_upper_bound
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    """Описание миграции"""
+    version: int
+    name: str
+    upgrade: Callable  # функция (sync_connection) -> None
+
+
+def _create_indexes(conn, table_name: str, *indexes: Tuple[str, ...]) -> None:
+    """
+    Создание индексов (имя, столбцы...), которых еще нет в базе
+
+    Индексы перечисляются в миграции явно, а не берутся из текущей модели:
+    каждая версия схемы создает один и тот же набор индексов.
+    """
+    columns = sorted({column for _, *names in indexes for column in names})
+    table = Table(table_name, MetaData(), *(Column(column) for column in columns))
+    for name, *names in indexes:
+        Index(name, *(table.c[column] for column in names)).create(bind=conn, checkfirst=True)
+
+
+def _migration_001_hot_indexes(conn) -> None:
+    """Составные индексы для основных запросов по товарам"""
+    _create_indexes(
+        conn, "products",
+        ("ix_products_user_created", "user_id", "created_at", "id"),
+        ("ix_products_user_updated", "user_id", "updated_at"),
+        ("ix_products_status_created", "status", "created_at"),
+        ("ix_products_status_updated", "status", "updated_at"),
+        ("ix_products_status_arrival", "status", "arrival_date"),
+        ("ix_products_created_at", "created_at"),
+        ("ix_products_send_date", "send_date"),
+    )
+
+
+def _migration_002_daily_stats(conn) -> None:
+    """Дневная сводка для отчетов: таблица, триггеры и первичное заполнение"""
+    ProductDailyStat.__table__.create(bind=conn, checkfirst=True)
+    install_triggers(conn)
+    rebuild_daily_stats(conn)
+
+
+def _migration_003_search_index(conn) -> None:
+    """Полнотекстовый индекс товаров и его первичное заполнение"""
+    install_search_index(conn)
+    rebuild_search_index(conn)
+
+
+def _migration_004_updated_at_index(conn) -> None:
+    """Индекс updated_at для водяного знака кэша выгрузок"""
+    _create_indexes(conn, "products", ("ix_products_updated_at", "updated_at"))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "products hot column indexes", _migration_001_hot_indexes),
+    Migration(2, "product daily stats rollup", _migration_002_daily_stats),
+    Migration(3, "products full-text search index", _migration_003_search_index),
+    Migration(4, "products updated_at index", _migration_004_updated_at_index),
+]
+
+
+def _ensure_version_table(conn) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR(200) NOT NULL, "
+        "applied_at DATETIME NOT NULL)"
+    ))
+
+
+def _get_version(conn) -> int:
+    _ensure_version_table(conn)
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def _upgrade(conn) -> List[int]:
+    """Применение всех миграций новее текущей версии"""
+    current = _get_version(conn)
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version <= current:
+            continue
+        logger.info(f"Применение миграции {migration.version}: {migration.name}")
+        migration.upgrade(conn)
+        conn.execute(
+            text("INSERT INTO schema_version (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+            {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()}
+        )
+        applied.append(migration.version)
+    return applied
+
+
+async def upgrade() -> List[int]:
+    """Применить новые миграции (каждая - в одной транзакции с записью версии)"""
+    async with engine.begin() as conn:
+        return await conn.run_sync(_upgrade)
+
+
+async def backfill_daily_stats() -> int:
+    """Пересчитать дневную сводку (в одной транзакции)"""
+    async with engine.begin() as conn:
+        return await conn.run_sync(rebuild_daily_stats)
+
+
+async def rebuild_search() -> None:
+    """Перестроить полнотекстовый индекс"""
+    async with engine.begin() as conn:
+        await conn.run_sync(rebuild_search_index)
+
+
+async def current_version() -> int:
+    """Текущая версия схемы"""
+    async with engine.begin() as conn:
+        return await conn.run_sync(_get_version)
+
+
+# ========== ПРОВЕРКА ПЛАНОВ ЗАПРОСОВ ==========
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN для произвольного запроса SQLAlchemy"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = "EXPLAIN QUERY PLAN " if compiler.dialect.name == "sqlite" else "EXPLAIN "
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def get_checked_queries() -> List[Tuple[str, object]]:
+    """Запросы репозитория, планы которых проверяются"""
+    now = datetime.utcnow()
+    month_ago = now - timedelta(days=30)
+    return [
+        ("get_user_products", select(Product).where(Product.user_id == 1)
+            .order_by(Product.created_at.desc()).limit(5)),
+        ("get_user_products_page", select(Product)
+            .where(Product.user_id == 1, Product.created_at < now)
+            .order_by(Product.created_at.desc(), Product.id.desc()).limit(6)),
+        ("get_product_by_track_code", select(Product).where(Product.track_code == "X")),
+        ("search_track_code_prefix", select(Product.id)
+            .where(Product.track_code >= "YT12", Product.track_code < prefix_upper_bound("YT12"))
+            .order_by(Product.track_code).limit(20)),
+        ("get_products_by_status", select(Product).where(Product.status == ProductStatus.IN_TRANSIT).limit(50)),
+        ("get_products_by_date_range", select(Product)
+            .where(Product.created_at >= month_ago, Product.created_at < now)
+            .order_by(Product.created_at.desc())),
+        ("products_by_send_date", select(Product.id)
+            .where(Product.send_date >= month_ago, Product.send_date < now)),
+        ("delivered_by_updated_at", select(Product.id)
+            .where(Product.status == ProductStatus.DELIVERED,
+                   Product.updated_at >= month_ago, Product.updated_at < now)),
+        ("arrived_by_arrival_date", select(Product.id)
+            .where(Product.status == ProductStatus.TAJIKISTAN_WAREHOUSE,
+                   Product.arrival_date >= month_ago, Product.arrival_date < now)),
+        ("export_watermark", select(func.max(Product.updated_at))),
+        ("get_user_by_telegram_id", select(User).where(User.telegram_id == 1)),
+    ]
+
+
+def _is_full_scan(dialect: str, row) -> bool:
+    """Признак полного просмотра таблицы в строке плана"""
+    if dialect == "sqlite":
+        detail = str(row._mapping.get("detail", ""))
+        return detail.startswith("SCAN ") and "USING" not in detail
+    if dialect == "mysql":
+        return str(row._mapping.get("type", "")).upper() == "ALL"
+    return False
+
+
+async def explain_queries() -> List[Tuple[str, bool, List[str]]]:
+    """
+    Выполнить EXPLAIN для проверяемых запросов
+
+    Returns:
+        list: (имя запроса, есть ли полный просмотр, строки плана)
+    """
+    results = []
+    async with engine.connect() as conn:
+        dialect = conn.dialect.name
+        for name, statement in get_checked_queries():
+            rows = (await conn.execute(Explain(statement))).fetchall()
+            plan = [" | ".join(str(value) for value in row) for row in rows]
+            full_scan = any(_is_full_scan(dialect, row) for row in rows)
+            results.append((name, full_scan, plan))
+    return results
+
+
+async def _main(command: str) -> int:
+    if command == "upgrade":
+        applied = await upgrade()
+        print(f"Применено миграций: {len(applied)}; версия схемы: {await current_version()}")
+    elif command == "status":
+        latest = max(m.version for m in MIGRATIONS)
+        print(f"Версия схемы: {await current_version()} (последняя: {latest})")
+    elif command == "backfill-stats":
+        rows = await backfill_daily_stats()
+        print(f"Сводка пересчитана: {rows} строк")
+    elif command == "rebuild-search":
+        await rebuild_search()
+        print("Поисковый индекс перестроен")
+    elif command == "explain":
+        full_scans = 0
+        for name, full_scan, plan in await explain_queries():
+            mark = "⚠️ FULL SCAN" if full_scan else "✅"
+            print(f"{mark} {name}")
+            for line in plan:
+                print(f"    {line}")
+            full_scans += full_scan
+        return 1 if full_scans else 0
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else "")))
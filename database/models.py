@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, Float, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Date, ForeignKey, Enum, Float, Text, Index
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 import enum
@@ -52,6 +52,20 @@ class User(Base):
     Base = declarative_base()
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Список товаров клиента (сортировка по дате создания)
+        Index("ix_products_user_created", "user_id", "created_at", "id"),
+        Index("ix_products_user_updated", "user_id", "updated_at"),
+        # Выборки по статусу и отчеты за период
+        Index("ix_products_status_created", "status", "created_at"),
+        Index("ix_products_status_updated", "status", "updated_at"),
+        Index("ix_products_status_arrival", "status", "arrival_date"),
+        Index("ix_products_created_at", "created_at"),
+        # Водяной знак данных для кэша выгрузок (MAX(updated_at))
+        Index("ix_products_updated_at", "updated_at"),
+        # Массовое обновление по дате отправки
+        Index("ix_products_send_date", "send_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     track_code = Column(String(50), unique=True, index=True, nullable=False)
@@ -89,4 +103,114 @@ class Product(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    user = relationship("User", back_populates="products")
\ No newline at end of file
+    user = relationship("User", back_populates="products")
+
+class ProductDailyStat(Base):
+    """
+    Дневная сводка по товарам для отчетов.
+    
+    Строка (day, status):
+      product_count, total_* - товары, созданные в этот день и сейчас
+                               находящиеся в этом статусе;
+      entered_count          - сколько товаров перешло в этот статус в этот день.
+    Поддерживается триггерами базы данных (см. database/daily_stats.py).
+    """
+    __tablename__ = "product_daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    status = Column(Enum(ProductStatus), primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0)
+    total_value_usd = Column(Float, nullable=False, default=0.0)
+    total_quantity = Column(Integer, nullable=False, default=0)
+    total_weight_kg = Column(Float, nullable=False, default=0.0)
+    entered_count = Column(Integer, nullable=False, default=0)
+
+class ReportJobStatus(enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class ReportJob(Base):
+    """
+    Фоновое построение отчета (очередь services/report_jobs.py).
+    
+    Одинаковые запросы (kind + params), поступившие пока отчет в очереди
+    или строится, объединяются в одно задание с несколькими получателями.
+    """
+    __tablename__ = "report_jobs"
+    __table_args__ = (
+        Index("ix_report_jobs_status_created", "status", "created_at"),
+        Index("ix_report_jobs_dedupe_status", "dedupe_key", "status"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    params = Column(Text)  # JSON
+    dedupe_key = Column(String(200), nullable=False)
+    status = Column(Enum(ReportJobStatus), nullable=False, default=ReportJobStatus.PENDING)
+    
+    # Прогресс (строк обработано / всего)
+    progress = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)
+    
+    # Результат
+    result_path = Column(String(500))
+    result_filename = Column(String(200))
+    result_caption = Column(Text)  # JSON {язык: подпись}
+    file_id = Column(String(200))  # file_id Telegram после первой отправки
+    error = Column(Text)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    subscribers = relationship("ReportJobSubscriber", back_populates="job", cascade="all, delete-orphan")
+
+class ReportJobSubscriber(Base):
+    """Получатель отчета: чат и сообщение с прогрессом"""
+    __tablename__ = "report_job_subscribers"
+    
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("report_jobs.id"), nullable=False, index=True)
+    chat_id = Column(BigInteger, nullable=False)
+    message_id = Column(Integer)  # сообщение, в котором показывается прогресс
+    language = Column(String(10), default="ru")
+    delivered = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    job = relationship("ReportJob", back_populates="subscribers")
+
+class StatusNotification(Base):
+    """
+    Уведомление владельца о смене статуса товара (outbox).
+    
+    Строка добавляется в той же транзакции, что и обновление статуса;
+    services/notifications.py собирает неотправленные строки в сводку
+    для каждого пользователя и отмечает их отправленными.
+    """
+    __tablename__ = "status_notifications"
+    __table_args__ = (
+        Index("ix_status_notifications_pending", "sent_at", "user_id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    track_code = Column(String(50), nullable=False)
+    status = Column(Enum(ProductStatus), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+
+class Counter(Base):
+    """
+    Именованный счетчик последовательности.
+    
+    services/track_code.py резервирует блоки номеров для трек-кодов:
+    одно атомарное увеличение value выделяет процессу целый блок.
+    """
+    __tablename__ = "counters"
+    
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
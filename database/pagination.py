@@ -0,0 +1,43 @@
+"""
+Курсорная (keyset) пагинация.
+
+Курсор - непрозрачная строка с позицией (created_at, id) строки, от
+которой начинается следующая или предыдущая страница. Курсор помещается
+в callback_data (до 64 байт), поэтому кодируется компактно: 8 байт
+времени в микросекундах и 4 байта id в base64url (16 символов).
+"""
+import base64
+import binascii
+import struct
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Tuple
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_FORMAT = ">qI"
+
+
+@dataclass
+class Page:
+    """Страница результатов"""
+    items: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None  # курсор следующей страницы (None - последняя)
+    prev_cursor: Optional[str] = None  # курсор предыдущей страницы (None - первая)
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Кодирование позиции (created_at, id) в курсор"""
+    micros = (created_at - _EPOCH) // _MICROSECOND
+    raw = struct.pack(_FORMAT, micros, row_id)
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """Декодирование курсора (None, если курсор поврежден)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        micros, row_id = struct.unpack(_FORMAT, raw)
+    except (binascii.Error, struct.error, ValueError):
+        return None
+    return _EPOCH + micros * _MICROSECOND, row_id
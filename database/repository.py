@@ -1,13 +1,39 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete, or_
+from sqlalchemy import update, delete, insert, literal, or_, and_, text, DateTime
 from sqlalchemy.sql import func
-from typing import List, Optional, Tuple, Dict
-from datetime import datetime, timedelta
-import pandas as pd
-import os
+from sqlalchemy.exc import IntegrityError
+from typing import AsyncIterator, List, Optional, Set, Tuple, Dict
+from dataclasses import dataclass, field
+import json
+from datetime import date, datetime, timedelta
 from sqlalchemy import select
-from .models import User, UserRole, Product, ProductStatus, ProductCategory
+from .models import (
+    User, UserRole, Product, ProductStatus, ProductCategory, ProductDailyStat,
+    ReportJob, ReportJobStatus, ReportJobSubscriber, StatusNotification, Counter
+)
+from .pagination import Page, encode_cursor, decode_cursor
+from .search import query_words, build_match_query, ranked_ids_sql, prefix_upper_bound
+from utils.cache import user_cache
+from utils.helpers import month_range, split_list
+
+# Размер порции для массовых операций (ограничение числа параметров SQL)
+BULK_CHUNK_SIZE = 500
+
+# Максимум результатов поиска по умолчанию
+SEARCH_LIMIT = 20
+# Минимальная длина части трек-кода для поиска подстроки
+MIN_TRACK_SUBSTRING = 4
+
+@dataclass
+class BulkUpdateResult:
+    """Результат массового обновления статусов"""
+    updated_codes: List[str] = field(default_factory=list)
+    missing_codes: List[str] = field(default_factory=list)
+    
+    @property
+    def updated_count(self) -> int:
+        return len(self.updated_codes)
 
 class UserRepository:
     def __init__(self, session: AsyncSession):
@@ -19,6 +45,40 @@ class UserRepository:
         )
         return result.scalar_one_or_none()
     
+    async def get_cached_user(self, telegram_id: int) -> Optional[User]:
+        """Получение пользователя через кэш (отсутствующие не кэшируются)"""
+        user = user_cache.get(telegram_id)
+        if user is None:
+            user = await self.get_user_by_telegram_id(telegram_id)
+            if user is not None:
+                user_cache.set(telegram_id, user)
+        return user
+    
+    async def get_users_by_telegram_ids(self, telegram_ids: List[int]) -> Dict[int, User]:
+        """Пользователи по списку telegram_id (порциями)"""
+        users = {}
+        for chunk in split_list(list(set(telegram_ids)), BULK_CHUNK_SIZE):
+            result = await self.session.execute(select(User).where(User.telegram_id.in_(chunk)))
+            for user in result.scalars().all():
+                users[user.telegram_id] = user
+        return users
+    
+    async def get_users_by_phones(self, phones: List[str]) -> Dict[str, User]:
+        """
+        Пользователи по номерам телефонов
+        
+        Номер из контакта Telegram хранится как есть (с «+» или без),
+        поэтому ищутся оба варианта; ключ результата - только цифры.
+        """
+        digits = list(set(phones))
+        users = {}
+        for chunk in split_list(digits, BULK_CHUNK_SIZE // 2):
+            variants = chunk + ["+" + phone for phone in chunk]
+            result = await self.session.execute(select(User).where(User.phone.in_(variants)))
+            for user in result.scalars().all():
+                users[user.phone.lstrip("+")] = user
+        return users
+    
     async def create_user(self, telegram_id: int, phone: str = None, 
                         full_name: str = None, language: str = "ru",
                         role: str = "client") -> User:
@@ -38,12 +98,14 @@ class UserRepository:
         self.session.add(user)
         await self.session.commit()
         await self.session.refresh(user)
+        user_cache.invalidate(telegram_id)
         return user
     
     async def update_user_language(self, telegram_id: int, language: str) -> Optional[User]:
         stmt = update(User).where(User.telegram_id == telegram_id).values(language=language)
         await self.session.execute(stmt)
         await self.session.commit()
+        user_cache.invalidate(telegram_id)
         return await self.get_user_by_telegram_id(telegram_id)
     
     async def update_user_profile(self, telegram_id: int, **kwargs) -> Optional[User]:
@@ -56,6 +118,7 @@ class UserRepository:
             stmt = update(User).where(User.telegram_id == telegram_id).values(**update_data)
             await self.session.execute(stmt)
             await self.session.commit()
+            user_cache.invalidate(telegram_id)
         
         return await self.get_user_by_telegram_id(telegram_id)
 
@@ -74,12 +137,93 @@ class ProductRepository:
         )
         return result.scalars().all()
     
+    async def get_user_products_page(
+        self,
+        user_id: int,
+        page_size: int = 5,
+        after: Optional[str] = None,
+        before: Optional[str] = None
+    ) -> Page:
+        """
+        Страница товаров пользователя (новые сначала) с курсорной пагинацией
+        по (created_at, id): запрос по индексу без OFFSET
+        
+        Args:
+            user_id: ID пользователя
+            page_size: Размер страницы
+            after: Курсор - страница после этой позиции (следующая)
+            before: Курсор - страница перед этой позицией (предыдущая)
+            
+        Returns:
+            Page: товары и курсоры соседних страниц
+        """
+        backward = before is not None
+        position = decode_cursor(before if backward else after) if (before or after) else None
+        
+        query = select(Product).where(Product.user_id == user_id)
+        if position:
+            created_at, product_id = position
+            if backward:
+                query = query.where(or_(
+                    Product.created_at > created_at,
+                    and_(Product.created_at == created_at, Product.id > product_id)
+                )).order_by(Product.created_at.asc(), Product.id.asc())
+            else:
+                query = query.where(or_(
+                    Product.created_at < created_at,
+                    and_(Product.created_at == created_at, Product.id < product_id)
+                ))
+        if not (position and backward):
+            query = query.order_by(Product.created_at.desc(), Product.id.desc())
+        
+        # Одна лишняя строка показывает, есть ли еще страница в этом направлении
+        result = await self.session.execute(query.limit(page_size + 1))
+        products = list(result.scalars().all())
+        has_more = len(products) > page_size
+        products = products[:page_size]
+        
+        if position and backward:
+            products.reverse()
+            has_prev, has_next = has_more, True
+        else:
+            has_prev, has_next = position is not None, has_more
+        
+        if not products:
+            return Page()
+        return Page(
+            items=products,
+            next_cursor=encode_cursor(products[-1].created_at, products[-1].id) if has_next else None,
+            prev_cursor=encode_cursor(products[0].created_at, products[0].id) if has_prev else None
+        )
+    
+    async def count_user_products(self, user_id: int) -> int:
+        """Количество товаров пользователя"""
+        result = await self.session.execute(
+            select(func.count(Product.id)).where(Product.user_id == user_id)
+        )
+        return result.scalar() or 0
+    
     async def get_product_by_track_code(self, track_code: str) -> Optional[Product]:
         result = await self.session.execute(
             select(Product).where(Product.track_code == track_code)
         )
         return result.scalar_one_or_none()
     
+    async def stream_track_codes(self, after_id: int = 0, batch_size: int = 5000) -> AsyncIterator[List[Tuple[int, str]]]:
+        """(id, трек-код) товаров с id > after_id по возрастанию id, порциями через серверный курсор"""
+        result = await self.session.stream(
+            select(Product.id, Product.track_code)
+            .where(Product.id > after_id)
+            .order_by(Product.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions(batch_size):
+            yield [(product_id, track_code) for product_id, track_code in partition]
+    
+    async def count_products(self) -> int:
+        result = await self.session.execute(select(func.count(Product.id)))
+        return result.scalar() or 0
+    
     async def create_product(self, track_code: str, user_id: int, 
                            country_from: str = "China", **kwargs) -> Product:
         product = Product(
@@ -127,6 +271,23 @@ class ProductRepository:
         )
         return result.scalars().all()
     
+    @staticmethod
+    def product_info(product: Product) -> dict:
+        """Данные товара для карточки"""
+        return {
+            "name": product.product_name,
+            "category": product.product_category.value if product.product_category else None,
+            "description": product.product_description,
+            "quantity": product.quantity,
+            "unit_price": product.unit_price_usd,
+            "total_value": product.total_value_usd,
+            "weight": product.weight_kg,
+            "dimensions": f"{product.length_cm}×{product.width_cm}×{product.height_cm} см" if product.length_cm else None,
+            "fragile": product.fragile,
+            "has_battery": product.has_battery,
+            "is_liquid": product.is_liquid
+        }
+    
     async def get_detailed_product_info(self, track_code: str) -> Optional[dict]:
         """Получить детальную информацию о товаре с данными пользователя"""
         result = await self.session.execute(
@@ -141,19 +302,7 @@ class ProductRepository:
             return {
                 "product": product,
                 "user": user,
-                "product_info": {
-                    "name": product.product_name,
-                    "category": product.product_category.value if product.product_category else None,
-                    "description": product.product_description,
-                    "quantity": product.quantity,
-                    "unit_price": product.unit_price_usd,
-                    "total_value": product.total_value_usd,
-                    "weight": product.weight_kg,
-                    "dimensions": f"{product.length_cm}×{product.width_cm}×{product.height_cm} см" if product.length_cm else None,
-                    "fragile": product.fragile,
-                    "has_battery": product.has_battery,
-                    "is_liquid": product.is_liquid
-                },
+                "product_info": self.product_info(product),
                 "user_info": {
                     "name": user.full_name,
                     "phone": user.phone,
@@ -163,13 +312,183 @@ class ProductRepository:
             }
         return None
     
+    async def get_products_by_track_codes(
+        self,
+        track_codes: List[str],
+        chunk_size: int = BULK_CHUNK_SIZE
+    ) -> Dict[str, Tuple[Product, Optional[User]]]:
+        """
+        Товары с владельцами по списку трек-кодов.
+        
+        Один запрос ... WHERE track_code IN (...) с присоединением
+        владельца на порцию кодов вместо запроса на каждый код.
+        
+        Returns:
+            Dict[str, Tuple[Product, Optional[User]]]: трек-код -> (товар, владелец)
+            в порядке входного списка; ненайденных кодов в словаре нет
+        """
+        # Убираем дубли, сохраняя порядок
+        codes = list(dict.fromkeys(code for code in track_codes if code))
+        found = {}
+        for chunk in split_list(codes, chunk_size):
+            result = await self.session.execute(
+                select(Product, User)
+                .outerjoin(User, Product.user_id == User.id)
+                .where(Product.track_code.in_(chunk))
+            )
+            for product, owner in result.all():
+                found[product.track_code] = (product, owner)
+        return {code: found[code] for code in codes if code in found}
+    
+    async def get_existing_track_codes(self, track_codes: List[str]) -> Set[str]:
+        """Коды из списка, которые уже есть в базе"""
+        existing = set()
+        for chunk in split_list(list(set(track_codes)), BULK_CHUNK_SIZE):
+            result = await self.session.execute(
+                select(Product.track_code).where(Product.track_code.in_(chunk))
+            )
+            existing.update(result.scalars().all())
+        return existing
+    
+    async def import_products(self, rows: List[dict], status: ProductStatus) -> List[Tuple[int, str, Optional[int]]]:
+        """
+        Массовая вставка товаров (загрузка манифеста) в одной транзакции
+        
+        Строки с уже существующим трек-кодом пропускаются (ON CONFLICT DO
+        NOTHING), владельцам вставленных товаров ставятся уведомления о
+        статусе (outbox, как при массовом обновлении).
+        
+        Args:
+            rows: значения колонок Product (одинаковый набор ключей)
+        
+        Returns:
+            List[Tuple[int, str, Optional[int]]]: (id, трек-код, id владельца) вставленных товаров
+        """
+        now = datetime.utcnow()
+        values = [{**row, "status": status, "created_at": now, "updated_at": now} for row in rows]
+        returning = (Product.id, Product.track_code, Product.user_id)
+        
+        dialect = self.session.bind.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            upsert = None
+        
+        inserted = []
+        try:
+            for chunk in split_list(values, BULK_CHUNK_SIZE):
+                if upsert is not None:
+                    result = await self.session.execute(
+                        upsert(Product)
+                        .on_conflict_do_nothing(index_elements=[Product.track_code])
+                        .returning(*returning),
+                        chunk
+                    )
+                    inserted.extend(tuple(row) for row in result.all())
+                else:
+                    # Без ON CONFLICT: коды заранее проверены get_existing_track_codes
+                    await self.session.execute(insert(Product), chunk)
+                    result = await self.session.execute(
+                        select(*returning).where(Product.track_code.in_([row["track_code"] for row in chunk]))
+                    )
+                    inserted.extend(tuple(row) for row in result.all())
+            
+            notifications = [
+                {"user_id": user_id, "product_id": product_id, "track_code": track_code,
+                 "status": status, "created_at": now}
+                for product_id, track_code, user_id in inserted if user_id is not None
+            ]
+            for chunk in split_list(notifications, BULK_CHUNK_SIZE):
+                await self.session.execute(insert(StatusNotification), chunk)
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        return inserted
+    
     # НОВЫЕ МЕТОДЫ ДЛЯ ФУНКЦИОНАЛА
     
-    async def search_products(self, search_term: str, user_id: Optional[int] = None) -> List[Product]:
-        """Поиск товаров по трек-коду, названию или описанию"""
+    async def search_products(
+        self, 
+        search_term: str, 
+        user_id: Optional[int] = None, 
+        limit: int = SEARCH_LIMIT
+    ) -> List[Product]:
+        """
+        Поиск товаров по трек-коду, названию или описанию
+        
+        Сначала товары, трек-код которых начинается с запроса (по индексу
+        track_code), затем результаты полнотекстового поиска по
+        релевантности. Если ничего не найдено - поиск части трек-кода.
+        Без полнотекстового индекса (другие СУБД) - поиск подстроки
+        через ILIKE.
+        """
+        search_term = (search_term or "").strip()
+        if not search_term or limit <= 0:
+            return []
+        
+        dialect = self.session.bind.dialect.name
+        sql = ranked_ids_sql(dialect, with_user=user_id is not None)
+        if sql is None:
+            return await self._search_ilike(search_term, user_id, limit)
+        
+        match_query = build_match_query(dialect, query_words(search_term))
+        ids = await self._search_track_code_prefix(search_term, user_id, limit)
+        
+        if match_query and len(ids) < limit:
+            params = {"query": match_query, "limit": limit}
+            if user_id is not None:
+                params["user_id"] = user_id
+            result = await self.session.execute(text(sql), params)
+            for (product_id,) in result:
+                if product_id not in ids:
+                    ids.append(product_id)
+        
+        # Часть трек-кода из середины: просмотр только узкого индекса track_code
+        if not ids and " " not in search_term and len(search_term) >= MIN_TRACK_SUBSTRING:
+            ids = await self._search_track_code_substring(search_term, user_id, limit)
+        
+        return await self._load_products_in_order(ids[:limit])
+    
+    async def _search_track_code_prefix(
+        self, 
+        prefix: str, 
+        user_id: Optional[int], 
+        limit: int
+    ) -> List[int]:
+        """id товаров с трек-кодом, начинающимся с prefix (диапазон по индексу)"""
+        if " " in prefix:
+            return []
+        prefix = prefix.upper()
+        query = select(Product.id).where(
+            Product.track_code >= prefix,
+            Product.track_code < prefix_upper_bound(prefix)
+        )
+        if user_id is not None:
+            query = query.where(Product.user_id == user_id)
+        result = await self.session.execute(query.order_by(Product.track_code).limit(limit))
+        return list(result.scalars().all())
+    
+    async def _search_track_code_substring(
+        self, 
+        substring: str, 
+        user_id: Optional[int], 
+        limit: int
+    ) -> List[int]:
+        """id товаров, трек-код которых содержит substring"""
+        query = select(Product.id).where(Product.track_code.contains(substring.upper()))
+        if user_id is not None:
+            query = query.where(Product.user_id == user_id)
+        result = await self.session.execute(query.order_by(Product.track_code).limit(limit))
+        return list(result.scalars().all())
+    
+    async def _search_ilike(self, search_term: str, user_id: Optional[int], limit: int) -> List[Product]:
+        """Поиск подстроки без полнотекстового индекса"""
         query = select(Product)
         
-        if user_id:
+        if user_id is not None:
             query = query.where(Product.user_id == user_id)
         
         query = query.where(
@@ -178,45 +497,168 @@ class ProductRepository:
                 Product.product_name.ilike(f"%{search_term}%"),
                 Product.product_description.ilike(f"%{search_term}%")
             )
-        ).order_by(Product.created_at.desc())
+        ).order_by(Product.created_at.desc()).limit(limit)
         
         result = await self.session.execute(query)
         return result.scalars().all()
     
+    async def _load_products_in_order(self, ids: List[int]) -> List[Product]:
+        """Загрузка товаров по id с сохранением порядка"""
+        if not ids:
+            return []
+        result = await self.session.execute(select(Product).where(Product.id.in_(ids)))
+        products = {product.id: product for product in result.scalars().all()}
+        return [products[product_id] for product_id in ids if product_id in products]
+    
+    def _status_values(self, new_status: ProductStatus, arrival_date: Optional[datetime]) -> dict:
+        """Значения для массового UPDATE статуса"""
+        now = datetime.utcnow()
+        values = {"status": new_status, "updated_at": now}
+        if new_status == ProductStatus.TAJIKISTAN_WAREHOUSE:
+            values["arrival_date"] = arrival_date or now
+        return values
+    
+    def _supports_update_returning(self) -> bool:
+        return bool(getattr(self.session.bind.dialect, "update_returning", False))
+    
+    async def _queue_status_notifications(self, condition, new_status: ProductStatus) -> None:
+        """
+        Уведомления владельцам товаров, статус которых изменится (outbox).
+        
+        Выполняется до UPDATE в той же транзакции: уведомление появится
+        только вместе с фиксацией нового статуса. Товары, уже находящиеся
+        в этом статусе, пропускаются.
+        """
+        status_type = StatusNotification.__table__.c.status.type
+        await self.session.execute(
+            insert(StatusNotification).from_select(
+                ["user_id", "product_id", "track_code", "status", "created_at"],
+                select(
+                    Product.user_id,
+                    Product.id,
+                    Product.track_code,
+                    literal(new_status, status_type),
+                    literal(datetime.utcnow(), DateTime())
+                ).where(
+                    condition,
+                    Product.user_id.isnot(None),
+                    or_(Product.status.is_(None), Product.status != new_status)
+                )
+            )
+        )
+    
     async def bulk_update_status(
         self, 
         track_codes: List[str], 
         new_status: ProductStatus,
-        arrival_date: Optional[datetime] = None
-    ) -> Tuple[int, List[str]]:
+        arrival_date: Optional[datetime] = None,
+        chunk_size: int = BULK_CHUNK_SIZE
+    ) -> BulkUpdateResult:
         """
-        Массовое обновление статусов товаров
+        Массовое обновление статусов товаров по трек-кодам.
+        
+        Выполняется порциями UPDATE ... WHERE track_code IN (...) в одной
+        транзакции. Если база поддерживает RETURNING, обновленные коды
+        возвращает сам UPDATE, иначе они выбираются перед обновлением.
         
         Returns:
-            tuple: (количество обновленных, список обновленных трек-кодов)
+            BulkUpdateResult: обновленные и ненайденные трек-коды
         """
-        if not track_codes:
-            return 0, []
+        # Убираем дубли, сохраняя порядок
+        codes = list(dict.fromkeys(code for code in track_codes if code))
+        if not codes:
+            return BulkUpdateResult()
         
-        # Получаем товары
-        result = await self.session.execute(
-            select(Product).where(Product.track_code.in_(track_codes))
-        )
-        products = result.scalars().all()
+        values = self._status_values(new_status, arrival_date)
+        use_returning = self._supports_update_returning()
+        updated = set()
         
+        try:
+            for chunk in split_list(codes, chunk_size):
+                await self._queue_status_notifications(Product.track_code.in_(chunk), new_status)
+                stmt = (
+                    update(Product)
+                    .where(Product.track_code.in_(chunk))
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+                if use_returning:
+                    result = await self.session.execute(stmt.returning(Product.track_code))
+                    updated.update(result.scalars().all())
+                else:
+                    result = await self.session.execute(
+                        select(Product.track_code).where(Product.track_code.in_(chunk))
+                    )
+                    updated.update(result.scalars().all())
+                    await self.session.execute(stmt)
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        
+        return BulkUpdateResult(
+            updated_codes=[code for code in codes if code in updated],
+            missing_codes=[code for code in codes if code not in updated]
+        )
+    
+    async def bulk_update_status_by_ids(
+        self,
+        product_ids: List[int],
+        new_status: ProductStatus,
+        arrival_date: Optional[datetime] = None,
+        chunk_size: int = BULK_CHUNK_SIZE
+    ) -> int:
+        """Массовое обновление статусов по id товаров (в одной транзакции)"""
+        ids = list(dict.fromkeys(product_ids))
+        values = self._status_values(new_status, arrival_date)
         updated_count = 0
-        updated_codes = []
         
-        for product in products:
-            product.status = new_status
-            if arrival_date and new_status == ProductStatus.TAJIKISTAN_WAREHOUSE:
-                product.arrival_date = arrival_date
-            product.updated_at = datetime.utcnow()
-            updated_count += 1
-            updated_codes.append(product.track_code)
+        try:
+            for chunk in split_list(ids, chunk_size):
+                await self._queue_status_notifications(Product.id.in_(chunk), new_status)
+                result = await self.session.execute(
+                    update(Product)
+                    .where(Product.id.in_(chunk))
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+                updated_count += result.rowcount
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
         
-        await self.session.commit()
-        return updated_count, updated_codes
+        return updated_count
+    
+    async def update_status_by_send_date(
+        self,
+        start: datetime,
+        end: datetime,
+        new_status: ProductStatus,
+        arrival_date: Optional[datetime] = None
+    ) -> int:
+        """Обновление статуса всех товаров, отправленных в [start, end), одним UPDATE"""
+        in_range = and_(Product.send_date >= start, Product.send_date < end)
+        try:
+            await self._queue_status_notifications(in_range, new_status)
+            result = await self.session.execute(
+                update(Product)
+                .where(in_range)
+                .values(**self._status_values(new_status, arrival_date))
+                .execution_options(synchronize_session=False)
+            )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        return result.rowcount
+    
+    async def count_by_send_date(self, start: datetime, end: datetime) -> int:
+        """Количество товаров, отправленных в [start, end)"""
+        result = await self.session.execute(
+            select(func.count(Product.id)).where(Product.send_date >= start, Product.send_date < end)
+        )
+        return result.scalar() or 0
     
     async def update_product_by_track_code(
         self, 
@@ -273,48 +715,64 @@ class ProductRepository:
         result = await self.session.execute(query)
         return result.scalars().all()
     
+    async def get_data_watermark(self) -> Tuple[Optional[datetime], int]:
+        """Водяной знак данных товаров: (MAX(updated_at), количество)"""
+        # Отдельные запросы: MAX по индексу updated_at читает одну запись
+        max_updated_at = (await self.session.execute(select(func.max(Product.updated_at)))).scalar()
+        count = (await self.session.execute(select(func.count(Product.id)))).scalar()
+        return max_updated_at, count or 0
+    
+    async def status_histogram(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        by: str = "created_at",
+        user_id: Optional[int] = None
+    ) -> Dict[ProductStatus, int]:
+        """
+        Количество товаров по каждому статусу одним запросом
+        
+        Args:
+            start: Начало периода (включительно)
+            end: Конец периода (не включительно)
+            by: Поле даты для периода (created_at, updated_at, arrival_date, send_date)
+            user_id: Только товары пользователя
+            
+        Returns:
+            dict: {ProductStatus: количество} для всех статусов; товары без
+                статуса считаются как CREATED (значение по умолчанию столбца),
+                поэтому сумма равна COUNT по тем же условиям
+        """
+        if by not in ("created_at", "updated_at", "arrival_date", "send_date"):
+            raise ValueError(f"Недопустимое поле даты: {by}")
+        date_column = getattr(Product, by)
+        
+        query = select(Product.status, func.count(Product.id)).group_by(Product.status)
+        if start is not None:
+            query = query.where(date_column >= start)
+        if end is not None:
+            query = query.where(date_column < end)
+        if user_id is not None:
+            query = query.where(Product.user_id == user_id)
+        
+        result = await self.session.execute(query)
+        histogram = {status: 0 for status in ProductStatus}
+        for status, count in result.all():
+            histogram[status or ProductStatus.CREATED] += count
+        return histogram
+    
     async def get_delivery_statistics(
         self,
         month: int,
         year: int
     ) -> Dict[str, int]:
         """Статистика доставки за месяц"""
-        start_date = datetime(year, month, 1)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1)
-        else:
-            end_date = datetime(year, month + 1, 1)
-        
-        # Всего товаров за месяц
-        total_query = select(func.count(Product.id)).where(
-            Product.created_at.between(start_date, end_date)
-        )
-        total_result = await self.session.execute(total_query)
-        total = total_result.scalar() or 0
-        
-        # Доставленные товары
-        delivered_query = select(func.count(Product.id)).where(
-            Product.created_at.between(start_date, end_date),
-            Product.status == ProductStatus.DELIVERED
-        )
-        delivered_result = await self.session.execute(delivered_query)
-        delivered = delivered_result.scalar() or 0
-        
-        # Принятые товары (на складе в Таджикистане)
-        accepted_query = select(func.count(Product.id)).where(
-            Product.created_at.between(start_date, end_date),
-            Product.status == ProductStatus.TAJIKISTAN_WAREHOUSE
-        )
-        accepted_result = await self.session.execute(accepted_query)
-        accepted = accepted_result.scalar() or 0
-        
-        # В пути
-        transit_query = select(func.count(Product.id)).where(
-            Product.created_at.between(start_date, end_date),
-            Product.status == ProductStatus.IN_TRANSIT
-        )
-        transit_result = await self.session.execute(transit_query)
-        transit = transit_result.scalar() or 0
+        start_date, end_date = month_range(year, month)
+        histogram = await self.status_histogram(start_date, end_date)
+        total = sum(histogram.values())
+        delivered = histogram[ProductStatus.DELIVERED]
+        accepted = histogram[ProductStatus.TAJIKISTAN_WAREHOUSE]
+        transit = histogram[ProductStatus.IN_TRANSIT]
         
         return {
             "total": total,
@@ -323,55 +781,343 @@ class ProductRepository:
             "transit": transit,
             "pending": total - delivered - accepted - transit
         }
+
+class StatsRepository:
+    """Чтение дневной сводки product_daily_stats для отчетов"""
     
-    async def export_to_excel(self, products: List[Product]) -> bytes:
-        """Экспорт товаров в Excel"""
-        try:
-            # Создаем DataFrame
-            data = []
-            for product in products:
-                data.append({
-                    "Трек-код": product.track_code,
-                    "Название": product.product_name or "",
-                    "Категория": product.product_category.value if product.product_category else "",
-                    "Статус": product.status.value,
-                    "Вес (кг)": product.weight_kg or 0,
-                    "Стоимость ($)": product.total_value_usd or 0,
-                    "Количество": product.quantity or 1,
-                    "Дата создания": product.created_at.strftime("%Y-%m-%d %H:%M"),
-                    "Дата обновления": product.updated_at.strftime("%Y-%m-%d %H:%M") if product.updated_at else "",
-                    "Дата прибытия": product.arrival_date.strftime("%Y-%m-%d") if hasattr(product, 'arrival_date') and product.arrival_date else "",
-                    "Особые свойства": self._get_special_properties(product)
-                })
-            
-            df = pd.DataFrame(data)
+    FIELDS = ("product_count", "total_value_usd", "total_quantity", "total_weight_kg", "entered_count")
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def get_daily_stats(self, start: date, end: date) -> List[ProductDailyStat]:
+        """Строки сводки за дни [start, end)"""
+        result = await self.session.execute(
+            select(ProductDailyStat)
+            .where(ProductDailyStat.day >= start, ProductDailyStat.day < end)
+            .order_by(ProductDailyStat.day)
+        )
+        return result.scalars().all()
+    
+    async def summarize_by_month(
+        self,
+        start: date,
+        end: date
+    ) -> Dict[Tuple[int, int], Dict[ProductStatus, Dict[str, float]]]:
+        """
+        Сводка за период, сгруппированная по месяцам и статусам
+        
+        Returns:
+            dict: {(год, месяц): {ProductStatus: {поле: сумма}}}
+        """
+        summary = {}
+        for row in await self.get_daily_stats(start, end):
+            month = summary.setdefault((row.day.year, row.day.month), {})
+            totals = month.setdefault(row.status, dict.fromkeys(self.FIELDS, 0))
+            for column in self.FIELDS:
+                totals[column] += getattr(row, column) or 0
+        return summary
+    
+    async def get_totals(self) -> Dict[str, float]:
+        """Итоги по всем товарам в базе"""
+        result = await self.session.execute(
+            select(*[func.coalesce(func.sum(getattr(ProductDailyStat, column)), 0) for column in self.FIELDS])
+        )
+        return dict(zip(self.FIELDS, result.one()))
+    
+    @staticmethod
+    def merge_statuses(by_status: Dict[ProductStatus, Dict[str, float]]) -> Dict[str, float]:
+        """Суммирование показателей по всем статусам"""
+        totals = dict.fromkeys(StatsRepository.FIELDS, 0)
+        for values in by_status.values():
+            for column in StatsRepository.FIELDS:
+                totals[column] += values[column]
+        return totals
+
+class ReportJobRepository:
+    """Очередь фоновых отчетов (таблицы report_jobs и report_job_subscribers)"""
+    
+    ACTIVE_STATUSES = (ReportJobStatus.PENDING, ReportJobStatus.RUNNING)
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def get_job(self, job_id: int) -> Optional[ReportJob]:
+        return await self.session.get(ReportJob, job_id)
+    
+    async def enqueue(
+        self,
+        kind: str,
+        params: Optional[dict],
+        chat_id: int,
+        message_id: Optional[int] = None,
+        language: str = "ru"
+    ) -> Tuple[ReportJob, bool]:
+        """
+        Постановка отчета в очередь
+        
+        Если такой же отчет (kind + params) уже в очереди или строится,
+        новый получатель добавляется к нему.
+        
+        Returns:
+            tuple: (задание, создано ли новое задание)
+        """
+        params_json = json.dumps(params or {}, sort_keys=True, ensure_ascii=False)
+        dedupe_key = f"{kind}:{params_json}"[:200]
+        
+        result = await self.session.execute(
+            select(ReportJob)
+            .where(ReportJob.dedupe_key == dedupe_key, ReportJob.status.in_(self.ACTIVE_STATUSES))
+            .order_by(ReportJob.id)
+            .limit(1)
+        )
+        job = result.scalar_one_or_none()
+        created = job is None
+        if created:
+            job = ReportJob(kind=kind, params=params_json, dedupe_key=dedupe_key)
+            self.session.add(job)
+            await self.session.flush()
+        
+        self.session.add(ReportJobSubscriber(
+            job_id=job.id, chat_id=chat_id, message_id=message_id, language=language
+        ))
+        await self.session.commit()
+        return job, created
+    
+    async def claim_next(self) -> Optional[ReportJob]:
+        """Захват самого старого задания из очереди (None, если очередь пуста)"""
+        while True:
+            result = await self.session.execute(
+                select(ReportJob.id)
+                .where(ReportJob.status == ReportJobStatus.PENDING)
+                .order_by(ReportJob.created_at, ReportJob.id)
+                .limit(1)
+            )
+            job_id = result.scalar_one_or_none()
+            if job_id is None:
+                return None
             
-            # Конвертируем в Excel
-            import tempfile
-            with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as tmp:
-                with pd.ExcelWriter(tmp.name, engine='openpyxl') as writer:
-                    df.to_excel(writer, index=False, sheet_name='Товары')
-                
-                # Читаем файл
-                with open(tmp.name, 'rb') as f:
-                    excel_data = f.read()
-                
-                # Удаляем временный файл
-                os.unlink(tmp.name)
+            # Условный UPDATE: задание получает только один обработчик
+            claimed = await self.session.execute(
+                update(ReportJob)
+                .where(ReportJob.id == job_id, ReportJob.status == ReportJobStatus.PENDING)
+                .values(status=ReportJobStatus.RUNNING, started_at=datetime.utcnow(), progress=0)
+                .execution_options(synchronize_session=False)
+            )
+            await self.session.commit()
+            if claimed.rowcount == 1:
+                return await self.session.get(ReportJob, job_id, populate_existing=True)
+    
+    async def set_progress(self, job_id: int, progress: int, total: Optional[int] = None) -> None:
+        values = {"progress": progress}
+        if total is not None:
+            values["total"] = total
+        await self.session.execute(
+            update(ReportJob).where(ReportJob.id == job_id).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+    
+    async def finish(
+        self,
+        job_id: int,
+        status: ReportJobStatus,
+        result_path: Optional[str] = None,
+        result_filename: Optional[str] = None,
+        result_caption: Optional[Dict[str, str]] = None,
+        file_id: Optional[str] = None,
+        error: Optional[str] = None
+    ) -> bool:
+        """
+        Завершение задания (только если оно еще активно)
+        
+        Returns:
+            bool: False, если задание уже завершено (например, отменено)
+        """
+        result = await self.session.execute(
+            update(ReportJob)
+            .where(ReportJob.id == job_id, ReportJob.status.in_(self.ACTIVE_STATUSES))
+            .values(
+                status=status,
+                result_path=result_path,
+                result_filename=result_filename,
+                result_caption=json.dumps(result_caption, ensure_ascii=False) if result_caption else None,
+                file_id=file_id,
+                error=error,
+                finished_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+        return result.rowcount == 1
+    
+    async def set_file_id(self, job_id: int, file_id: str) -> None:
+        await self.session.execute(
+            update(ReportJob).where(ReportJob.id == job_id).values(file_id=file_id)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+    
+    async def get_undelivered(self, job_id: int) -> List[ReportJobSubscriber]:
+        result = await self.session.execute(
+            select(ReportJobSubscriber)
+            .where(ReportJobSubscriber.job_id == job_id, ReportJobSubscriber.delivered.is_(False))
+            .order_by(ReportJobSubscriber.id)
+        )
+        return result.scalars().all()
+    
+    async def get_subscribers(self, job_id: int) -> List[ReportJobSubscriber]:
+        result = await self.session.execute(
+            select(ReportJobSubscriber).where(ReportJobSubscriber.job_id == job_id)
+        )
+        return result.scalars().all()
+    
+    async def remove_subscribers(self, subscriber_ids: List[int]) -> None:
+        """Отписка получателей от задания"""
+        await self.session.execute(
+            delete(ReportJobSubscriber).where(ReportJobSubscriber.id.in_(subscriber_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+    
+    async def mark_delivered(self, subscriber_id: int) -> None:
+        await self.session.execute(
+            update(ReportJobSubscriber).where(ReportJobSubscriber.id == subscriber_id).values(delivered=True)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+    
+    async def requeue_running(self) -> int:
+        """Возврат в очередь заданий, прерванных перезапуском"""
+        result = await self.session.execute(
+            update(ReportJob)
+            .where(ReportJob.status == ReportJobStatus.RUNNING)
+            .values(status=ReportJobStatus.PENDING, started_at=None, progress=0)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+        return result.rowcount
+    
+    async def get_finished_undelivered_ids(self) -> List[int]:
+        """Завершенные задания, результат которых получили не все"""
+        result = await self.session.execute(
+            select(ReportJob.id)
+            .join(ReportJobSubscriber, ReportJobSubscriber.job_id == ReportJob.id)
+            .where(
+                ReportJob.status.notin_(self.ACTIVE_STATUSES),
+                ReportJobSubscriber.delivered.is_(False)
+            )
+            .distinct()
+        )
+        return list(result.scalars().all())
+
+
+class NotificationRepository:
+    """Очередь уведомлений о смене статуса (таблица status_notifications)"""
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def get_pending_user_ids(self, limit: int) -> List[int]:
+        """Пользователи с неотправленными уведомлениями (давно ждущие - первыми)"""
+        result = await self.session.execute(
+            select(StatusNotification.user_id)
+            .where(StatusNotification.sent_at.is_(None))
+            .group_by(StatusNotification.user_id)
+            .order_by(func.min(StatusNotification.id))
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def get_pending_for_user(
+        self, user_id: int
+    ) -> Tuple[Optional[User], List[Tuple[StatusNotification, Optional[str]]]]:
+        """Пользователь и его неотправленные уведомления с названиями товаров (по порядку)"""
+        user = await self.session.get(User, user_id)
+        result = await self.session.execute(
+            select(StatusNotification, Product.product_name)
+            .outerjoin(Product, Product.id == StatusNotification.product_id)
+            .where(StatusNotification.user_id == user_id, StatusNotification.sent_at.is_(None))
+            .order_by(StatusNotification.id)
+        )
+        return user, [(notification, name) for notification, name in result.all()]
+    
+    async def mark_sent(self, notification_ids: List[int]) -> None:
+        now = datetime.utcnow()
+        for chunk in split_list(notification_ids, BULK_CHUNK_SIZE):
+            await self.session.execute(
+                update(StatusNotification)
+                .where(StatusNotification.id.in_(chunk))
+                .values(sent_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        await self.session.commit()
+    
+    async def count_pending(self) -> int:
+        result = await self.session.execute(
+            select(func.count(StatusNotification.id)).where(StatusNotification.sent_at.is_(None))
+        )
+        return result.scalar() or 0
+    
+    async def purge_sent(self, older_than: datetime) -> int:
+        """Удаление отправленных уведомлений старше older_than"""
+        result = await self.session.execute(
+            delete(StatusNotification)
+            .where(StatusNotification.sent_at.isnot(None), StatusNotification.sent_at < older_than)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+        return result.rowcount
+
+class CounterRepository:
+    """Именованные счетчики последовательностей (таблица counters)"""
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def reserve(self, name: str, count: int) -> int:
+        """
+        Резервирование count номеров счетчика в одной транзакции
+        
+        Номера разных вызовов (в том числе из разных процессов) не
+        пересекаются: UPDATE value = value + count блокирует строку
+        счетчика до фиксации.
+        
+        Returns:
+            int: первый номер блока [first, first + count)
+        """
+        if count < 1:
+            raise ValueError("count должен быть больше нуля")
+        
+        stmt = (
+            update(Counter)
+            .where(Counter.name == name)
+            .values(value=Counter.value + count)
+            .execution_options(synchronize_session=False)
+        )
+        use_returning = bool(getattr(self.session.bind.dialect, "update_returning", False))
+        
+        while True:
+            if use_returning:
+                result = await self.session.execute(stmt.returning(Counter.value))
+                value = result.scalar_one_or_none()
+            else:
+                result = await self.session.execute(stmt)
+                value = None
+                if result.rowcount:
+                    value = (await self.session.execute(
+                        select(Counter.value).where(Counter.name == name)
+                    )).scalar_one()
             
-            return excel_data
+            if value is not None:
+                await self.session.commit()
+                return value - count + 1
             
-        except Exception as e:
-            print(f"Ошибка экспорта в Excel: {e}")
-            return b""
-    
-    def _get_special_properties(self, product: Product) -> str:
-        """Получение строки с особыми свойствами"""
-        properties = []
-        if product.fragile:
-            properties.append("Хрупкий")
-        if product.has_battery:
-            properties.append("С батареей")
-        if product.is_liquid:
-            properties.append("Жидкость")
-        return ", ".join(properties) if properties else "Нет"
\ No newline at end of file
+            # Счетчика еще нет: создаем его сразу с занятым блоком
+            try:
+                self.session.add(Counter(name=name, value=count))
+                await self.session.commit()
+                return 1
+            except IntegrityError:
+                # Счетчик одновременно создал другой процесс - повторяем UPDATE
+                await self.session.rollback()
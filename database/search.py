@@ -0,0 +1,133 @@
+"""
+Полнотекстовый индекс товаров.
+
+SQLite: внешняя FTS5-таблица products_fts (track_code, product_name,
+product_description) поверх products, синхронизируется триггерами.
+MySQL: FULLTEXT-индекс по названию и описанию. Трек-коды ищутся по
+префиксу через обычный уникальный индекс track_code.
+"""
+import logging
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Максимум слов в поисковом запросе
+MAX_QUERY_WORDS = 8
+
+# Веса столбцов для bm25: трек-код, название, описание
+_BM25_WEIGHTS = "10.0, 5.0, 1.0"
+
+_SQLITE_FTS_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        track_code, product_name, product_description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+_SQLITE_TRIGGERS = {
+    "trg_products_fts_insert": """
+        CREATE TRIGGER trg_products_fts_insert AFTER INSERT ON products
+        BEGIN
+            INSERT INTO products_fts (rowid, track_code, product_name, product_description)
+            VALUES (NEW.id, NEW.track_code, NEW.product_name, NEW.product_description);
+        END
+    """,
+    "trg_products_fts_update": """
+        CREATE TRIGGER trg_products_fts_update
+        AFTER UPDATE OF track_code, product_name, product_description ON products
+        BEGIN
+            INSERT INTO products_fts (products_fts, rowid, track_code, product_name, product_description)
+            VALUES ('delete', OLD.id, OLD.track_code, OLD.product_name, OLD.product_description);
+            INSERT INTO products_fts (rowid, track_code, product_name, product_description)
+            VALUES (NEW.id, NEW.track_code, NEW.product_name, NEW.product_description);
+        END
+    """,
+    "trg_products_fts_delete": """
+        CREATE TRIGGER trg_products_fts_delete AFTER DELETE ON products
+        BEGIN
+            INSERT INTO products_fts (products_fts, rowid, track_code, product_name, product_description)
+            VALUES ('delete', OLD.id, OLD.track_code, OLD.product_name, OLD.product_description);
+        END
+    """,
+}
+
+_MYSQL_FULLTEXT_INDEX = "ft_products_text"
+
+
+def install_search_index(conn) -> None:
+    """Создание полнотекстового индекса (и триггеров для SQLite)"""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        conn.execute(text(_SQLITE_FTS_TABLE))
+        for name, ddl in _SQLITE_TRIGGERS.items():
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            conn.execute(text(ddl))
+    elif dialect == "mysql":
+        exists = conn.execute(
+            text(
+                "SELECT COUNT(*) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = 'products' AND index_name = :name"
+            ),
+            {"name": _MYSQL_FULLTEXT_INDEX}
+        ).scalar()
+        if not exists:
+            conn.execute(text(
+                f"CREATE FULLTEXT INDEX {_MYSQL_FULLTEXT_INDEX} "
+                f"ON products (product_name, product_description)"
+            ))
+    else:
+        logger.warning(f"Полнотекстовый индекс не поддерживается для {dialect}")
+
+
+def rebuild_search_index(conn) -> None:
+    """Перестроение FTS-индекса по таблице products (MySQL обновляет индекс сам)"""
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("INSERT INTO products_fts (products_fts) VALUES ('rebuild')"))
+        logger.info("Индекс products_fts перестроен")
+
+
+def query_words(search_term: str) -> List[str]:
+    """Слова поискового запроса (без служебных символов FTS)"""
+    return re.findall(r"\w+", search_term or "")[:MAX_QUERY_WORDS]
+
+
+def build_match_query(dialect: str, words: List[str]) -> Optional[str]:
+    """
+    Запрос для MATCH: все слова обязательны и ищутся по префиксу
+    ("тел" находит "телефон").
+    """
+    if not words:
+        return None
+    if dialect == "sqlite":
+        return " ".join(f'"{word}"*' for word in words)
+    if dialect == "mysql":
+        return " ".join(f"+{word}*" for word in words)
+    return None
+
+
+def ranked_ids_sql(dialect: str, with_user: bool) -> Optional[str]:
+    """SQL для id товаров по релевантности (параметры :query, :limit, :user_id)"""
+    if dialect == "sqlite":
+        user_join = "JOIN products p ON p.id = products_fts.rowid AND p.user_id = :user_id " if with_user else ""
+        return (
+            f"SELECT products_fts.rowid FROM products_fts {user_join}"
+            f"WHERE products_fts MATCH :query "
+            f"ORDER BY bm25(products_fts, {_BM25_WEIGHTS}) LIMIT :limit"
+        )
+    if dialect == "mysql":
+        user_filter = "AND user_id = :user_id " if with_user else ""
+        match = "MATCH(product_name, product_description) AGAINST (:query IN BOOLEAN MODE)"
+        return (
+            f"SELECT id FROM products WHERE {match} {user_filter}"
+            f"ORDER BY {match} DESC LIMIT :limit"
+        )
+    return None
+
+
+def prefix_upper_bound(prefix: str) -> str:
+    """Верхняя граница диапазона строк с данным префиксом: [prefix, bound)"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
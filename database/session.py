@@ -2,20 +2,164 @@
 Модуль для работы с базой данных
 """
 import asyncio
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncGenerator, Dict, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from config import settings
 
+logger = logging.getLogger(__name__)
+
 # Создаем базовый класс для моделей
 Base = declarative_base()
 
-# Создаем асинхронный движок базы данных
-engine = create_async_engine(
-    settings.DB_URL,
-    echo=False,  # Установите True для отладки SQL запросов
-    future=True
-)
+
+@dataclass
+class PoolMetrics:
+    """Счетчики пула соединений"""
+    checkouts: int = 0          # выдано соединений
+    checked_out: int = 0        # занято сейчас
+    max_checked_out: int = 0    # максимум занятых одновременно
+    connects: int = 0           # открыто новых соединений
+    waits: int = 0              # выдач, ждавших дольше SLOW_WAIT
+    wait_total: float = 0.0     # суммарное ожидание соединения, с
+    wait_max: float = 0.0       # максимальное ожидание, с
+    timeouts: int = 0           # ожиданий, закончившихся ошибкой
+
+    # Ожидание дольше этого (с) считается ожиданием свободного соединения
+    SLOW_WAIT = 0.005
+
+    def record_wait(self, seconds: float) -> None:
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        if seconds >= self.SLOW_WAIT:
+            self.waits += 1
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeasuredQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, измеряющий время ожидания свободного соединения"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - started)
+
+
+def _sqlite_pragmas() -> Dict[str, object]:
+    """PRAGMA для каждого нового соединения SQLite"""
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT,
+        # Отрицательное значение - размер кэша в КиБ, а не в страницах
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+    }
+
+
+def _install_sqlite_pragmas(sync_engine) -> None:
+    pragmas = _sqlite_pragmas()
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _install_pool_metrics(sync_engine) -> None:
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_metrics.connects += 1
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_metrics.checkouts += 1
+        pool_metrics.checked_out += 1
+        pool_metrics.max_checked_out = max(pool_metrics.max_checked_out, pool_metrics.checked_out)
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        pool_metrics.checked_out = max(pool_metrics.checked_out - 1, 0)
+
+
+def create_engine_from_settings(db_url: Optional[str] = None) -> AsyncEngine:
+    """
+    Создание движка по настройкам.
+    
+    SQLite: WAL, synchronous, busy_timeout, cache_size и mmap_size на
+    каждом соединении (меньше ошибок "database is locked" при
+    параллельной записи). Серверные СУБД и файловая SQLite: пул
+    соединений размером из настроек со сбором метрик.
+    """
+    url = make_url(db_url or settings.DB_URL)
+    is_sqlite = url.get_backend_name() == "sqlite"
+    kwargs = {"echo": settings.DB_ECHO, "future": True}
+
+    if is_sqlite and url.database in (None, "", ":memory:"):
+        # База в памяти существует только в одном соединении
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(
+            poolclass=MeasuredQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+
+    if is_sqlite:
+        # Ожидание блокировки на уровне драйвера (секунды)
+        kwargs["connect_args"] = {"timeout": settings.SQLITE_BUSY_TIMEOUT / 1000}
+
+    async_engine = create_async_engine(url, **kwargs)
+    if is_sqlite:
+        _install_sqlite_pragmas(async_engine.sync_engine)
+    _install_pool_metrics(async_engine.sync_engine)
+    return async_engine
+
+
+def get_pool_stats() -> Dict[str, object]:
+    """Состояние пула соединений и накопленные метрики"""
+    pool = engine.sync_engine.pool
+    stats = {
+        "pool": type(pool).__name__,
+        "status": pool.status(),
+        "checkouts": pool_metrics.checkouts,
+        "checked_out": pool_metrics.checked_out,
+        "max_checked_out": pool_metrics.max_checked_out,
+        "connects": pool_metrics.connects,
+        "waits": pool_metrics.waits,
+        "wait_avg_ms": pool_metrics.wait_total / pool_metrics.checkouts * 1000 if pool_metrics.checkouts else 0.0,
+        "wait_max_ms": pool_metrics.wait_max * 1000,
+        "timeouts": pool_metrics.timeouts,
+    }
+    if hasattr(pool, "size"):
+        stats["size"] = pool.size()
+        stats["overflow"] = pool.overflow()
+    return stats
+
+
+# Создаем асинхронный движок базы данных (DB_ECHO=true - отладка SQL запросов)
+engine = create_engine_from_settings()
 
 # Создаем фабрику сессий
 async_session_maker = async_sessionmaker(
@@ -48,6 +192,12 @@ async def create_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     print("✅ Таблицы базы данных созданы успешно")
+    
+    # Индексы и прочие изменения схемы для уже существующей базы
+    from database.migrations import upgrade
+    applied = await upgrade()
+    if applied:
+        print(f"✅ Применены миграции: {applied}")
 
 async def drop_tables():
     """
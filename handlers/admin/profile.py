@@ -10,9 +10,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from database.models import User
-from database.session import get_async_session
+from database.session import async_session_maker, get_pool_stats
+from database.repository import ProductRepository
 from keyboards.admin import get_back_to_admin_keyboard
 from config import settings
+from services.export_cache import export_cache
+from services.send_queue import send_scheduler
+from services.track_index import track_code_index
 
 logger = logging.getLogger(__name__)
 admin_profile_router = Router()
@@ -27,7 +31,7 @@ async def admin_profile(callback: CallbackQuery):
     user_id = callback.from_user.id
     admin_role = settings.get_admin_role(user_id)
     
-    async with get_async_session() as session:
+    async with async_session_maker() as session:
         # Получаем информацию о пользователе
         query = select(User).where(User.telegram_id == user_id)
         result = await session.execute(query)
@@ -61,22 +65,16 @@ async def admin_profile(callback: CallbackQuery):
         profile_text += f"  • Дата регистрации: {user.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
         
         # Статистика действий админа
-        from database.models import Product
         from sqlalchemy import func
+        product_repo = ProductRepository(session)
         
         # Товары добавленные админом
-        added_query = select(func.count(Product.id)).where(Product.user_id == user.id)
-        result = await session.execute(added_query)
-        added_count = result.scalar() or 0
+        added_count = sum((await product_repo.status_histogram(user_id=user.id)).values())
         
         # Товары обновленные админом (за последнюю неделю)
         week_ago = datetime.utcnow() - timedelta(days=7)
-        updated_query = select(func.count(Product.id)).where(
-            Product.updated_at >= week_ago,
-            Product.user_id == user.id
-        )
-        result = await session.execute(updated_query)
-        updated_count = result.scalar() or 0
+        updated_histogram = await product_repo.status_histogram(week_ago, by="updated_at", user_id=user.id)
+        updated_count = sum(updated_histogram.values())
         
         profile_text += f"📊 Ваша активность:\n"
         profile_text += f"  • Товаров добавлено: {added_count}\n"
@@ -86,9 +84,8 @@ async def admin_profile(callback: CallbackQuery):
         from sqlalchemy import text
         
         # Общая статистика системы
-        total_products_query = select(func.count(Product.id))
-        result = await session.execute(total_products_query)
-        total_products = result.scalar() or 0
+        status_stats = await product_repo.status_histogram()
+        total_products = sum(status_stats.values())
         
         total_users_query = select(func.count(User.id))
         result = await session.execute(total_users_query)
@@ -97,6 +94,9 @@ async def admin_profile(callback: CallbackQuery):
         profile_text += f"📈 Статистика системы:\n"
         profile_text += f"  • Всего пользователей: {total_users}\n"
         profile_text += f"  • Всего товаров: {total_products}\n"
+        for status, count in status_stats.items():
+            if count:
+                profile_text += f"    - {status.value}: {count}\n"
         
         # Версия базы данных (если SQLite)
         try:
@@ -157,6 +157,42 @@ async def system_info(callback: CallbackQuery):
     system_text += f"  • Запуск системы: {boot_time.strftime('%d.%m.%Y %H:%M')}\n"
     system_text += f"  • Аптайм: {uptime.days} дн., {uptime.seconds//3600} ч.\n"
     
+    # Пул соединений с базой
+    pool_stats = get_pool_stats()
+    system_text += "\n🗄️ База данных:\n"
+    system_text += f"  • Пул: {pool_stats['pool']}\n"
+    if "size" in pool_stats:
+        system_text += f"  • Размер пула: {pool_stats['size']} (+{pool_stats['overflow']} сверх)\n"
+    system_text += f"  • Занято соединений: {pool_stats['checked_out']} (максимум {pool_stats['max_checked_out']})\n"
+    system_text += f"  • Выдано соединений: {pool_stats['checkouts']}, открыто: {pool_stats['connects']}\n"
+    system_text += f"  • Ожидание: среднее {pool_stats['wait_avg_ms']:.1f} мс, максимум {pool_stats['wait_max_ms']:.1f} мс\n"
+    system_text += f"  • Ожиданий свободного соединения: {pool_stats['waits']}, таймаутов: {pool_stats['timeouts']}\n"
+    
+    # Кэш выгрузок
+    cache_stats = export_cache.stats()
+    system_text += "\n📁 Кэш выгрузок:\n"
+    system_text += f"  • Файлов: {cache_stats['files']} ({cache_stats['bytes'] / (1024**2):.1f} MB)\n"
+    system_text += f"  • Попаданий: {cache_stats['hits']}, промахов: {cache_stats['misses']}\n"
+    
+    # Исходящие сообщения
+    send_stats = send_scheduler.stats()
+    system_text += "\n📤 Отправка сообщений:\n"
+    system_text += f"  • Ожидают лимита: {send_stats['waiting']} (максимум {send_stats['max_waiting']}), в очереди рассылки: {send_stats['queued']}\n"
+    system_text += f"  • Отправлено: {send_stats['sent']}, склеено: {send_stats['merged']}\n"
+    system_text += f"  • Задержка: средняя {send_stats['latency_avg_ms']:.0f} мс, максимум {send_stats['latency_max_ms']:.0f} мс\n"
+    system_text += f"  • Повторов после 429: {send_stats['retries']}, ошибок: {send_stats['failed']}\n"
+    
+    # Индекс трек-кодов
+    index_stats = track_code_index.stats()
+    system_text += "\n🎯 Индекс трек-кодов:\n"
+    if index_stats["ready"]:
+        system_text += f"  • Кодов: {index_stats['items']} из {index_stats['capacity']}, память: {index_stats['memory_kb']:.0f} KB\n"
+        system_text += f"  • Ложные срабатывания: расчетные {index_stats['error_rate_expected']:.3%}, фактические {index_stats['error_rate_observed']:.3%} ({index_stats['false_positives']})\n"
+        system_text += f"  • Проверок: {index_stats['lookups']}, без запроса к базе: {index_stats['negatives']}, "
+        system_text += f"в базе из-за устаревшего фильтра: {index_stats['stale']}\n"
+    else:
+        system_text += "  • Строится или отключен\n"
+    
     await callback.message.edit_text(
         system_text,
         reply_markup=get_back_to_admin_keyboard()
@@ -2,18 +2,19 @@
 Генерация отчетов для администратора
 """
 import logging
-from datetime import datetime, timedelta
-from io import BytesIO
-import pandas as pd
+from datetime import datetime
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
-from sqlalchemy import select, func, extract
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.models import Product
+from database.models import ProductStatus
 from database.session import async_session_maker
-from keyboards.admin import get_reports_keyboard, get_back_to_admin_keyboard
+from database.repository import StatsRepository
+from keyboards.admin import get_reports_keyboard, get_back_to_admin_keyboard, get_report_cancel_keyboard
 from config import settings
+from utils.helpers import add_months, month_range
+from services.report_jobs import report_job_queue, queued_text, CANCEL_CANCELLED, CANCEL_DETACHED, CANCEL_NOT_SUBSCRIBED
 
 logger = logging.getLogger(__name__)
 reports_router = Router()
@@ -36,40 +37,30 @@ async def reports_menu(callback: CallbackQuery):
 async def monthly_delivered_report(callback: CallbackQuery):
     """Отчет по доставленным товарам за месяц"""
     async with async_session_maker() as session:
+        stats_repo = StatsRepository(session)
+        
         # Получаем текущий месяц
         now = datetime.utcnow()
         current_month = now.month
         current_year = now.year
         
-        # Статистика доставленных товаров за текущий месяц
-        query = select(func.count(Product.id)).where(
-            Product.status == "DELIVERED",
-            extract('month', Product.updated_at) == current_month,
-            extract('year', Product.updated_at) == current_year
-        )
-        result = await session.execute(query)
-        delivered_count = result.scalar() or 0
+        # Сводка за последние 6 месяцев одним запросом
+        first_year, first_month = add_months(current_year, current_month, -5)
+        start, _ = month_range(first_year, first_month)
+        _, end = month_range(current_year, current_month)
+        summary = await stats_repo.summarize_by_month(start.date(), end.date())
         
-        # Статистика по месяцам за последние 6 месяцев
         monthly_stats = []
         for i in range(6):
-            month_date = now - timedelta(days=30*i)
-            month = month_date.month
-            year = month_date.year
-            
-            query = select(func.count(Product.id)).where(
-                Product.status == "DELIVERED",
-                extract('month', Product.updated_at) == month,
-                extract('year', Product.updated_at) == year
-            )
-            result = await session.execute(query)
-            count = result.scalar() or 0
-            
+            year, month = add_months(current_year, current_month, -i)
+            delivered = summary.get((year, month), {}).get(ProductStatus.DELIVERED, {})
             monthly_stats.append({
                 "period": f"{month:02d}.{year}",
-                "delivered": count
+                "delivered": delivered.get("entered_count", 0)
             })
         
+        delivered_count = monthly_stats[0]["delivered"]
+        
         # Формируем отчет
         report_text = f"📦 Отчет по доставленным товарам\n\n"
         report_text += f"Текущий месяц ({current_month:02d}.{current_year}):\n"
@@ -90,59 +81,38 @@ async def monthly_delivered_report(callback: CallbackQuery):
 async def monthly_received_report(callback: CallbackQuery):
     """Отчет по принятым товарам за месяц"""
     async with async_session_maker() as session:
+        stats_repo = StatsRepository(session)
+        
         now = datetime.utcnow()
         current_month = now.month
         current_year = now.year
+        start, end = month_range(current_year, current_month)
         
-        # Статистика принятых товаров (прибывших в TJ)
-        query = select(func.count(Product.id)).where(
-            Product.status == "ARRIVED_TJ",
-            extract('month', Product.arrival_date) == current_month,
-            extract('year', Product.arrival_date) == current_year
-        )
-        result = await session.execute(query)
-        received_count = result.scalar() or 0
-        
-        # Статистика по статусам за текущий месяц
-        status_query = select(
-            Product.status,
-            func.count(Product.id).label('count')
-        ).where(
-            extract('month', Product.created_at) == current_month,
-            extract('year', Product.created_at) == current_year
-        ).group_by(Product.status)
+        summary = await stats_repo.summarize_by_month(start.date(), end.date())
+        by_status = summary.get((current_year, current_month), {})
         
-        result = await session.execute(status_query)
-        status_stats = result.all()
+        # Принятые товары (перешедшие на склад в Таджикистане в этом месяце)
+        received_count = by_status.get(ProductStatus.TAJIKISTAN_WAREHOUSE, {}).get("entered_count", 0)
         
         # Формируем отчет
         report_text = f"📥 Отчет по принятым товарам\n\n"
         report_text += f"Текущий месяц ({current_month:02d}.{current_year}):\n"
         report_text += f"  • Принято товаров: {received_count}\n\n"
         
+        # Текущие статусы товаров, созданных в этом месяце
         report_text += "📊 Распределение по статусам:\n"
-        for status, count in status_stats:
-            if status:
-                report_text += f"  • {status}: {count} товаров\n"
+        for status, values in by_status.items():
+            if values["product_count"]:
+                report_text += f"  • {status.value}: {values['product_count']} товаров\n"
         
         # Средние показатели
-        avg_query = select(
-            func.avg(Product.quantity).label('avg_quantity'),
-            func.avg(Product.total_value_usd).label('avg_value'),
-            func.avg(Product.weight_kg).label('avg_weight')
-        ).where(
-            extract('month', Product.created_at) == current_month,
-            extract('year', Product.created_at) == current_year
-        )
-        
-        result = await session.execute(avg_query)
-        avg_data = result.first()
-        
-        if avg_data:
+        totals = StatsRepository.merge_statuses(by_status)
+        count = totals["product_count"]
+        if count:
             report_text += f"\n📊 Средние показатели:\n"
-            report_text += f"  • Среднее количество: {avg_data.avg_quantity:.1f} шт.\n"
-            report_text += f"  • Средняя стоимость: ${avg_data.avg_value:.2f}\n"
-            report_text += f"  • Средний вес: {avg_data.avg_weight:.2f} кг\n"
+            report_text += f"  • Среднее количество: {totals['total_quantity'] / count:.1f} шт.\n"
+            report_text += f"  • Средняя стоимость: ${totals['total_value_usd'] / count:.2f}\n"
+            report_text += f"  • Средний вес: {totals['total_weight_kg'] / count:.2f} кг\n"
         
         await callback.message.edit_text(
             report_text,
@@ -153,81 +123,47 @@ async def monthly_received_report(callback: CallbackQuery):
 
 @reports_router.callback_query(F.data == "report_database_export")
 async def database_export(callback: CallbackQuery):
-    """Экспорт базы данных в Excel"""
-    async with async_session_maker() as session:
-        # Получаем все товары с информацией о пользователях
-        query = select(Product)
-        result = await session.execute(query)
-        products = result.scalars().all()
-        
-        if not products:
-            await callback.message.edit_text(
-                "❌ В базе данных нет товаров для экспорта",
-                reply_markup=get_back_to_admin_keyboard()
-            )
-            return
-        
-        # Создаем DataFrame
-        data = []
-        for product in products:
-            data.append({
-                "ID": product.id,
-                "Трек-код": product.track_code,
-                "Название": product.product_name,
-                "Категория": product.product_category,
-                "Количество": product.quantity,
-                "Цена за ед. ($)": product.unit_price_usd,
-                "Общая стоимость ($)": product.total_value_usd,
-                "Вес (кг)": product.weight_kg,
-                "Статус": product.status,
-                "Страна отправления": product.country_from,
-                "Тип доставки": product.delivery_type,
-                "Дата отправки": product.send_date,
-                "Дата прибытия": product.arrival_date,
-                "Хрупкий": "Да" if product.fragile else "Нет",
-                "Батарея": "Да" if product.has_battery else "Нет",
-                "Жидкость": "Да" if product.is_liquid else "Нет",
-                "Дата создания": product.created_at,
-                "Дата обновления": product.updated_at
-            })
-        
-        df = pd.DataFrame(data)
-        
-        # Создаем Excel файл в памяти
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Товары', index=False)
-            
-            # Добавляем лист со статистикой
-            stats_df = pd.DataFrame({
-                'Показатель': ['Всего товаров', 'Средняя стоимость', 'Средний вес', 'Общая стоимость'],
-                'Значение': [
-                    len(products),
-                    df['Общая стоимость ($)'].mean(),
-                    df['Вес (кг)'].mean(),
-                    df['Общая стоимость ($)'].sum()
-                ]
-            })
-            stats_df.to_excel(writer, sheet_name='Статистика', index=False)
-        
-        output.seek(0)
-        
-        # Отправляем файл
-        filename = f"database_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        await callback.message.answer_document(
-            document=("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", output, filename),
-            caption=f"📊 Экспорт базы данных\n"
-                   f"📅 Дата: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n"
-                   f"📦 Товаров: {len(products)}\n"
-                   f"💾 Файл: {filename}",
+    """Экспорт базы данных в Excel (в фоновой очереди отчетов)"""
+    await callback.answer()
+    
+    # Сообщение с меню становится сообщением прогресса
+    job_id, created = await report_job_queue.enqueue(
+        "database_export",
+        chat_id=callback.message.chat.id,
+        message_id=callback.message.message_id
+    )
+    await callback.message.edit_text(
+        queued_text("database_export", created),
+        reply_markup=get_report_cancel_keyboard(job_id)
+    )
+
+@reports_router.callback_query(F.data.startswith("report_cancel_"))
+async def cancel_report(callback: CallbackQuery):
+    """Отмена формируемого отчета (только получателем этого отчета)"""
+    if not settings.is_admin(callback.from_user.id):
+        await callback.answer("⛔ Доступ запрещен", show_alert=True)
+        return
+    
+    try:
+        job_id = int(callback.data.replace("report_cancel_", ""))
+    except ValueError:
+        await callback.answer()
+        return
+    
+    outcome = await report_job_queue.cancel(job_id, callback.message.chat.id)
+    if outcome == CANCEL_CANCELLED:
+        await callback.answer("🚫 Отчет отменяется...")
+    elif outcome == CANCEL_DETACHED:
+        # Отчет ждут другие администраторы: он строится дальше, но сюда не придет
+        await callback.message.edit_text(
+            "🚫 Отчет отменен для вас (другие администраторы его получат)",
             reply_markup=get_back_to_admin_keyboard()
         )
-        
-        # Удаляем старое сообщение с меню
-        await callback.message.delete()
-    
-    await callback.answer()
+        await callback.answer()
+    elif outcome == CANCEL_NOT_SUBSCRIBED:
+        await callback.answer("⛔ Это не ваш отчет", show_alert=True)
+    else:
+        await callback.answer("Отчет уже сформирован", show_alert=True)
 
 @reports_router.callback_query(F.data == "report_user_statistics")
 async def user_statistics_report(callback: CallbackQuery):
@@ -292,34 +228,26 @@ async def user_statistics_report(callback: CallbackQuery):
 async def financial_report(callback: CallbackQuery):
     """Финансовый отчет"""
     async with async_session_maker() as session:
-        # Финансовая статистика по месяцам
+        stats_repo = StatsRepository(session)
+        
+        # Финансовая статистика по месяцам (последние 3 месяца)
         now = datetime.utcnow()
-        financial_stats = []
+        first_year, first_month = add_months(now.year, now.month, -2)
+        start, _ = month_range(first_year, first_month)
+        _, end = month_range(now.year, now.month)
+        summary = await stats_repo.summarize_by_month(start.date(), end.date())
         
-        for i in range(3):  # Последние 3 месяца
-            month_date = now - timedelta(days=30*i)
-            month = month_date.month
-            year = month_date.year
+        financial_stats = []
+        for i in range(3):
+            year, month = add_months(now.year, now.month, -i)
             
             # Товары созданные в этом месяце
-            query = select(
-                func.sum(Product.total_value_usd).label('total_value'),
-                func.sum(Product.quantity).label('total_quantity'),
-                func.count(Product.id).label('count')
-            ).where(
-                extract('month', Product.created_at) == month,
-                extract('year', Product.created_at) == year,
-                Product.total_value_usd.isnot(None)
-            )
-            
-            result = await session.execute(query)
-            stats = result.first()
-            
+            totals = StatsRepository.merge_statuses(summary.get((year, month), {}))
             financial_stats.append({
                 "period": f"{month:02d}.{year}",
-                "total_value": stats.total_value or 0,
-                "total_quantity": stats.total_quantity or 0,
-                "count": stats.count or 0
+                "total_value": totals["total_value_usd"],
+                "total_quantity": totals["total_quantity"],
+                "count": totals["product_count"]
             })
         
         # Формируем отчет
@@ -334,21 +262,15 @@ async def financial_report(callback: CallbackQuery):
             report_text += f"  • Общее количество: {stat['total_quantity']} ед.\n\n"
         
         # Общая статистика
-        total_query = select(
-            func.sum(Product.total_value_usd).label('total_all'),
-            func.count(Product.id).label('count_all')
-        ).where(Product.total_value_usd.isnot(None))
-        
-        result = await session.execute(total_query)
-        total_stats = result.first()
+        total_stats = await stats_repo.get_totals()
         
         report_text += "📊 Общая статистика:\n"
-        report_text += f"  • Всего товаров в базе: {total_stats.count_all}\n"
-        report_text += f"  • Общая стоимость всех товаров: ${total_stats.total_all or 0:.2f}\n"
+        report_text += f"  • Всего товаров в базе: {total_stats['product_count']}\n"
+        report_text += f"  • Общая стоимость всех товаров: ${total_stats['total_value_usd']:.2f}\n"
         
         await callback.message.edit_text(
             report_text,
             reply_markup=get_back_to_admin_keyboard()
         )
     
-    await callback.answer()
\ No newline at end of file
+    await callback.answer()
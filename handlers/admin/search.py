@@ -0,0 +1,71 @@
+"""
+Поиск товаров администратором
+"""
+import logging
+from html import escape
+from aiogram import Router, F
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, CallbackQuery
+
+from database.session import async_session_maker
+from database.repository import ProductRepository, SEARCH_LIMIT
+from utils.states import AdminStates
+from keyboards.admin import get_back_to_admin_keyboard
+from config import settings
+
+logger = logging.getLogger(__name__)
+search_router = Router()
+
+@search_router.callback_query(F.data == "admin_search")
+async def admin_search(callback: CallbackQuery, state: FSMContext):
+    """Начало поиска товаров"""
+    if not settings.is_admin(callback.from_user.id):
+        await callback.answer("⛔ Доступ запрещен", show_alert=True)
+        return
+    
+    await callback.message.edit_text(
+        "🔍 Поиск товаров\n\n"
+        "Введите трек-код (можно начало или часть) или слова из названия/описания товара:",
+        reply_markup=get_back_to_admin_keyboard()
+    )
+    await state.set_state(AdminStates.WAITING_SEARCH_QUERY)
+    await callback.answer()
+
+@search_router.message(AdminStates.WAITING_SEARCH_QUERY)
+async def process_search_query(message: Message, state: FSMContext):
+    """Выполнение поиска (можно искать несколько раз подряд)"""
+    if not settings.is_admin(message.from_user.id):
+        await state.clear()
+        return
+    
+    search_term = (message.text or "").strip()
+    if not search_term:
+        await message.answer("❌ Введите текст для поиска:", reply_markup=get_back_to_admin_keyboard())
+        return
+    
+    async with async_session_maker() as session:
+        product_repo = ProductRepository(session)
+        products = await product_repo.search_products(search_term, limit=SEARCH_LIMIT)
+    
+    if not products:
+        await message.answer(
+            f"❌ По запросу «{escape(search_term)}» ничего не найдено.\n\n"
+            "Введите другой запрос:",
+            parse_mode="HTML",
+            reply_markup=get_back_to_admin_keyboard()
+        )
+        return
+    
+    lines = [f"🔍 Результаты по запросу «{escape(search_term)}»: {len(products)}\n"]
+    for i, product in enumerate(products, 1):
+        status_text = product.status.value if product.status else "Не установлен"
+        name = escape(product.product_name or "Без названия")
+        lines.append(
+            f"{i}. <code>{escape(product.track_code)}</code> - {name}\n"
+            f"    {status_text} | {product.created_at.strftime('%d.%m.%Y') if product.created_at else '-'}"
+        )
+    if len(products) == SEARCH_LIMIT:
+        lines.append(f"\nПоказаны первые {SEARCH_LIMIT}. Уточните запрос, чтобы сузить поиск.")
+    lines.append("\nВведите новый запрос или вернитесь в админ-панель:")
+    
+    await message.answer("\n".join(lines), parse_mode="HTML", reply_markup=get_back_to_admin_keyboard())
@@ -2,15 +2,18 @@
 Обновление статусов товаров - ИСПРАВЛЕННАЯ ВЕРСИЯ
 """
 import logging
-from datetime import datetime
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, CallbackQuery
-from sqlalchemy import select, update
+from aiogram.types import Message, CallbackQuery, BufferedInputFile
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.models import Product
+from database.models import Product, ProductStatus
 from database.session import async_session_maker  # ИСПРАВЛЕННЫЙ ИМПОРТ
+from database.repository import ProductRepository, BulkUpdateResult
 from utils.states import AdminStates
 from keyboards.admin import (
     get_status_update_menu_keyboard, 
@@ -18,21 +21,31 @@ from keyboards.admin import (
     get_back_to_admin_keyboard
 )
 from config import settings
+from services.notifications import status_notifier
+from services.track_code import normalize_track_code, validate_track_code, invalid_track_code_text
 
 logger = logging.getLogger(__name__)
 update_status_router = Router()
 
-# Список доступных статусов
-PRODUCT_STATUSES = [
-    "CREATED",           # Создан
-    "IN_CHINA_WAREHOUSE", # На складе в Китае
-    "IN_TRANSIT",        # В пути
-    "ARRIVED_TJ",        # Прибыл в Таджикистан
-    "READY_FOR_PICKUP",  # Готов к выдаче
-    "DELIVERED",         # Доставлен
-    "CANCELLED",         # Отменен
-    "PROBLEM",           # Проблема
-]
+# Старые коды статусов с клавиатур, отправленных до перехода на ProductStatus
+LEGACY_STATUS_CODES = {
+    "IN_CHINA_WAREHOUSE": ProductStatus.CHINA_WAREHOUSE,
+    "ARRIVED_TJ": ProductStatus.TAJIKISTAN_WAREHOUSE,
+    "READY_FOR_PICKUP": ProductStatus.TAJIKISTAN_WAREHOUSE,
+}
+
+# Сколько ненайденных трек-кодов показывать в сообщении
+MISSING_CODES_PREVIEW = 30
+
+def parse_status(code: str) -> Optional[ProductStatus]:
+    """Статус по коду из callback_data"""
+    if code in ProductStatus.__members__:
+        return ProductStatus[code]
+    return LEGACY_STATUS_CODES.get(code)
+
+def parse_track_codes(text: str) -> List[str]:
+    """Трек-коды из текста (через пробел, запятую, точку с запятой или с новой строки)"""
+    return [normalize_track_code(code) for code in re.split(r"[\s,;]+", text or "") if code]
 
 @update_status_router.callback_query(F.data == "admin_update_status")
 async def update_status_menu(callback: CallbackQuery):
@@ -61,7 +74,14 @@ async def update_by_track(callback: CallbackQuery, state: FSMContext):
 @update_status_router.message(AdminStates.WAITING_TRACK_FOR_UPDATE)
 async def process_track_for_update(message: Message, state: FSMContext):
     """Обработка введенного трек-кода"""
-    track_code = message.text.strip()
+    track_code, reason = validate_track_code(message.text or "")
+    if reason:
+        await message.answer(
+            invalid_track_code_text(message.text or "", reason, "ru") + "\nПопробуйте еще раз:",
+            reply_markup=get_back_to_admin_keyboard(),
+            parse_mode="HTML"
+        )
+        return
     
     # ИСПРАВЛЕННАЯ СЕССИЯ
     async with async_session_maker() as session:
@@ -82,7 +102,7 @@ async def process_track_for_update(message: Message, state: FSMContext):
         await state.update_data(
             product_id=product.id,
             track_code=track_code,
-            current_status=product.status
+            current_status=product.status.value if product.status else None
         )
         
         # Показываем текущий статус и предлагаем новый
@@ -90,7 +110,7 @@ async def process_track_for_update(message: Message, state: FSMContext):
             f"📦 Товар найден:\n"
             f"Код: {product.track_code}\n"
             f"Название: {product.product_name or 'Не указано'}\n"
-            f"Текущий статус: {product.status or 'Не установлен'}\n\n"
+            f"Текущий статус: {product.status.value if product.status else 'Не установлен'}\n\n"
             f"Выберите новый статус:",
             reply_markup=get_status_keyboard()
         )
@@ -100,7 +120,7 @@ async def process_track_for_update(message: Message, state: FSMContext):
 @update_status_router.callback_query(F.data.startswith("set_status_"))
 async def set_new_status(callback: CallbackQuery, state: FSMContext):
     """Установка нового статуса"""
-    new_status = callback.data.replace("set_status_", "")
+    new_status = parse_status(callback.data.replace("set_status_", ""))
     
     # Получаем данные из состояния
     data = await state.get_data()
@@ -108,43 +128,38 @@ async def set_new_status(callback: CallbackQuery, state: FSMContext):
     track_code = data.get("track_code")
     current_status = data.get("current_status")
     
-    if not product_id:
+    if not product_id or not new_status:
         await callback.message.edit_text("❌ Ошибка: данные о товаре не найдены")
         await callback.answer()
         return
     
-    # ИСПРАВЛЕННАЯ СЕССИЯ
-    async with async_session_maker() as session:
-        # Обновляем статус
-        stmt = update(Product).where(Product.id == product_id).values(
-            status=new_status,
-            updated_at=datetime.utcnow()
+    # Если статус "Прибыл в Таджикистан", спрашиваем дату прибытия
+    if new_status == ProductStatus.TAJIKISTAN_WAREHOUSE:
+        await callback.message.edit_text(
+            f"✅ Статус будет изменен с '{current_status}' на '{new_status.value}'\n\n"
+            f"Введите дату прибытия в формате ДД.ММ.ГГГГ ЧЧ:ММ\n"
+            f"Например: 05.02.2026 14:30\n"
+            f"Или введите 'Пропустить', чтобы установить текущее время:",
+            reply_markup=get_back_to_admin_keyboard()
         )
+        await state.update_data(new_status=new_status.name)
+        await state.set_state(AdminStates.WAITING_ARRIVAL_DATE)
+    else:
+        async with async_session_maker() as session:
+            product_repo = ProductRepository(session)
+            await product_repo.bulk_update_status_by_ids([product_id], new_status)
+        status_notifier.wake()
         
-        # Если статус "Прибыл в Таджикистан", спрашиваем дату прибытия
-        if new_status == "ARRIVED_TJ":
-            await callback.message.edit_text(
-                f"✅ Статус изменен с '{current_status}' на '{new_status}'\n\n"
-                f"Введите дату прибытия в формате ДД.ММ.ГГГГ ЧЧ:ММ\n"
-                f"Например: 05.02.2026 14:30\n"
-                f"Или нажмите 'Пропустить', чтобы установить текущее время:",
-                reply_markup=get_back_to_admin_keyboard()
-            )
-            await state.update_data(new_status=new_status)
-            await state.set_state(AdminStates.WAITING_ARRIVAL_DATE)
-        else:
-            await session.execute(stmt)
-            await session.commit()
-            
-            await callback.message.edit_text(
-                f"✅ Статус успешно обновлен!\n\n"
-                f"Трек-код: {track_code}\n"
-                f"Старый статус: {current_status}\n"
-                f"Новый статус: {new_status}",
-                reply_markup=get_back_to_admin_keyboard()
-            )
-        
-        await callback.answer()
+        await callback.message.edit_text(
+            f"✅ Статус успешно обновлен!\n\n"
+            f"Трек-код: {track_code}\n"
+            f"Старый статус: {current_status}\n"
+            f"Новый статус: {new_status.value}",
+            reply_markup=get_back_to_admin_keyboard()
+        )
+        await state.clear()
+    
+    await callback.answer()
 
 @update_status_router.message(AdminStates.WAITING_ARRIVAL_DATE)
 async def process_arrival_date(message: Message, state: FSMContext):
@@ -156,7 +171,7 @@ async def process_arrival_date(message: Message, state: FSMContext):
     product_id = data.get("product_id")
     track_code = data.get("track_code")
     current_status = data.get("current_status")
-    new_status = data.get("new_status")
+    new_status = parse_status(data.get("new_status", ""))
     
     arrival_date = None
     
@@ -174,31 +189,22 @@ async def process_arrival_date(message: Message, state: FSMContext):
             )
             return
     
-    # ИСПРАВЛЕННАЯ СЕССИЯ
+    # Обновляем статус и дату прибытия (без даты - текущее время)
     async with async_session_maker() as session:
-        # Обновляем статус и дату прибытия
-        update_values = {
-            "status": new_status,
-            "updated_at": datetime.utcnow()
-        }
-        
-        if arrival_date:
-            update_values["arrival_date"] = arrival_date
-        
-        stmt = update(Product).where(Product.id == product_id).values(**update_values)
-        await session.execute(stmt)
-        await session.commit()
-        
-        date_info = f"Дата прибытия: {arrival_date.strftime('%d.%m.%Y %H:%M')}" if arrival_date else "Дата прибытия: текущее время"
-        
-        await message.answer(
-            f"✅ Статус успешно обновлен!\n\n"
-            f"Трек-код: {track_code}\n"
-            f"Старый статус: {current_status}\n"
-            f"Новый статус: {new_status}\n"
-            f"{date_info}",
-            reply_markup=get_back_to_admin_keyboard()
-        )
+        product_repo = ProductRepository(session)
+        await product_repo.bulk_update_status_by_ids([product_id], new_status, arrival_date=arrival_date)
+    status_notifier.wake()
+    
+    date_info = f"Дата прибытия: {arrival_date.strftime('%d.%m.%Y %H:%M')}" if arrival_date else "Дата прибытия: текущее время"
+    
+    await message.answer(
+        f"✅ Статус успешно обновлен!\n\n"
+        f"Трек-код: {track_code}\n"
+        f"Старый статус: {current_status}\n"
+        f"Новый статус: {new_status.value}\n"
+        f"{date_info}",
+        reply_markup=get_back_to_admin_keyboard()
+    )
     
     await state.clear()
 
@@ -230,76 +236,160 @@ async def process_date_for_bulk_update(message: Message, state: FSMContext):
         )
         return
     
-    # ИСПРАВЛЕННАЯ СЕССИЯ
+    day_start = datetime.combine(target_date, datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+    
     async with async_session_maker() as session:
-        # Ищем товары по дате отправки
-        query = select(Product).where(
-            Product.send_date >= target_date,
-            Product.send_date < target_date.replace(day=target_date.day + 1)
-        )
-        result = await session.execute(query)
-        products = result.scalars().all()
-        
-        if not products:
-            await message.answer(
-                f"❌ Не найдено товаров отправленных {date_text}",
-                reply_markup=get_back_to_admin_keyboard()
-            )
-            return
-        
-        # Сохраняем найденные товары
-        product_ids = [p.id for p in products]
-        await state.update_data(
-            bulk_product_ids=product_ids,
-            bulk_date=date_text,
-            found_count=len(products)
-        )
-        
+        product_repo = ProductRepository(session)
+        found_count = await product_repo.count_by_send_date(day_start, day_end)
+    
+    if not found_count:
         await message.answer(
-            f"📋 Найдено товаров: {len(products)}\n"
-            f"Дата отправки: {date_text}\n\n"
-            "Выберите новый статус для всех товаров:",
-            reply_markup=get_status_keyboard(is_bulk=True)
+            f"❌ Не найдено товаров отправленных {date_text}",
+            reply_markup=get_back_to_admin_keyboard()
         )
-        
-        await state.set_state(AdminStates.WAITING_BULK_STATUS)
+        return
+    
+    # В состоянии храним только дату - товары выбираются одним UPDATE
+    await state.update_data(
+        bulk_date=date_text,
+        found_count=found_count
+    )
+    
+    await message.answer(
+        f"📋 Найдено товаров: {found_count}\n"
+        f"Дата отправки: {date_text}\n\n"
+        "Выберите новый статус для всех товаров:",
+        reply_markup=get_status_keyboard(is_bulk=True)
+    )
+    
+    await state.set_state(AdminStates.WAITING_BULK_STATUS)
 
 @update_status_router.callback_query(F.data.startswith("bulk_status_"))
 async def process_bulk_status_update(callback: CallbackQuery, state: FSMContext):
-    """Массовое обновление статусов"""
-    new_status = callback.data.replace("bulk_status_", "")
+    """Массовое обновление статусов товаров, отправленных в выбранную дату"""
+    new_status = parse_status(callback.data.replace("bulk_status_", ""))
     
     # Получаем данные из состояния
     data = await state.get_data()
-    product_ids = data.get("bulk_product_ids", [])
+    date_text = data.get("bulk_date")
     found_count = data.get("found_count", 0)
     
-    if not product_ids:
+    if not date_text or not new_status:
         await callback.message.edit_text("❌ Не найдено товаров для обновления")
         await callback.answer()
         return
     
-    # ИСПРАВЛЕННАЯ СЕССИЯ
+    day_start = datetime.strptime(date_text, "%d.%m.%Y")
+    day_end = day_start + timedelta(days=1)
+    
     async with async_session_maker() as session:
-        # Массовое обновление
-        updated_count = 0
-        for product_id in product_ids:
-            stmt = update(Product).where(Product.id == product_id).values(
-                status=new_status,
-                updated_at=datetime.utcnow()
-            )
-            await session.execute(stmt)
-            updated_count += 1
-        
-        await session.commit()
-        
-        await callback.message.edit_text(
-            f"✅ Массовое обновление завершено!\n\n"
-            f"Всего найдено: {found_count}\n"
-            f"Обновлено: {updated_count}\n"
-            f"Новый статус: {new_status}",
+        product_repo = ProductRepository(session)
+        updated_count = await product_repo.update_status_by_send_date(day_start, day_end, new_status)
+    status_notifier.wake()
+    
+    await callback.message.edit_text(
+        f"✅ Массовое обновление завершено!\n\n"
+        f"Всего найдено: {found_count}\n"
+        f"Обновлено: {updated_count}\n"
+        f"Новый статус: {new_status.value}",
+        reply_markup=get_back_to_admin_keyboard()
+    )
+    
+    await state.clear()
+    await callback.answer()
+
+# ========== МАССОВОЕ ОБНОВЛЕНИЕ ПО СПИСКУ ТРЕК-КОДОВ ==========
+
+@update_status_router.callback_query(F.data == "update_bulk")
+async def update_bulk(callback: CallbackQuery, state: FSMContext):
+    """Массовое обновление по списку трек-кодов"""
+    await callback.message.edit_text(
+        "📋 Массовое обновление по списку трек-кодов\n\n"
+        "Выберите новый статус:",
+        reply_markup=get_status_keyboard(prefix="codes_status_")
+    )
+    await callback.answer()
+
+@update_status_router.callback_query(F.data.startswith("codes_status_"))
+async def bulk_codes_status_selected(callback: CallbackQuery, state: FSMContext):
+    """Статус выбран - ждем список трек-кодов"""
+    new_status = parse_status(callback.data.replace("codes_status_", ""))
+    if not new_status:
+        await callback.answer("❌ Неизвестный статус", show_alert=True)
+        return
+    
+    await state.update_data(bulk_status=new_status.name)
+    await callback.message.edit_text(
+        f"Новый статус: {new_status.value}\n\n"
+        "Отправьте трек-коды сообщением (через пробел, запятую или с новой строки) "
+        "или файлом .txt / .csv со списком кодов:",
+        reply_markup=get_back_to_admin_keyboard()
+    )
+    await state.set_state(AdminStates.WAITING_BULK_TRACK_CODES)
+    await callback.answer()
+
+@update_status_router.message(AdminStates.WAITING_BULK_TRACK_CODES)
+async def process_bulk_track_codes(message: Message, state: FSMContext):
+    """Обновление статуса по вставленному списку трек-кодов"""
+    data = await state.get_data()
+    new_status = parse_status(data.get("bulk_status", ""))
+    if not new_status:
+        await state.clear()
+        await message.answer("❌ Статус не выбран", reply_markup=get_back_to_admin_keyboard())
+        return
+    
+    if message.document:
+        file = await message.bot.download(message.document)
+        text = file.read().decode("utf-8-sig", errors="ignore")
+    else:
+        text = message.text or ""
+    
+    track_codes = parse_track_codes(text)
+    if not track_codes:
+        await message.answer(
+            "❌ Трек-коды не найдены. Отправьте список еще раз:",
             reply_markup=get_back_to_admin_keyboard()
         )
+        return
+    
+    async with async_session_maker() as session:
+        product_repo = ProductRepository(session)
+        result = await product_repo.bulk_update_status(track_codes, new_status)
+    status_notifier.wake()
+    
+    logger.info(
+        f"Массовое обновление статуса {new_status.name}: "
+        f"обновлено {result.updated_count}, не найдено {len(result.missing_codes)}"
+    )
+    await message.answer(
+        format_bulk_result(result, new_status),
+        reply_markup=get_back_to_admin_keyboard()
+    )
+    
+    # Полный список ненайденных кодов - файлом
+    if len(result.missing_codes) > MISSING_CODES_PREVIEW:
+        await message.answer_document(
+            BufferedInputFile(
+                "\n".join(result.missing_codes).encode("utf-8"),
+                filename="missing_track_codes.txt"
+            ),
+            caption=f"❓ Не найдено трек-кодов: {len(result.missing_codes)}"
+        )
     
     await state.clear()
-    await callback.answer()
\ No newline at end of file
+
+def format_bulk_result(result: BulkUpdateResult, new_status: ProductStatus) -> str:
+    """Текст отчета о массовом обновлении"""
+    text = (
+        f"✅ Массовое обновление завершено!\n\n"
+        f"Новый статус: {new_status.value}\n"
+        f"Обновлено: {result.updated_count}\n"
+        f"Не найдено: {len(result.missing_codes)}"
+    )
+    if result.missing_codes:
+        preview = result.missing_codes[:MISSING_CODES_PREVIEW]
+        text += "\n\n❓ Не найдены:\n" + "\n".join(preview)
+        if len(result.missing_codes) > len(preview):
+            text += f"\n... и еще {len(result.missing_codes) - len(preview)}"
+    return text
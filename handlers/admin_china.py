@@ -1,156 +1,248 @@
+from typing import Optional
+import html
 import logging
+import os
+import tempfile
 from aiogram import Router, F
-from aiogram.types import Message
+from aiogram.types import Message, BufferedInputFile, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
-from database.session import get_db
-from database.repository import UserRepository
+from config import settings
+from database.models import User
 from keyboards.admin import get_admin_main_menu
 from keyboards.client import get_back_cancel_keyboard  # Импорт из client.py
 from utils.states import AdminChinaState
+from services.manifest import MANIFEST_EXTENSIONS, ManifestError, import_manifest
+from services.notifications import status_notifier
+from services.track_code import generate_track_codes
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Лимит Bot API на скачивание файлов
+MAX_DOWNLOAD_SIZE = 20 * 1024 * 1024
+
+# Сколько проблемных строк манифеста показать в сообщении (остальные - в файле отчета)
+MANIFEST_PREVIEW = 15
+
 @router.message(AdminChinaState.main_menu, F.text.contains("⬅️"))
-async def admin_china_back(message: Message, state: FSMContext):
+async def admin_china_back(message: Message, state: FSMContext, user: Optional[User] = None):
     """Возврат в главное меню админа Китая"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "Главное меню админа Китая:",
-            "tj": "Менюи асосии админи Чин:"
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_admin_main_menu("admin_cn", user.language)
-        )
-        await state.set_state(AdminChinaState.main_menu)
+    if not user:
+        return
+    
+    texts = {
+        "ru": "Главное меню админа Китая:",
+        "tj": "Менюи асосии админи Чин:"
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_admin_main_menu("admin_cn", user.language)
+    )
+    await state.set_state(AdminChinaState.main_menu)
+
+@router.callback_query(F.data == "admin_china_warehouse")
+async def admin_china_warehouse(callback: CallbackQuery, state: FSMContext, user: Optional[User] = None):
+    """Вход в меню склада Китая из админ-панели"""
+    if not settings.is_admin(callback.from_user.id):
+        await callback.answer("⛔ Доступ запрещен", show_alert=True)
+        return
+    
+    language = user.language if user else "ru"
+    texts = {
+        "ru": "🇨🇳 Склад в Китае. Загрузка манифеста - кнопка «➕ Добавить товары».",
+        "tj": "🇨🇳 Анбор дар Чин. Боргузории манифест - тугмаи «➕ Илова кардани маҳсулот»."
+    }
+    
+    await callback.message.answer(
+        texts[language],
+        reply_markup=get_admin_main_menu("admin_cn", language)
+    )
+    await state.set_state(AdminChinaState.main_menu)
+    await callback.answer()
+
+@router.callback_query(F.data == "admin_add_product")
+async def admin_add_product(callback: CallbackQuery, state: FSMContext, user: Optional[User] = None):
+    """Кнопка «Добавить трек-код» админ-панели: загрузка манифеста или коды для этикеток"""
+    if not settings.is_admin(callback.from_user.id):
+        await callback.answer("⛔ Доступ запрещен", show_alert=True)
+        return
+    
+    await add_products_start(callback.message, state, user=user)
+    await callback.answer()
 
 @router.message(AdminChinaState.main_menu, F.text.contains("➕"))
-async def add_products_start(message: Message, state: FSMContext):
+async def add_products_start(message: Message, state: FSMContext, user: Optional[User] = None):
     """Начало добавления товаров"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "➕ <b>Добавление товаров</b>\n\n"
-                  "Введите количество товаров для добавления (1-100):",
-            "tj": "➕ <b>Илова кардани маҳсулотҳо</b>\n\n"
-                  "Миқдори маҳсулотҳоро барои илова кардан ворид кунед (1-100):"
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_back_cancel_keyboard(user.language),
-            parse_mode="HTML"
+    if not user:
+        return
+    
+    columns = (
+        "<code>Трек-код; Телефон; Telegram ID; Название; Категория; "
+        "Количество; Цена; Вес; Габариты</code>"
+    )
+    texts = {
+        "ru": "➕ <b>Добавление товаров</b>\n\n"
+              "Отправьте манифест файлом CSV или XLSX. Первая строка - заголовки:\n"
+              f"{columns}\n\n"
+              "Владелец - по телефону или Telegram ID (должен быть зарегистрирован в боте). "
+              "Трек-код обязателен: по нему повторная загрузка пропускает уже добавленные товары. "
+              "Габариты - ДxШxВ в см.\n\n"
+              "Нет кода перевозчика - введите число (1-100), чтобы получить трек-коды для этикеток.",
+        "tj": "➕ <b>Илова кардани маҳсулотҳо</b>\n\n"
+              "Манифестро бо файли CSV ё XLSX фиристед. Сатри аввал - сарлавҳаҳо:\n"
+              f"{columns}\n\n"
+              "Соҳиб - аз рӯи телефон ё Telegram ID (бояд дар бот сабт шуда бошад). "
+              "Рамз ҳатмист: аз рӯи он боргузории такрорӣ маҳсулоти иловашударо мегузарад. "
+              "Андозаҳо - ДxПxБ бо см.\n\n"
+              "Рамзи интиқолдиҳанда нест - рақам (1-100) ворид кунед, то рамзҳо барои тамғаҳо гиред."
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_back_cancel_keyboard(user.language),
+        parse_mode="HTML"
+    )
+    await state.set_state(AdminChinaState.add_product)
+
+async def import_manifest_document(message: Message, user: User):
+    """Загрузка товаров из присланного манифеста"""
+    document = message.document
+    filename = document.file_name or ""
+    extension = os.path.splitext(filename.lower())[1]
+    if extension not in MANIFEST_EXTENSIONS:
+        await message.answer(f"❌ Поддерживаются файлы {', '.join(MANIFEST_EXTENSIONS)}")
+        return
+    if document.file_size and document.file_size > MAX_DOWNLOAD_SIZE:
+        await message.answer("❌ Файл больше 20 МБ - разделите манифест на части")
+        return
+    
+    progress = await message.answer("⏳ Загрузка манифеста...")
+    handle, path = tempfile.mkstemp(prefix="manifest-", suffix=extension)
+    os.close(handle)
+    try:
+        await message.bot.download(document, destination=path)
+        result = await import_manifest(path, filename, max_rows=settings.MANIFEST_MAX_ROWS)
+    except ManifestError as e:
+        await progress.edit_text(f"❌ {e}")
+        return
+    except Exception as e:
+        logger.error(f"Ошибка загрузки манифеста {filename}: {e}", exc_info=True)
+        await progress.edit_text(
+            "❌ Ошибка при загрузке манифеста. Уже добавленные строки сохранены - "
+            "повторная загрузка пропустит их как существующие."
+        )
+        return
+    finally:
+        os.remove(path)
+    
+    if result.notified:
+        status_notifier.wake()
+    
+    texts = {
+        "ru": f"✅ <b>Манифест загружен</b> ({result.seconds:.1f} с)\n\n"
+              f"📄 Строк: {result.rows}\n"
+              f"➕ Добавлено товаров: {result.inserted}\n"
+              f"⚠️ Уже существуют: {result.conflicts}\n"
+              f"❌ Ошибок: {result.errors}",
+        "tj": f"✅ <b>Манифест бор карда шуд</b> ({result.seconds:.1f} с)\n\n"
+              f"📄 Сатрҳо: {result.rows}\n"
+              f"➕ Маҳсулот илова шуд: {result.inserted}\n"
+              f"⚠️ Аллакай мавҷуданд: {result.conflicts}\n"
+              f"❌ Хатогиҳо: {result.errors}"
+    }
+    text = texts[user.language]
+    if result.truncated:
+        text += f"\n\n⚠️ Загружены только первые {settings.MANIFEST_MAX_ROWS} строк"
+    
+    problems = result.problems()[:MANIFEST_PREVIEW]
+    if problems:
+        text += "\n\n" + "\n".join(
+            f"• {line}: {html.escape(track_code[:50])} - {html.escape(outcome)}" for line, track_code, outcome in problems
+        )
+    await progress.edit_text(text, parse_mode="HTML")
+    
+    # Полный отчет по строкам нужен при ошибках
+    if result.problems():
+        await message.answer_document(
+            BufferedInputFile(result.report_csv(), filename=f"{os.path.splitext(filename)[0]}-result.csv")
         )
-        await state.set_state(AdminChinaState.add_product)
 
 @router.message(AdminChinaState.add_product)
-async def add_products_process(message: Message, state: FSMContext):
+async def add_products_process(message: Message, state: FSMContext, user: Optional[User] = None):
     """Обработка добавления товаров"""
     if message.text in ["⬅️ Назад", "⬅️ Бозгашт", "❌ Отмена", "❌ Бекор кардан"]:
-        await admin_china_back(message, state)
+        await admin_china_back(message, state, user=user)
         return
     
-    if not message.text.isdigit() or not (1 <= int(message.text) <= 100):
-        async for session in get_db():
-            user_repo = UserRepository(session)
-            user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-            
-            if not user:
-                return
-            
-            texts = {
-                "ru": "Пожалуйста, введите число от 1 до 100:",
-                "tj": "Лутфан, рақами аз 1 то 100 ворид кунед:"
-            }
-            
-            await message.answer(texts[user.language])
-            return
+    if not user:
+        return
     
-    count = int(message.text)
+    if message.document:
+        await import_manifest_document(message, user)
+        return
     
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        from services.track_code import generate_track_code
-        
-        track_codes = []
-        for i in range(count):
-            track_code = generate_track_code()
-            track_codes.append(track_code)
-        
+    if not message.text or not message.text.isdigit() or not (1 <= int(message.text) <= 100):
         texts = {
-            "ru": f"✅ Будет создано {count} товаров с трек-кодами:\n\n" + "\n".join(track_codes),
-            "tj": f"✅ {count} маҳсулот бо рамзҳои тамошобин сохта мешавад:\n\n" + "\n".join(track_codes)
+            "ru": "Отправьте файл манифеста или введите число от 1 до 100:",
+            "tj": "Файли манифестро фиристед ё рақами аз 1 то 100 ворид кунед:"
         }
         
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_admin_main_menu("admin_cn", user.language)
-        )
-        await state.set_state(AdminChinaState.main_menu)
+        await message.answer(texts[user.language])
+        return
+    
+    count = int(message.text)
+    
+    track_codes = await generate_track_codes(count)
+    
+    texts = {
+        "ru": f"✅ Трек-коды для этикеток ({count}):\n\n" + "\n".join(track_codes),
+        "tj": f"✅ Рамзҳои тамошобин барои тамғаҳо ({count}):\n\n" + "\n".join(track_codes)
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_admin_main_menu("admin_cn", user.language)
+    )
+    await state.set_state(AdminChinaState.main_menu)
 
 @router.message(AdminChinaState.main_menu, F.text.contains("🔄"))
-async def bulk_update_start(message: Message):
+async def bulk_update_start(message: Message, user: Optional[User] = None):
     """Массовое обновление статусов"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "🔄 <b>Массовое обновление статусов</b>\n\n"
-                  "Функция в разработке...",
-            "tj": "🔄 <b>Навсозии оммавии статусҳо</b>\n\n"
-                  "Функсия дар рушд аст..."
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_admin_main_menu("admin_cn", user.language),
-            parse_mode="HTML"
-        )
+    if not user:
+        return
+    
+    texts = {
+        "ru": "🔄 <b>Массовое обновление статусов</b>\n\n"
+              "Функция в разработке...",
+        "tj": "🔄 <b>Навсозии оммавии статусҳо</b>\n\n"
+              "Функсия дар рушд аст..."
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_admin_main_menu("admin_cn", user.language),
+        parse_mode="HTML"
+    )
 
 @router.message(AdminChinaState.main_menu, F.text.contains("📊"))
-async def reports_menu(message: Message, state: FSMContext):
+async def reports_menu(message: Message, state: FSMContext, user: Optional[User] = None):
     """Меню отчетов"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "📊 <b>Отчеты</b>\n\nФункция в разработке...",
-            "tj": "📊 <b>Ҳисоботҳо</b>\n\nФунксия дар рушд аст..."
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_admin_main_menu("admin_cn", user.language),
-            parse_mode="HTML"
-        )
-        await state.set_state(AdminChinaState.main_menu)
+    if not user:
+        return
+    
+    texts = {
+        "ru": "📊 <b>Отчеты</b>\n\nФункция в разработке...",
+        "tj": "📊 <b>Ҳисоботҳо</b>\n\nФунксия дар рушд аст..."
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_admin_main_menu("admin_cn", user.language),
+        parse_mode="HTML"
+    )
+    await state.set_state(AdminChinaState.main_menu)
 @router.message(AdminChinaState.main_menu, F.text.contains("🔍"))
 async def check_product_china(message: Message, state: FSMContext):
     """Проверка товара для админа Китая"""
@@ -1,10 +1,11 @@
+from typing import Optional
 import logging
 from aiogram import Router, F
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
-from database.session import get_db
-from database.repository import UserRepository
+from config import settings
+from database.models import User
 from keyboards.admin import get_admin_main_menu
 from keyboards.client import get_back_cancel_keyboard  # Импорт из client.py
 from utils.states import AdminTajikistanState
@@ -13,112 +14,112 @@ logger = logging.getLogger(__name__)
 router = Router()
 
 @router.message(AdminTajikistanState.main_menu, F.text.contains("⬅️"))
-async def admin_tj_back(message: Message, state: FSMContext):
+async def admin_tj_back(message: Message, state: FSMContext, user: Optional[User] = None):
     """Возврат в главное меню админа Таджикистана"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "Главное меню админа Таджикистана:",
-            "tj": "Менюи асосии админи Тоҷикистон:"
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_admin_main_menu("admin_tj", user.language)
-        )
-        await state.set_state(AdminTajikistanState.main_menu)
+    if not user:
+        return
+    
+    texts = {
+        "ru": "Главное меню админа Таджикистана:",
+        "tj": "Менюи асосии админи Тоҷикистон:"
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_admin_main_menu("admin_tj", user.language)
+    )
+    await state.set_state(AdminTajikistanState.main_menu)
+
+@router.callback_query(F.data == "admin_tj_warehouse")
+async def admin_tj_warehouse(callback: CallbackQuery, state: FSMContext, user: Optional[User] = None):
+    """Вход в меню склада Таджикистана из админ-панели"""
+    if not settings.is_admin(callback.from_user.id):
+        await callback.answer("⛔ Доступ запрещен", show_alert=True)
+        return
+    
+    language = user.language if user else "ru"
+    texts = {
+        "ru": "Главное меню админа Таджикистана:",
+        "tj": "Менюи асосии админи Тоҷикистон:"
+    }
+    
+    await callback.message.answer(
+        texts[language],
+        reply_markup=get_admin_main_menu("admin_tj", language)
+    )
+    await state.set_state(AdminTajikistanState.main_menu)
+    await callback.answer()
 
 @router.message(AdminTajikistanState.main_menu, F.text.contains("✅"))
-async def confirm_arrival_start(message: Message):
+async def confirm_arrival_start(message: Message, user: Optional[User] = None):
     """Подтверждение прибытия товара"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "✅ <b>Подтверждение прибытия</b>\n\n"
-                  "Функция в разработке...",
-            "tj": "✅ <b>Тасдиқ кардани омадан</b>\n\n"
-                  "Функсия дар рушд аст..."
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_admin_main_menu("admin_tj", user.language),
-            parse_mode="HTML"
-        )
+    if not user:
+        return
+    
+    texts = {
+        "ru": "✅ <b>Подтверждение прибытия</b>\n\n"
+              "Функция в разработке...",
+        "tj": "✅ <b>Тасдиқ кардани омадан</b>\n\n"
+              "Функсия дар рушд аст..."
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_admin_main_menu("admin_tj", user.language),
+        parse_mode="HTML"
+    )
 
 @router.message(AdminTajikistanState.main_menu, F.text.contains("✏️"))
-async def update_status_start(message: Message):
+async def update_status_start(message: Message, user: Optional[User] = None):
     """Изменение статуса товара"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "✏️ <b>Изменение статуса</b>\n\n"
-                  "Функция в разработке...",
-            "tj": "✏️ <b>Тағйир додани статус</b>\n\n"
-                  "Функсия дар рушд аст..."
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_admin_main_menu("admin_tj", user.language),
-            parse_mode="HTML"
-        )
+    if not user:
+        return
+    
+    texts = {
+        "ru": "✏️ <b>Изменение статуса</b>\n\n"
+              "Функция в разработке...",
+        "tj": "✏️ <b>Тағйир додани статус</b>\n\n"
+              "Функсия дар рушд аст..."
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_admin_main_menu("admin_tj", user.language),
+        parse_mode="HTML"
+    )
 
 @router.message(AdminTajikistanState.main_menu, F.text.contains("🚚"))
-async def door_delivery_management(message: Message):
+async def door_delivery_management(message: Message, user: Optional[User] = None):
     """Управление доставкой до дверей"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "🚚 <b>Управление доставкой до дверей</b>\n\n"
-                  "Функция в разработке...",
-            "tj": "🚚 <b>Идоракунии расонидан то дар</b>\n\n"
-                  "Функсия дар рушд аст..."
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_admin_main_menu("admin_tj", user.language),
-            parse_mode="HTML"
-        )
+    if not user:
+        return
+    
+    texts = {
+        "ru": "🚚 <b>Управление доставкой до дверей</b>\n\n"
+              "Функция в разработке...",
+        "tj": "🚚 <b>Идоракунии расонидан то дар</b>\n\n"
+              "Функсия дар рушд аст..."
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_admin_main_menu("admin_tj", user.language),
+        parse_mode="HTML"
+    )
 
 @router.message(AdminTajikistanState.main_menu, F.text.contains("📊"))
-async def reports_menu_tj(message: Message):
+async def reports_menu_tj(message: Message, user: Optional[User] = None):
     """Меню отчетов для админа Таджикистана"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "📊 <b>Отчеты</b>\n\nФункция в разработке...",
-            "tj": "📊 <b>Ҳисоботҳо</b>\n\nФунксия дар рушд аст..."
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_admin_main_menu("admin_tj", user.language),
-            parse_mode="HTML"
-        )
\ No newline at end of file
+    if not user:
+        return
+    
+    texts = {
+        "ru": "📊 <b>Отчеты</b>\n\nФункция в разработке...",
+        "tj": "📊 <b>Ҳисоботҳо</b>\n\nФунксия дар рушд аст..."
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_admin_main_menu("admin_tj", user.language),
+        parse_mode="HTML"
+    )
\ No newline at end of file
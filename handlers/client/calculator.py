@@ -1,186 +1,122 @@
 """
 Обработчик калькулятора доставки
 """
+from typing import Optional
+import html
 import logging
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
-from database.session import get_db
-from database.repository import UserRepository
-from keyboards.client import get_back_cancel_keyboard, get_country_keyboard, get_main_menu_keyboard
+from database.models import User
+from keyboards.client import get_back_cancel_keyboard, get_main_menu_keyboard
 from utils.states import ClientState
-from services.calculator import calculate_delivery_cost
+from services.calculator import MAX_BOXES, get_tariff, parse_boxes, quote_shipment
 
 logger = logging.getLogger(__name__)
 router = Router()
 
-async def calculator_start(message: Message, state: FSMContext):
+# Сколько нераспознанных строк показывать в ответе
+INVALID_LINES_PREVIEW = 10
+
+async def calculator_start(message: Message, state: FSMContext, user: Optional[User] = None):
     """Начало расчета доставки"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "🧮 <b>Калькулятор доставки</b>\n\nВыберите страну доставки:",
-            "tj": "🧮 <b>Калькулятори расонидан</b>\n\nКишвари расониданро интихоб кунед:"
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_country_keyboard(user.language),
-            parse_mode="HTML"
-        )
-        await state.set_state(ClientState.calculator_country)
+    if not user:
+        return
+
+    texts = {
+        "ru": "🧮 <b>Калькулятор доставки</b>\n\n"
+              "Отправьте коробки одним сообщением, по одной на строку:\n"
+              "<code>Длина x Ширина x Высота Вес</code>\n"
+              "(размеры в метрах, вес в кг)\n\n"
+              "Например:\n"
+              "<code>0.6x0.4x0.5 18\n"
+              "1.2x1x0.8 150</code>",
+        "tj": "🧮 <b>Калькулятори расонидан</b>\n\n"
+              "Қуттиҳоро бо як паём фиристед, ҳар кадом дар сатри алоҳида:\n"
+              "<code>Дарозӣ x Барандозӣ x Баландӣ Вазн</code>\n"
+              "(андозаҳо дар метр, вазн дар кг)\n\n"
+              "Масалан:\n"
+              "<code>0.6x0.4x0.5 18\n"
+              "1.2x1x0.8 150</code>"
+    }
 
-@router.message(ClientState.calculator_country)
-async def calculator_country_handler(message: Message, state: FSMContext):
-    """Обработка выбора страны для калькулятора"""
-    if message.text in ["⬅️ Назад", "⬅️ Бозгашт"]:
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_back_cancel_keyboard(user.language),
+        parse_mode="HTML"
+    )
+    await state.set_state(ClientState.calculator_dimensions)
+
+@router.message(ClientState.calculator_dimensions)
+async def calculator_boxes_handler(message: Message, state: FSMContext, user: Optional[User] = None):
+    """Расчет стоимости сборного груза по всем маршрутам"""
+    if not user:
+        return
+
+    if message.text in ["⬅️ Назад", "⬅️ Бозгашт", "❌ Отмена", "❌ Бекор кардан"]:
         await message.answer(
-            "Главное меню:" if True else "Менюи асосӣ:",  # Без user для простоты
-            reply_markup=get_main_menu_keyboard("ru")  # Временно
+            "Главное меню:" if user.language == "ru" else "Менюи асосӣ:",
+            reply_markup=get_main_menu_keyboard(user.language)
         )
         await state.set_state(ClientState.main_menu)
         return
-    
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        await state.update_data(calculator_country=message.text)
-        
+
+    boxes, invalid = parse_boxes(message.text)
+
+    if invalid or not boxes:
+        preview = "\n".join(f"• {html.escape(line)}" for line in invalid[:INVALID_LINES_PREVIEW])
+        if len(invalid) > INVALID_LINES_PREVIEW:
+            preview += f"\n... (+{len(invalid) - INVALID_LINES_PREVIEW})"
         texts = {
-            "ru": "Введите длину (в метрах):",
-            "tj": "Дарозиро ворид кунед (дар метр):"
+            "ru": "❌ Не удалось разобрать строки:\n" + preview if invalid else "❌ Не найдено ни одной коробки",
+            "tj": "❌ Сатрҳоро хондан нашуд:\n" + preview if invalid else "❌ Ягон қутти ёфт нашуд"
         }
-        
         await message.answer(
-            texts[user.language],
-            reply_markup=get_back_cancel_keyboard(user.language)
+            texts[user.language] + "\n\nФормат: <code>0.6x0.4x0.5 18</code>",
+            parse_mode="HTML"
         )
-        await state.set_state(ClientState.calculator_dimensions)
-
-@router.message(ClientState.calculator_dimensions)
-async def calculator_dimensions_handler(message: Message, state: FSMContext):
-    """Обработка ввода размеров"""
-    if message.text in ["⬅️ Назад", "⬅️ Бозгашт"]:
-        await calculator_start(message, state)
         return
-    
-    try:
-        length = float(message.text.replace(",", "."))
-        
-        async for session in get_db():
-            user_repo = UserRepository(session)
-            user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-            
-            if not user:
-                return
-            
-            await state.update_data(length=length)
-            
-            texts = {
-                "ru": "Введите ширину (в метрах):",
-                "tj": "Барандозиро ворид кунед (дар метр):"
-            }
-            
-            await message.answer(
-                texts[user.language],
-                reply_markup=get_back_cancel_keyboard(user.language)
-            )
-            await state.set_state(ClientState.calculator_dimensions)
-            
-    except ValueError:
-        async for session in get_db():
-            user_repo = UserRepository(session)
-            user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-            
-            texts = {
-                "ru": "❌ Пожалуйста, введите число (например: 0.5, 1, 2.3)",
-                "tj": "❌ Лутфан, рақам ворид кунед (масалан: 0.5, 1, 2.3)"
-            }
-            await message.answer(texts[user.language])
 
-@router.message(ClientState.calculator_weight)
-async def calculator_weight_handler(message: Message, state: FSMContext):
-    """Обработка ввода веса и расчет стоимости"""
-    if message.text in ["⬅️ Назад", "⬅️ Бозгашт"]:
-        async for session in get_db():
-            user_repo = UserRepository(session)
-            user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-            
-            if not user:
-                return
-            
-            texts = {
-                "ru": "Введите высоту (в метрах):",
-                "tj": "Баландиро ворид кунед (дар метр):"
-            }
-            
-            await message.answer(
-                texts[user.language],
-                reply_markup=get_back_cancel_keyboard(user.language)
-            )
-            await state.set_state(ClientState.calculator_dimensions)
+    if len(boxes) > MAX_BOXES:
+        texts = {
+            "ru": f"❌ Слишком много коробок ({len(boxes)}). Максимум за один расчет: {MAX_BOXES}",
+            "tj": f"❌ Қуттиҳо хеле зиёданд ({len(boxes)}). Ҳадди аксар барои як ҳисоб: {MAX_BOXES}"
+        }
+        await message.answer(texts[user.language])
         return
-    
-    try:
-        weight = float(message.text.replace(",", "."))
-        
-        async for session in get_db():
-            user_repo = UserRepository(session)
-            user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-            
-            if not user:
-                return
-            
-            data = await state.get_data()
-            
-            # Расчет стоимости
-            cost = calculate_delivery_cost(weight)
-            
-            texts = {
-                "ru": f"""🧮 <b>Результат расчета</b>
 
-Страна доставки: {data.get('calculator_country', 'Не указана')}
-Длина: {data.get('length', 0)} м
-Ширина: {data.get('width', 0)} м
-Высота: {data.get('height', 0)} м
-Вес: {weight} кг
+    quote = quote_shipment(boxes)
 
-<b>Итоговая стоимость: ${cost:.2f}</b>""",
-                "tj": f"""🧮 <b>Натиҷаи ҳисоб</b>
+    lines = []
+    for i, route_quote in enumerate(quote.routes):
+        tariff = get_tariff(route_quote.route)
+        title = tariff.titles.get(user.language) or route_quote.route
+        mark = "🥇" if i == 0 else "▫️"
+        if user.language == "ru":
+            basis = (f"по объему, ${route_quote.price_per_unit:g} за м³" if route_quote.by_volume
+                     else f"по весу, ${route_quote.price_per_unit:.2f} за кг")
+        else:
+            basis = (f"аз рӯи ҳаҷм, ${route_quote.price_per_unit:g} барои м³" if route_quote.by_volume
+                     else f"аз рӯи вазн, ${route_quote.price_per_unit:.2f} барои кг")
+        lines.append(f"{mark} <b>{title}</b>: ${route_quote.cost:.2f}\n   ({basis})")
 
-Кишвари расонидан: {data.get('calculator_country', 'Муайян нашудааст')}
-Дарозӣ: {data.get('length', 0)} м
-Барандозӣ: {data.get('width', 0)} м
-Баландӣ: {data.get('height', 0)} м
-Вазн: {weight} кг
+    texts = {
+        "ru": f"🧮 <b>Результат расчета</b>\n\n"
+              f"📦 Коробок: {quote.box_count}\n"
+              f"📐 Общий объем: {quote.total_volume:.3f} м³\n"
+              f"⚖️ Общий вес: {quote.total_weight:.2f} кг\n\n"
+              f"<b>Стоимость по маршрутам:</b>\n" + "\n".join(lines),
+        "tj": f"🧮 <b>Натиҷаи ҳисоб</b>\n\n"
+              f"📦 Қуттиҳо: {quote.box_count}\n"
+              f"📐 Ҳаҷми умумӣ: {quote.total_volume:.3f} м³\n"
+              f"⚖️ Вазни умумӣ: {quote.total_weight:.2f} кг\n\n"
+              f"<b>Арзиш аз рӯи масирҳо:</b>\n" + "\n".join(lines)
+    }
 
-<b>Арзиши ниҳоӣ: ${cost:.2f}</b>"""
-            }
-            
-            await message.answer(
-                texts[user.language],
-                reply_markup=get_main_menu_keyboard(user.language),
-                parse_mode="HTML"
-            )
-            await state.set_state(ClientState.main_menu)
-            
-    except ValueError:
-        async for session in get_db():
-            user_repo = UserRepository(session)
-            user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-            
-            texts = {
-                "ru": "❌ Пожалуйста, введите число (например: 1, 5.5, 10.2)",
-                "tj": "❌ Лутфан, рақам ворид кунед (масалан: 1, 5.5, 10.2)"
-            }
-            await message.answer(texts[user.language])
\ No newline at end of file
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_main_menu_keyboard(user.language),
+        parse_mode="HTML"
+    )
+    await state.set_state(ClientState.main_menu)
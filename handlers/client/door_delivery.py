@@ -1,14 +1,15 @@
 """
 Доставка до дверей
 """
+from typing import Optional
 import logging
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 from database.session import get_db
-from database.repository import UserRepository, ProductRepository
-from database.models import ProductStatus
+from database.repository import ProductRepository
+from database.models import ProductStatus, User
 from keyboards.client import get_back_cancel_keyboard, get_main_menu_keyboard
 from utils.states import ClientState
 
@@ -16,14 +17,11 @@ logger = logging.getLogger(__name__)
 router = Router()
 
 @router.message(ClientState.main_menu, F.text.contains("🚚"))
-async def door_delivery_menu(message: Message, state: FSMContext):
+async def door_delivery_menu(message: Message, state: FSMContext, user: Optional[User] = None):
     """Меню доставки до дверей"""
     async for session in get_db():
-        user_repo = UserRepository(session)
         product_repo = ProductRepository(session)
         
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
         # Проверяем, есть ли товары в Таджикистане
         products_in_tj = await product_repo.get_products_by_status(
             ProductStatus.TAJIKISTAN_WAREHOUSE
@@ -1,13 +1,13 @@
 """
 Запрещенные товары (уже есть в other_menus.py, но создаем для полноты)
 """
+from typing import Optional
 import logging
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
-from database.session import get_db
-from database.repository import UserRepository
+from database.models import User
 from keyboards.client import get_main_menu_keyboard
 from utils.states import ClientState
 
@@ -15,14 +15,10 @@ logger = logging.getLogger(__name__)
 router = Router()
 
 @router.message(ClientState.main_menu, F.text.contains("🚫"))
-async def forbidden_goods(message: Message, state: FSMContext):
+async def forbidden_goods(message: Message, state: FSMContext, user: Optional[User] = None):
     """Список запрещенных товаров"""
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        texts = {
-            "ru": """🚫 <b>Запрещённые товары</b>
+    texts = {
+        "ru": """🚫 <b>Запрещённые товары</b>
 
 1. Оружие и боеприпасы
 2. Наркотические вещества
@@ -36,7 +32,7 @@ async def forbidden_goods(message: Message, state: FSMContext):
 10. Поддельные товары
 
 Полный список уточняйте у поддержки.""",
-            "tj": """🚫 <b>Маҳсулотҳои мамнуа</b>
+        "tj": """🚫 <b>Маҳсулотҳои мамнуа</b>
 
 1. Оружие ва боёмилҳо
 2. Моддаҳои наркотикӣ
@@ -50,10 +46,10 @@ async def forbidden_goods(message: Message, state: FSMContext):
 10. Маҳсулоти қалбакӣ
 
 Рӯйхати пурраро аз дастгирӣ тафсилот диҳед."""
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_main_menu_keyboard(user.language),
-            parse_mode="HTML"
-        )
\ No newline at end of file
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_main_menu_keyboard(user.language),
+        parse_mode="HTML"
+    )
\ No newline at end of file
@@ -1,13 +1,13 @@
 """
 Обработчики остальных меню (доставка, курс)
 """
+from typing import Optional
 import logging
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
-from database.session import get_db
-from database.repository import UserRepository
+from database.models import User
 from keyboards.client import get_main_menu_keyboard, get_course_platform_keyboard
 from utils.states import ClientState
 
@@ -19,203 +19,191 @@ other_menus_router = Router()
 # ========== ДОСТАВКА ДО ДВЕРЕЙ ==========
 
 @other_menus_router.message(F.text.contains("🚚"))
-async def door_delivery_menu(message: Message):
+async def door_delivery_menu(message: Message, user: Optional[User] = None):
     """Меню доставки до дверей"""
     logger.info(f"Пользователь {message.from_user.id} выбрал 'Доставка до дверей'")
     
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "🚚 <b>Доставка до дверей</b>\n\n"
-                  "📦 <b>Условия:</b>\n"
-                  "• Доступна только для товаров, прибывших в Таджикистан\n"
-                  "• Стоимость: от $10 (в зависимости от адреса)\n"
-                  "• Срок: 1-3 рабочих дня\n\n"
-                  "📝 <b>Как заказать:</b>\n"
-                  "1. Убедитесь, что ваш товар имеет статус 'На складе в Таджикистане'\n"
-                  "2. Нажмите кнопку 'Мои трек-коды'\n"
-                  "3. Выберите товар для доставки\n"
-                  "4. Заполните форму доставки",
-            "tj": "🚚 <b>Расонидан то дар</b>\n\n"
-                  "📦 <b>Шартҳо:</b>\n"
-                  "• Танҳо барои маҳсулоте дастрас аст, ки ба Тоҷикистон омадаанд\n"
-                  "• Нарх: аз $10 (ба вобастагии адрес)\n"
-                  "• Муддат: 1-3 рӯзи корӣ\n\n"
-                  "📝 <b>Чӣ тавр фармоиш додан:</b>\n"
-                  "1. Боварӣ ҳосил кунед, ки маҳсулоти шумо статуси 'Дар анбори Тоҷикистон' дорад\n"
-                  "2. Тугмаи 'Рамзҳои тамошобини ман'-ро пахш кунед\n"
-                  "3. Маҳсулотро барои расонидан интихоб кунед\n"
-                  "4. Форми расониданро пур кунед"
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_main_menu_keyboard(user.language),
-            parse_mode="HTML"
-        )
+    if not user:
+        return
+    
+    texts = {
+        "ru": "🚚 <b>Доставка до дверей</b>\n\n"
+              "📦 <b>Условия:</b>\n"
+              "• Доступна только для товаров, прибывших в Таджикистан\n"
+              "• Стоимость: от $10 (в зависимости от адреса)\n"
+              "• Срок: 1-3 рабочих дня\n\n"
+              "📝 <b>Как заказать:</b>\n"
+              "1. Убедитесь, что ваш товар имеет статус 'На складе в Таджикистане'\n"
+              "2. Нажмите кнопку 'Мои трек-коды'\n"
+              "3. Выберите товар для доставки\n"
+              "4. Заполните форму доставки",
+        "tj": "🚚 <b>Расонидан то дар</b>\n\n"
+              "📦 <b>Шартҳо:</b>\n"
+              "• Танҳо барои маҳсулоте дастрас аст, ки ба Тоҷикистон омадаанд\n"
+              "• Нарх: аз $10 (ба вобастагии адрес)\n"
+              "• Муддат: 1-3 рӯзи корӣ\n\n"
+              "📝 <b>Чӣ тавр фармоиш додан:</b>\n"
+              "1. Боварӣ ҳосил кунед, ки маҳсулоти шумо статуси 'Дар анбори Тоҷикистон' дорад\n"
+              "2. Тугмаи 'Рамзҳои тамошобини ман'-ро пахш кунед\n"
+              "3. Маҳсулотро барои расонидан интихоб кунед\n"
+              "4. Форми расониданро пур кунед"
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_main_menu_keyboard(user.language),
+        parse_mode="HTML"
+    )
 
 # ========== БЕСПЛАТНЫЙ КУРС ==========
 
 @other_menus_router.message(F.text.contains("🎓"))
-async def course_menu(message: Message, state: FSMContext):
+async def course_menu(message: Message, state: FSMContext, user: Optional[User] = None):
     """Меню бесплатного курса"""
     logger.info(f"Пользователь {message.from_user.id} выбрал 'Бесплатный курс'")
     
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        texts = {
-            "ru": "🎓 <b>Бесплатный курс по покупкам в Китае</b>\n\n"
-                  "Выберите платформу, по которой хотите обучаться:",
-            "tj": "🎓 <b>Курси бепул оид ба харид дар Чин</b>\n\n"
-                  "Платформаеро интихоб кунед, ки мехоҳед таҳсил кунед:"
-        }
-        
-        await message.answer(
-            texts[user.language],
-            reply_markup=get_course_platform_keyboard(user.language),
-            parse_mode="HTML"
-        )
-        await state.set_state(ClientState.course_menu)
+    if not user:
+        return
+    
+    texts = {
+        "ru": "🎓 <b>Бесплатный курс по покупкам в Китае</b>\n\n"
+              "Выберите платформу, по которой хотите обучаться:",
+        "tj": "🎓 <b>Курси бепул оид ба харид дар Чин</b>\n\n"
+              "Платформаеро интихоб кунед, ки мехоҳед таҳсил кунед:"
+    }
+    
+    await message.answer(
+        texts[user.language],
+        reply_markup=get_course_platform_keyboard(user.language),
+        parse_mode="HTML"
+    )
+    await state.set_state(ClientState.course_menu)
 
 @other_menus_router.message(ClientState.course_menu)
-async def course_platform_handler(message: Message, state: FSMContext):
+async def course_platform_handler(message: Message, state: FSMContext, user: Optional[User] = None):
     """Обработка выбора платформы для курса"""
     logger.info(f"Пользователь {message.from_user.id} выбрал платформу: {message.text}")
     
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if not user:
-            return
-        
-        # Тексты кнопок
-        back_ru = "⬅️ Назад"
-        back_tj = "⬅️ Бозгашт"
-        
-        if message.text in [back_ru, back_tj]:
-            await message.answer(
-                "Главное меню:" if user.language == "ru" else "Менюи асосӣ:",
-                reply_markup=get_main_menu_keyboard(user.language)
-            )
-            await state.set_state(ClientState.main_menu)
-            return
-        
-        # Информация о платформах
-        platform_info = {
-            "Taobao": {
-                "ru": {
-                    "title": "🎓 <b>Курс по Taobao</b>",
-                    "description": "Полное руководство по покупкам на Taobao:\n\n"
-                                  "📚 <b>Содержание курса:</b>\n"
-                                  "1. Регистрация и настройка аккаунта\n"
-                                  "2. Поиск товаров и работа с фильтрами\n"
-                                  "3. Общение с продавцами\n"
-                                  "4. Оплата и безопасность\n"
-                                  "5. Доставка и отслеживание\n\n"
-                                  "🔗 <b>Ссылка на курс:</b>\n"
-                                  "https://example.com/taobao-course\n\n"
-                                  "⏰ <b>Длительность:</b> 10 уроков, 5 часов видео",
-                    "button": "Taobao"
-                },
-                "tj": {
-                    "title": "🎓 <b>Курс оид ба Taobao</b>",
-                    "description": "Дастурҳои комил оид ба харид дар Taobao:\n\n"
-                                  "📚 <b>Мундариҷаи курс:</b>\n"
-                                  "1. Бақайдгирӣ ва танзими ҳисоб\n"
-                                  "2. Ҷустуҷӯи маҳсулот ва кор бо фильтрҳо\n"
-                                  "3. Суҳбат бо фурӯшандагон\n"
-                                  "4. Пардохт ва амният\n"
-                                  "5. Расонидан ва тамошобин\n\n"
-                                  "🔗 <b>Истинод ба курс:</b>\n"
-                                  "https://example.com/taobao-course\n\n"
-                                  "⏰ <b>Муддат:</b> 10 дарс, 5 соат видео",
-                    "button": "Taobao"
-                }
+    if not user:
+        return
+    
+    # Тексты кнопок
+    back_ru = "⬅️ Назад"
+    back_tj = "⬅️ Бозгашт"
+    
+    if message.text in [back_ru, back_tj]:
+        await message.answer(
+            "Главное меню:" if user.language == "ru" else "Менюи асосӣ:",
+            reply_markup=get_main_menu_keyboard(user.language)
+        )
+        await state.set_state(ClientState.main_menu)
+        return
+    
+    # Информация о платформах
+    platform_info = {
+        "Taobao": {
+            "ru": {
+                "title": "🎓 <b>Курс по Taobao</b>",
+                "description": "Полное руководство по покупкам на Taobao:\n\n"
+                              "📚 <b>Содержание курса:</b>\n"
+                              "1. Регистрация и настройка аккаунта\n"
+                              "2. Поиск товаров и работа с фильтрами\n"
+                              "3. Общение с продавцами\n"
+                              "4. Оплата и безопасность\n"
+                              "5. Доставка и отслеживание\n\n"
+                              "🔗 <b>Ссылка на курс:</b>\n"
+                              "https://example.com/taobao-course\n\n"
+                              "⏰ <b>Длительность:</b> 10 уроков, 5 часов видео",
+                "button": "Taobao"
             },
-            "Pinduoduo": {
-                "ru": {
-                    "title": "🎓 <b>Курс по Pinduoduo</b>",
-                    "description": "Обучение покупкам на Pinduoduo:\n\n"
-                                  "📚 <b>Содержание курса:</b>\n"
-                                  "1. Особенности Pinduoduo\n"
-                                  "2. Совместные покупки\n"
-                                  "3. Акции и скидки\n"
-                                  "4. Гарантии качества\n"
-                                  "5. Возврат товаров\n\n"
-                                  "🔗 <b>Ссылка на курс:</b>\n"
-                                  "https://example.com/pinduoduo-course\n\n"
-                                  "⏰ <b>Длительность:</b> 8 уроков, 4 часа видео",
-                    "button": "Pinduoduo"
-                },
-                "tj": {
-                    "title": "🎓 <b>Курс оид ба Pinduoduo</b>",
-                    "description": "Таҳсил дар бораи харид дар Pinduoduo:\n\n"
-                                  "📚 <b>Мундариҷаи курс:</b>\n"
-                                  "1) Хусусиятҳои Pinduoduo\n"
-                                  "2) Харидҳои муштарак\n"
-                                  "3) Аксияҳо ва тахфифҳо\n"
-                                  "4) Кафолати сифат\n"
-                                  "5) Бозгашти маҳсулот\n\n"
-                                  "🔗 <b>Истинод ба курс:</b>\n"
-                                  "https://example.com/pinduoduo-course\n\n"
-                                  "⏰ <b>Муддат:</b> 8 дарс, 4 соат видео",
-                    "button": "Pinduoduo"
-                }
+            "tj": {
+                "title": "🎓 <b>Курс оид ба Taobao</b>",
+                "description": "Дастурҳои комил оид ба харид дар Taobao:\n\n"
+                              "📚 <b>Мундариҷаи курс:</b>\n"
+                              "1. Бақайдгирӣ ва танзими ҳисоб\n"
+                              "2. Ҷустуҷӯи маҳсулот ва кор бо фильтрҳо\n"
+                              "3. Суҳбат бо фурӯшандагон\n"
+                              "4. Пардохт ва амният\n"
+                              "5. Расонидан ва тамошобин\n\n"
+                              "🔗 <b>Истинод ба курс:</b>\n"
+                              "https://example.com/taobao-course\n\n"
+                              "⏰ <b>Муддат:</b> 10 дарс, 5 соат видео",
+                "button": "Taobao"
+            }
+        },
+        "Pinduoduo": {
+            "ru": {
+                "title": "🎓 <b>Курс по Pinduoduo</b>",
+                "description": "Обучение покупкам на Pinduoduo:\n\n"
+                              "📚 <b>Содержание курса:</b>\n"
+                              "1. Особенности Pinduoduo\n"
+                              "2. Совместные покупки\n"
+                              "3. Акции и скидки\n"
+                              "4. Гарантии качества\n"
+                              "5. Возврат товаров\n\n"
+                              "🔗 <b>Ссылка на курс:</b>\n"
+                              "https://example.com/pinduoduo-course\n\n"
+                              "⏰ <b>Длительность:</b> 8 уроков, 4 часа видео",
+                "button": "Pinduoduo"
+            },
+            "tj": {
+                "title": "🎓 <b>Курс оид ба Pinduoduo</b>",
+                "description": "Таҳсил дар бораи харид дар Pinduoduo:\n\n"
+                              "📚 <b>Мундариҷаи курс:</b>\n"
+                              "1) Хусусиятҳои Pinduoduo\n"
+                              "2) Харидҳои муштарак\n"
+                              "3) Аксияҳо ва тахфифҳо\n"
+                              "4) Кафолати сифат\n"
+                              "5) Бозгашти маҳсулот\n\n"
+                              "🔗 <b>Истинод ба курс:</b>\n"
+                              "https://example.com/pinduoduo-course\n\n"
+                              "⏰ <b>Муддат:</b> 8 дарс, 4 соат видео",
+                "button": "Pinduoduo"
+            }
+        },
+        "Alibaba": {
+            "ru": {
+                "title": "🎓 <b>Курс по Alibaba</b>",
+                "description": "Оптовые закупки на Alibaba:\n\n"
+                              "📚 <b>Содержание курса:</b>\n"
+                              "1. Поиск проверенных поставщиков\n"
+                              "2. Переговоры о цене\n"
+                              "3. Минимальные партии (MOQ)\n"
+                              "4. Логистика и таможня\n"
+                              "5. Юридические аспекты\n\n"
+                              "🔗 <b>Ссылка на курс:</b>\n"
+                              "https://example.com/alibaba-course\n\n"
+                              "⏰ <b>Длительность:</b> 12 уроков, 6 часов видео",
+                "button": "Alibaba"
             },
-            "Alibaba": {
-                "ru": {
-                    "title": "🎓 <b>Курс по Alibaba</b>",
-                    "description": "Оптовые закупки на Alibaba:\n\n"
-                                  "📚 <b>Содержание курса:</b>\n"
-                                  "1. Поиск проверенных поставщиков\n"
-                                  "2. Переговоры о цене\n"
-                                  "3. Минимальные партии (MOQ)\n"
-                                  "4. Логистика и таможня\n"
-                                  "5. Юридические аспекты\n\n"
-                                  "🔗 <b>Ссылка на курс:</b>\n"
-                                  "https://example.com/alibaba-course\n\n"
-                                  "⏰ <b>Длительность:</b> 12 уроков, 6 часов видео",
-                    "button": "Alibaba"
-                },
-                "tj": {
-                    "title": "🎓 <b>Курс оид ба Alibaba</b>",
-                    "description": "Харидҳои чандгона дар Alibaba:\n\n"
-                                  "📚 <b>Мундариҷаи курс:</b>\n"
-                                  "1. Ҷустуҷӯи таъминкунандагони санҷидашуда\n"
-                                  "2. Музокирот оид ба нарх\n"
-                                  "3. Парчамҳои ҳадди ақал (MOQ)\n"
-                                  "4. Логистика ва гумрук\n"
-                                  "5. Ҷиҳатҳои ҳуқуқӣ\n\n"
-                                  "🔗 <b>Истинод ба курс:</b>\n"
-                                  "https://example.com/alibaba-course\n\n"
-                                  "⏰ <b>Муддат:</b> 12 дарс, 6 соат видео",
-                    "button": "Alibaba"
-                }
+            "tj": {
+                "title": "🎓 <b>Курс оид ба Alibaba</b>",
+                "description": "Харидҳои чандгона дар Alibaba:\n\n"
+                              "📚 <b>Мундариҷаи курс:</b>\n"
+                              "1. Ҷустуҷӯи таъминкунандагони санҷидашуда\n"
+                              "2. Музокирот оид ба нарх\n"
+                              "3. Парчамҳои ҳадди ақал (MOQ)\n"
+                              "4. Логистика ва гумрук\n"
+                              "5. Ҷиҳатҳои ҳуқуқӣ\n\n"
+                              "🔗 <b>Истинод ба курс:</b>\n"
+                              "https://example.com/alibaba-course\n\n"
+                              "⏰ <b>Муддат:</b> 12 дарс, 6 соат видео",
+                "button": "Alibaba"
             }
         }
-        
-        info = platform_info.get(message.text)
-        if info:
-            text = f"{info[user.language]['title']}\n\n{info[user.language]['description']}"
-            await message.answer(
-                text,
-                reply_markup=get_course_platform_keyboard(user.language),
-                parse_mode="HTML"
-            )
-        else:
-            await message.answer(
-                "Выберите платформу из списка:" if user.language == "ru" 
-                else "Платформаро аз рӯйхат интихоб кунед:",
-                reply_markup=get_course_platform_keyboard(user.language)
-            )
\ No newline at end of file
+    }
+    
+    info = platform_info.get(message.text)
+    if info:
+        text = f"{info[user.language]['title']}\n\n{info[user.language]['description']}"
+        await message.answer(
+            text,
+            reply_markup=get_course_platform_keyboard(user.language),
+            parse_mode="HTML"
+        )
+    else:
+        await message.answer(
+            "Выберите платформу из списка:" if user.language == "ru" 
+            else "Платформаро аз рӯйхат интихоб кунед:",
+            reply_markup=get_course_platform_keyboard(user.language)
+        )
\ No newline at end of file
@@ -12,7 +12,9 @@ from database.models import ProductCategory
 from keyboards.client import get_back_cancel_keyboard
 from keyboards.products import get_product_categories_keyboard, get_special_info_keyboard
 from utils.states import ClientState
-from .utils import track_codes_menu_back, get_status_text
+from services.track_code import validate_track_code, invalid_track_code_text
+from services.track_index import track_code_index
+from .utils import track_codes_menu_back
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -54,20 +56,8 @@ async def process_product_special_info(message: Message, state: FSMContext):
         user = await user_repo.get_user_by_telegram_id(message.from_user.id)
         
         # Генерация трек-кода
-        from services.track_code import TrackCodeGenerator
-        data = await state.get_data()
-        
-        # Определяем категорию для генерации трек-кода
-        category = data.get('product_category')
-        if category:
-            category_str = category.value
-        else:
-            category_str = "other"
-        
-        track_code = TrackCodeGenerator.generate_track_code(
-            user_id=message.from_user.id,
-            product_type=category_str
-        )
+        from services.track_code import generate_track_code
+        track_code = await generate_track_code()
         
         # Сохраняем трек-код
         await state.update_data(track_code=track_code)
@@ -87,8 +77,21 @@ async def process_track_code(message: Message, state: FSMContext):
         
         user = await user_repo.get_user_by_telegram_id(message.from_user.id)
         
-        # Проверяем, существует ли уже такой трек-код
-        existing_product = await product_repo.get_product_by_track_code(message.text)
+        track_code, reason = validate_track_code(message.text or "")
+        if reason:
+            await message.answer(
+                invalid_track_code_text(message.text or "", reason, user.language),
+                parse_mode="HTML"
+            )
+            return
+        
+        # Проверяем, существует ли уже такой трек-код (новые коды перевозчиков
+        # отсекаются фильтром Блума без запроса к базе)
+        existing_product = None
+        if track_code_index.might_exist(track_code):
+            existing_product = await product_repo.get_product_by_track_code(track_code)
+            if not existing_product:
+                track_code_index.record_not_found([track_code])
         
         if existing_product:
             texts = {
@@ -99,7 +102,7 @@ async def process_track_code(message: Message, state: FSMContext):
             return
         
         # Сохраняем трек-код
-        await state.update_data(track_code=message.text)
+        await state.update_data(track_code=track_code)
         
         texts = {
             "ru": "✏️ <b>Шаг 1 из 8: Название товара</b>\n\n"
@@ -521,6 +524,7 @@ async def process_product_special_info(message: Message, state: FSMContext):
                 has_battery=has_battery,
                 is_liquid=is_liquid
             )
+            track_code_index.add(product.track_code)
             
             from .utils import show_product_success_message
             await show_product_success_message(
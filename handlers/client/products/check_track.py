@@ -10,7 +10,10 @@ from database.session import get_db
 from database.repository import UserRepository, ProductRepository
 from keyboards.client import get_back_cancel_keyboard, get_track_codes_keyboard
 from utils.states import ClientState
-from .utils import track_codes_menu_back, get_status_text
+from utils.helpers import get_status_text, pack_messages
+from services.track_code import parse_track_code_list, invalid_track_code_text
+from services.track_index import track_code_index
+from .utils import track_codes_menu_back
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -39,57 +42,18 @@ async def check_track_code_start(message: Message, state: FSMContext):
         )
         await state.set_state(ClientState.check_track_code)
         
-@router.message(ClientState.check_track_code)
-async def process_check_track_code(message: Message, state: FSMContext):
-    """Обработка проверки трек-кода с детальной информацией"""
-    if message.text in ["⬅️ Назад", "⬅️ Бозгашт"]:
-        await track_codes_menu_back(message, state)
-        return
+def format_product_card(track_code: str, product, language: str) -> str:
+    """Карточка товара с детальной информацией"""
+    product_info = ProductRepository.product_info(product)
+    status_text = get_status_text(product.status.value, language)
     
-    track_codes = [code.strip() for code in message.text.split(",") if code.strip()]
-    
-    if not track_codes:
-        async for session in get_db():
-            user_repo = UserRepository(session)
-            user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-            
-            texts = {
-                "ru": "❌ Пожалуйста, введите хотя бы один трек-код",
-                "tj": "❌ Лутфан, на камтар як рамзи тамошобин ворид кунед"
-            }
-            await message.answer(texts[user.language])
-            return
+    # Даты
+    created_date = product.created_at.strftime("%d.%m.%Y %H:%M")
+    arrival_date = product.arrival_date.strftime("%d.%m.%Y") if product.arrival_date else "Не указана"
+    expected_date = product.expected_delivery_date.strftime("%d.%m.%Y") if product.expected_delivery_date else "Не указана"
     
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        product_repo = ProductRepository(session)
-        
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        for track_code in track_codes:
-            detailed_info = await product_repo.get_detailed_product_info(track_code)
-            
-            if not detailed_info:
-                texts = {
-                    "ru": f"❌ Товар с трек-кодом {track_code} не найден",
-                    "tj": f"❌ Маҳсулот бо рамзи тамошобин {track_code} ёфт нашуд"
-                }
-                await message.answer(texts[user.language])
-                continue
-            
-            product = detailed_info["product"]
-            product_info = detailed_info["product_info"]
-            
-            # Формируем детальную информацию
-            status_text = get_status_text(product.status.value, user.language)
-            
-            # Даты
-            created_date = product.created_at.strftime("%d.%m.%Y %H:%M")
-            arrival_date = product.arrival_date.strftime("%d.%m.%Y") if product.arrival_date else "Не указана"
-            expected_date = product.expected_delivery_date.strftime("%d.%m.%Y") if product.expected_delivery_date else "Не указана"
-            
-            text = {
-                "ru": f"""📦 <b>ИНФОРМАЦИЯ О ТОВАРЕ</b>
+    text = {
+        "ru": f"""📦 <b>ИНФОРМАЦИЯ О ТОВАРЕ</b>
 
 🎯 <b>Трек-код:</b> <code>{track_code}</code>
 🏷️ <b>Название:</b> {product_info['name'] or 'Не указано'}
@@ -112,7 +76,7 @@ async def process_check_track_code(message: Message, state: FSMContext):
 {'С батареей' if product_info['has_battery'] else ''} 
 {'Жидкость' if product_info['is_liquid'] else ''} 
 {'Нет' if not any([product_info['fragile'], product_info['has_battery'], product_info['is_liquid']]) else ''}""",
-                "tj": f"""📦 <b>МАЪЛУМОТ ДАР БОРАИ МАҲСУЛОТ</b>
+        "tj": f"""📦 <b>МАЪЛУМОТ ДАР БОРАИ МАҲСУЛОТ</b>
 
 🎯 <b>Рамзи тамошобин:</b> <code>{track_code}</code>
 🏷️ <b>Ном:</b> {product_info['name'] or 'Муайян нашудааст'}
@@ -135,66 +99,61 @@ async def process_check_track_code(message: Message, state: FSMContext):
 {'Бо батарея' if product_info['has_battery'] else ''} 
 {'Моеъ' if product_info['is_liquid'] else ''} 
 {'Не' if not any([product_info['fragile'], product_info['has_battery'], product_info['is_liquid']]) else ''}"""
-            }
-            
-            await message.answer(
-                text[user.language],
-                parse_mode="HTML"
-            )
-        
-        # Возвращаемся в меню трек-кодов
-        from keyboards.client import get_track_codes_keyboard
-        await message.answer(
-            "📦 Меню трек-кодов:" if user.language == "ru" else "📦 Менюи рамзҳои тамошобин:",
-            reply_markup=get_track_codes_keyboard(user.language)
-        )
-        await state.set_state(ClientState.track_codes_menu)
+    }
+    return text[language]
 
 @router.message(ClientState.check_track_code)
 async def process_check_track_code(message: Message, state: FSMContext):
-    """Обработка проверки трек-кода"""
+    """Обработка проверки трек-кода с детальной информацией"""
     if message.text in ["⬅️ Назад", "⬅️ Бозгашт"]:
         await track_codes_menu_back(message, state)
         return
     
-    track_codes = [code.strip() for code in message.text.split(",") if code.strip()]
+    # Разделяем и нормализуем трек-коды; ошибочные не доходят до базы
+    track_codes, invalid = parse_track_code_list(message.text)
     
-    if not track_codes:
-        async for session in get_db():
-            user_repo = UserRepository(session)
-            user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-            
+    async for session in get_db():
+        user_repo = UserRepository(session)
+        product_repo = ProductRepository(session)
+        
+        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
+        
+        if not track_codes and not invalid:
             texts = {
                 "ru": "❌ Пожалуйста, введите хотя бы один трек-код",
                 "tj": "❌ Лутфан, на камтар як рамзи тамошобин ворид кунед"
             }
             await message.answer(texts[user.language])
             return
-    
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        product_repo = ProductRepository(session)
         
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
+        # Все трек-коды проверяются одним запросом
+        # Коды, которых точно нет (фильтр Блума), в базе не ищем
+        maybe_codes, _ = track_code_index.split(track_codes)
+        found = {}
+        if maybe_codes:
+            found = await product_repo.get_products_by_track_codes(maybe_codes)
+            track_code_index.record_not_found(code for code in maybe_codes if code not in found)
         
-        results = []
+        blocks = [invalid_track_code_text(raw, reason, user.language) for raw, reason in invalid]
         for track_code in track_codes:
-            product = await product_repo.get_product_by_track_code(track_code)
+            if track_code not in found:
+                texts = {
+                    "ru": f"❌ Товар с трек-кодом {track_code} не найден",
+                    "tj": f"❌ Маҳсулот бо рамзи тамошобин {track_code} ёфт нашуд"
+                }
+                blocks.append(texts[user.language])
+                continue
             
-            if product:
-                status_text = get_status_text(product.status.value, user.language)
-                results.append(f"✅ <b>{track_code}</b> - {status_text}")
-            else:
-                results.append(f"❌ <b>{track_code}</b> - не найден" if user.language == "ru" else f"❌ <b>{track_code}</b> - ёфт нашуд")
+            product, _ = found[track_code]
+            blocks.append(format_product_card(track_code, product, user.language))
         
-        text = {
-            "ru": f"🔍 <b>Результаты проверки:</b>\n\n" + "\n\n".join(results),
-            "tj": f"🔍 <b>Натиҷаҳои тафтиш:</b>\n\n" + "\n\n".join(results)
-        }
+        # Карточки укладываются в минимальное число сообщений
+        for text in pack_messages(blocks, separator="\n\n➖➖➖➖➖➖➖➖\n\n"):
+            await message.answer(text, parse_mode="HTML")
         
+        # Возвращаемся в меню трек-кодов
         await message.answer(
-            text[user.language],
-            reply_markup=get_track_codes_keyboard(user.language),
-            parse_mode="HTML"
+            "📦 Меню трек-кодов:" if user.language == "ru" else "📦 Менюи рамзҳои тамошобин:",
+            reply_markup=get_track_codes_keyboard(user.language)
         )
-        await state.set_state(ClientState.track_codes_menu)
\ No newline at end of file
+        await state.set_state(ClientState.track_codes_menu)
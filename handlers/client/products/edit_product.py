@@ -12,6 +12,7 @@ from database.repository import UserRepository, ProductRepository
 from keyboards.client import get_back_cancel_keyboard, get_track_codes_keyboard
 from keyboards.products import get_edit_product_keyboard
 from utils.states import ClientState
+from services.track_code import validate_track_code, invalid_track_code_text
 from .utils import track_codes_menu_back
 
 logger = logging.getLogger(__name__)
@@ -46,13 +47,22 @@ async def edit_product_select(message: Message, state: FSMContext):
         await track_codes_menu_back(message, state)
         return
     
-    track_code = message.text.strip()
+    track_code, reason = validate_track_code(message.text or "")
     
     async for session in get_db():
         user_repo = UserRepository(session)
         product_repo = ProductRepository(session)
         
         user = await user_repo.get_user_by_telegram_id(message.from_user.id)
+        
+        # Ошибочный код не ищем в базе
+        if reason:
+            await message.answer(
+                invalid_track_code_text(message.text or "", reason, user.language),
+                parse_mode="HTML"
+            )
+            return
+        
         product = await product_repo.get_product_by_track_code(track_code)
         
         if not product:
@@ -88,7 +98,7 @@ async def edit_product_select(message: Message, state: FSMContext):
         )
         
         # Показываем информацию о товаре
-        from .utils import get_status_text
+        from utils.helpers import get_status_text
         
         status_text = get_status_text(product.status.value, user.language)
         
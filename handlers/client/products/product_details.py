@@ -9,7 +9,7 @@ from aiogram.fsm.context import FSMContext
 from database.session import get_db
 from database.repository import UserRepository, ProductRepository
 from utils.states import ClientState
-from .utils import get_status_text
+from utils.helpers import get_status_text
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -23,29 +23,6 @@ async def track_codes_menu_back(message, state):
         )
         await state.set_state(ClientState.track_codes_menu)
 
-def get_status_text(status: str, language: str = "ru") -> str:
-    """Получение текста статуса на нужном языке"""
-    status_texts = {
-        "ru": {
-            "created": "Создан",
-            "china_warehouse": "На складе в Китае",
-            "in_transit": "В пути",
-            "tajikistan_warehouse": "На складе в Таджикистане",
-            "delivered": "Доставлен",
-            "completed": "Завершен"
-        },
-        "tj": {
-            "created": "Сохта шудааст",
-            "china_warehouse": "Дар анбори Чин",
-            "in_transit": "Дар роҳ",
-            "tajikistan_warehouse": "Дар анбори Тоҷикистон",
-            "delivered": "Расонида шуд",
-            "completed": "Анҷом ёфт"
-        }
-    }
-    
-    return status_texts.get(language, status_texts["ru"]).get(status, status)
-
 async def show_product_success_message(
     message, state, product, user, track_code, product_name, product_category,
     quantity, unit_price, total_value, weight, length, width, height,
@@ -9,23 +9,29 @@ from aiogram.fsm.context import FSMContext
 from database.session import get_db
 from database.repository import UserRepository, ProductRepository
 from utils.states import ClientState
-from .utils import get_status_text
+from utils.helpers import get_status_text
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+PAGE_SIZE = 5  # 5 товаров на страницу
+
 @router.message(ClientState.track_codes_menu, F.text.contains("Мои трек-коды"))
 @router.message(ClientState.track_codes_menu, F.text.contains("Рамзҳои тамошобини ман"))
-async def my_products_list(message: Message, state: FSMContext):
-    """Показать товары пользователя с пагинацией"""
+async def my_products_list(message: Message, state: FSMContext, page_num: int = 1,
+                           after: str = None, before: str = None):
+    """Показать товары пользователя с курсорной пагинацией"""
     async for session in get_db():
         user_repo = UserRepository(session)
         product_repo = ProductRepository(session)
         
         user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        products = await product_repo.get_user_products(user.id)
+        page = await product_repo.get_user_products_page(
+            user.id, page_size=PAGE_SIZE, after=after, before=before
+        )
+        products_to_show = page.items
         
-        if not products:
+        if not products_to_show:
             texts = {
                 "ru": "❗ У вас пока нет добавленных товаров",
                 "tj": "❗ Шумо то ҳол маҳсулоти иловашуда надоред"
@@ -33,25 +39,11 @@ async def my_products_list(message: Message, state: FSMContext):
             await message.answer(texts[user.language])
             return
         
-        # Получаем текущую страницу из состояния
-        state_data = await state.get_data()
-        current_page = state_data.get('products_page', 1)
-        page_size = 5  # 5 товаров на страницу
-        
-        # Вычисляем общее количество страниц
-        total_pages = (len(products) + page_size - 1) // page_size
-        
-        # Ограничиваем текущую страницу
-        current_page = max(1, min(current_page, total_pages))
-        
-        # Получаем товары для текущей страницы
-        start_idx = (current_page - 1) * page_size
-        end_idx = min(start_idx + page_size, len(products))
-        products_to_show = products[start_idx:end_idx]
-        
         # Формируем сообщение с пагинацией
-        text = f"📦 <b>Ваши товары (страница {current_page}/{total_pages}):</b>\n\n" if user.language == "ru" else f"📦 <b>Маҳсулотҳои шумо (саҳифа {current_page}/{total_pages}):</b>\n\n"
+        text = f"📦 <b>Ваши товары (страница {page_num}):</b>\n\n" if user.language == "ru" else f"📦 <b>Маҳсулотҳои шумо (саҳифа {page_num}):</b>\n\n"
         
+        start_idx = (page_num - 1) * PAGE_SIZE
+        end_idx = start_idx + len(products_to_show)
         for i, product in enumerate(products_to_show, start_idx + 1):
             status_text = get_status_text(product.status.value, user.language)
             
@@ -74,29 +66,25 @@ async def my_products_list(message: Message, state: FSMContext):
             if i < end_idx:
                 text += "\n"
         
-        # Сохраняем текущую страницу в состоянии
-        await state.update_data(products_page=current_page)
-        
-        # Создаем клавиатуру пагинации
+        # Создаем клавиатуру пагинации (курсор страницы передается в callback_data)
         from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
         keyboard = []
         
-        if total_pages > 1:
-            if current_page > 1:
-                keyboard.append(
-                    InlineKeyboardButton(
-                        text="◀️ Назад" if user.language == "ru" else "◀️ Бозгашт",
-                        callback_data=f"prev_page_{current_page-1}"
-                    )
+        if page.prev_cursor:
+            keyboard.append(
+                InlineKeyboardButton(
+                    text="◀️ Назад" if user.language == "ru" else "◀️ Бозгашт",
+                    callback_data=f"prev_page_{page_num - 1}_{page.prev_cursor}"
                 )
-            
-            if current_page < total_pages:
-                keyboard.append(
-                    InlineKeyboardButton(
-                        text="Вперед ▶️" if user.language == "ru" else "Оёд ▶️",
-                        callback_data=f"next_page_{current_page+1}"
-                    )
+            )
+        
+        if page.next_cursor:
+            keyboard.append(
+                InlineKeyboardButton(
+                    text="Вперед ▶️" if user.language == "ru" else "Оёд ▶️",
+                    callback_data=f"next_page_{page_num + 1}_{page.next_cursor}"
                 )
+            )
         
         # Кнопка просмотра деталей
         if len(products_to_show) == 1:
@@ -121,19 +109,13 @@ from aiogram.types import CallbackQuery
 @router.callback_query(F.data.startswith("prev_page_"))
 async def prev_page(callback: CallbackQuery, state: FSMContext):
     """Переход на предыдущую страницу"""
-    page_num = int(callback.data.split("_")[2])
-    await state.update_data(products_page=page_num)
-    
-    # Повторно вызываем функцию отображения товаров
-    await my_products_list(callback.message, state)
+    _, _, page_num, cursor = callback.data.split("_", 3)
+    await my_products_list(callback.message, state, page_num=int(page_num), before=cursor)
     await callback.answer()
 
 @router.callback_query(F.data.startswith("next_page_"))
 async def next_page(callback: CallbackQuery, state: FSMContext):
     """Переход на следующую страницу"""
-    page_num = int(callback.data.split("_")[2])
-    await state.update_data(products_page=page_num)
-    
-    # Повторно вызываем функцию отображения товаров
-    await my_products_list(callback.message, state)
-    await callback.answer()
\ No newline at end of file
+    _, _, page_num, cursor = callback.data.split("_", 3)
+    await my_products_list(callback.message, state, page_num=int(page_num), after=cursor)
+    await callback.answer()
@@ -1,12 +1,14 @@
 """
 Обработчик профиля пользователя
 """
+from typing import Optional
 import logging
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 from database.session import get_db
+from database.models import User
 from database.repository import UserRepository, ProductRepository
 from keyboards.client import get_profile_keyboard, get_main_menu_keyboard, get_back_cancel_keyboard
 from utils.states import ClientState
@@ -17,73 +19,66 @@ logger = logging.getLogger(__name__)
 profile_router = Router()
 
 @profile_router.message(ClientState.profile_menu)
-async def profile_handler(message: Message, state: FSMContext):
+async def profile_handler(message: Message, state: FSMContext, user: Optional[User] = None):
     """Обработка действий в меню профиля"""
     logger.info(f"Пользователь {message.from_user.id} в меню профиля: {message.text}")
     
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
+    if not user:
+        return
+    
+    # Тексты кнопок
+    edit_name_ru = "📝 Изменить имя"
+    edit_name_tj = "📝 Тағйир додани ном"
+    edit_region_ru = "📝 Изменить регион"
+    edit_region_tj = "📝 Тағйир додани минтақа"
+    back_ru = "⬅️ Назад"
+    back_tj = "⬅️ Бозгашт"
+    
+    if message.text in [edit_name_ru, edit_name_tj]:
+        texts = {
+            "ru": "✏️ <b>Изменение имени</b>\n\nВведите ваше новое имя:",
+            "tj": "✏️ <b>Тағйир додани ном</b>\n\nНоми нави худро ворид кунед:"
+        }
         
-        if not user:
-            return
+        await message.answer(
+            texts[user.language],
+            reply_markup=get_back_cancel_keyboard(user.language),
+            parse_mode="HTML"
+        )
+        await state.set_state(ClientState.edit_name)
         
-        # Тексты кнопок
-        edit_name_ru = "📝 Изменить имя"
-        edit_name_tj = "📝 Тағйир додани ном"
-        edit_region_ru = "📝 Изменить регион"
-        edit_region_tj = "📝 Тағйир додани минтақа"
-        back_ru = "⬅️ Назад"
-        back_tj = "⬅️ Бозгашт"
+    elif message.text in [edit_region_ru, edit_region_tj]:
+        texts = {
+            "ru": "📍 <b>Изменение региона</b>\n\nВведите ваш новый регион:",
+            "tj": "📍 <b>Тағйир додани минтақа</b>\n\nМинтақаи нави худро ворид кунед:"
+        }
         
-        if message.text in [edit_name_ru, edit_name_tj]:
-            texts = {
-                "ru": "✏️ <b>Изменение имени</b>\n\nВведите ваше новое имя:",
-                "tj": "✏️ <b>Тағйир додани ном</b>\n\nНоми нави худро ворид кунед:"
-            }
-            
-            await message.answer(
-                texts[user.language],
-                reply_markup=get_back_cancel_keyboard(user.language),
-                parse_mode="HTML"
-            )
-            await state.set_state(ClientState.edit_name)
-            
-        elif message.text in [edit_region_ru, edit_region_tj]:
-            texts = {
-                "ru": "📍 <b>Изменение региона</b>\n\nВведите ваш новый регион:",
-                "tj": "📍 <b>Тағйир додани минтақа</b>\n\nМинтақаи нави худро ворид кунед:"
-            }
-            
-            await message.answer(
-                texts[user.language],
-                reply_markup=get_back_cancel_keyboard(user.language),
-                parse_mode="HTML"
-            )
-            await state.set_state(ClientState.edit_region)
-            
-        elif message.text in [back_ru, back_tj]:
-            await message.answer(
-                "Главное меню:" if user.language == "ru" else "Менюи асосӣ:",
-                reply_markup=get_main_menu_keyboard(user.language)
-            )
-            await state.set_state(ClientState.main_menu)
-        else:
-            await show_profile(message, state)
+        await message.answer(
+            texts[user.language],
+            reply_markup=get_back_cancel_keyboard(user.language),
+            parse_mode="HTML"
+        )
+        await state.set_state(ClientState.edit_region)
+        
+    elif message.text in [back_ru, back_tj]:
+        await message.answer(
+            "Главное меню:" if user.language == "ru" else "Менюи асосӣ:",
+            reply_markup=get_main_menu_keyboard(user.language)
+        )
+        await state.set_state(ClientState.main_menu)
+    else:
+        await show_profile(message, state, user=user)
 
-async def show_profile(message: Message, state: FSMContext):
+async def show_profile(message: Message, state: FSMContext, user: Optional[User] = None):
     """Показать профиль пользователя"""
     async for session in get_db():
-        user_repo = UserRepository(session)
         product_repo = ProductRepository(session)
         
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
         if not user:
             await message.answer("Пожалуйста, начните с команды /start")
             return
         
-        products = await product_repo.get_user_products(user.id)
+        products_count = await product_repo.count_user_products(user.id)
         
         texts = {
             "ru": f"""👤 <b>Профиль</b>
@@ -91,7 +86,7 @@ async def show_profile(message: Message, state: FSMContext):
 👤 Имя: {user.full_name or 'Не указано'}
 📞 Телефон: {user.phone or 'Не указан'}
 📍 Регион: {user.region or 'Не указан'}
-📦 Количество товаров: {len(products)}
+📦 Количество товаров: {products_count}
 🆔 UID: {user.telegram_id}
 
 Выберите действие:""",
@@ -100,7 +95,7 @@ async def show_profile(message: Message, state: FSMContext):
 👤 Ном: {user.full_name or 'Муайян нашудааст'}
 📞 Телефон: {user.phone or 'Муайян нашудааст'}
 📍 Минтақа: {user.region or 'Муайян нашудааст'}
-📦 Миқдори маҳсулот: {len(products)}
+📦 Миқдори маҳсулот: {products_count}
 🆔 UID: {user.telegram_id}
 
 Амалро интихоб кунед:"""
@@ -114,11 +109,10 @@ async def show_profile(message: Message, state: FSMContext):
         await state.set_state(ClientState.profile_menu)
 
 @profile_router.message(ClientState.edit_name)
-async def edit_name_handler(message: Message, state: FSMContext):
+async def edit_name_handler(message: Message, state: FSMContext, user: Optional[User] = None):
     """Обработка изменения имени"""
     async for session in get_db():
         user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
         
         if not user:
             return
@@ -130,11 +124,11 @@ async def edit_name_handler(message: Message, state: FSMContext):
         back_tj = "⬅️ Бозгашт"
         
         if message.text in [back_ru, back_tj, cancel_ru, cancel_tj]:
-            await show_profile(message, state)
+            await show_profile(message, state, user=user)
             return
         
         # Обновляем имя
-        await user_repo.update_user_profile(
+        user = await user_repo.update_user_profile(
             telegram_id=message.from_user.id,
             full_name=message.text
         )
@@ -145,14 +139,13 @@ async def edit_name_handler(message: Message, state: FSMContext):
         }
         
         await message.answer(texts[user.language])
-        await show_profile(message, state)
+        await show_profile(message, state, user=user)
 
 @profile_router.message(ClientState.edit_region)
-async def edit_region_handler(message: Message, state: FSMContext):
+async def edit_region_handler(message: Message, state: FSMContext, user: Optional[User] = None):
     """Обработка изменения региона"""
     async for session in get_db():
         user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
         
         if not user:
             return
@@ -164,11 +157,11 @@ async def edit_region_handler(message: Message, state: FSMContext):
         back_tj = "⬅️ Бозгашт"
         
         if message.text in [back_ru, back_tj, cancel_ru, cancel_tj]:
-            await show_profile(message, state)
+            await show_profile(message, state, user=user)
             return
         
         # Обновляем регион
-        await user_repo.update_user_profile(
+        user = await user_repo.update_user_profile(
             telegram_id=message.from_user.id,
             region=message.text
         )
@@ -179,4 +172,4 @@ async def edit_region_handler(message: Message, state: FSMContext):
         }
         
         await message.answer(texts[user.language])
-        await show_profile(message, state)
\ No newline at end of file
+        await show_profile(message, state, user=user)
\ No newline at end of file
@@ -1,6 +1,7 @@
 """
 Общие обработчики для всех пользователей
 """
+from typing import Optional
 import logging
 from aiogram import Router, F
 from aiogram.filters import CommandStart
@@ -10,9 +11,10 @@ from aiogram.types import KeyboardButton
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
 
 from database.session import get_db
+from database.models import User
 from database.repository import UserRepository
 from keyboards.client import get_language_keyboard, get_main_menu_keyboard
-from utils.states import LanguageState, ClientState
+from utils.states import LanguageState, ClientState, AdminChinaState, AdminTajikistanState
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -21,32 +23,28 @@ logger = logging.getLogger(__name__)
 common_router = Router()
 
 @common_router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext):
+async def cmd_start(message: Message, state: FSMContext, user: Optional[User] = None):
     """Обработчик команды /start"""
     logger.info(f"Команда /start от пользователя {message.from_user.id}")
     
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if user:
-            # Пользователь уже существует
-            logger.info(f"Пользователь {message.from_user.id} уже зарегистрирован")
-            await message.answer(
-                get_welcome_text(user.language),
-                reply_markup=get_main_menu_keyboard(user.language)
-            )
-            await state.set_state(ClientState.main_menu)
-        else:
-            # Новый пользователь
-            logger.info(f"Новый пользователь {message.from_user.id}")
-            await message.answer(
-                "🇷🇺 Выберите язык / 🇹🇯 Забони худро интихоб кунед\n\n"
-                "🇷🇺 Пожалуйста, выберите язык:\n"
-                "🇹🇯 Лутфан, забони худро интихоб кунед:",
-                reply_markup=get_language_keyboard()
-            )
-            await state.set_state(LanguageState.choosing_language)
+    if user:
+        # Пользователь уже существует
+        logger.info(f"Пользователь {message.from_user.id} уже зарегистрирован")
+        await message.answer(
+            get_welcome_text(user.language),
+            reply_markup=get_main_menu_keyboard(user.language)
+        )
+        await state.set_state(ClientState.main_menu)
+    else:
+        # Новый пользователь
+        logger.info(f"Новый пользователь {message.from_user.id}")
+        await message.answer(
+            "🇷🇺 Выберите язык / 🇹🇯 Забони худро интихоб кунед\n\n"
+            "🇷🇺 Пожалуйста, выберите язык:\n"
+            "🇹🇯 Лутфан, забони худро интихоб кунед:",
+            reply_markup=get_language_keyboard()
+        )
+        await state.set_state(LanguageState.choosing_language)
 
 @common_router.message(LanguageState.choosing_language)
 async def process_language_choice(message: Message, state: FSMContext):
@@ -120,19 +118,19 @@ async def process_language_choice(message: Message, state: FSMContext):
                 get_welcome_text(chosen_language, is_admin=True),
                 reply_markup=get_admin_main_menu(role, chosen_language)
             )
-            await state.clear()
+            await state.set_state(
+                AdminTajikistanState.main_menu if role == "admin_tj" else AdminChinaState.main_menu
+            )
 
 # Добавим отдельный обработчик для контактов в состоянии ожидания контакта
 @common_router.message(ClientState.waiting_for_contact, F.contact)
-async def process_contact_in_waiting_state(message: Message, state: FSMContext):
+async def process_contact_in_waiting_state(message: Message, state: FSMContext, user: Optional[User] = None):
     """Обработка полученного контакта в состоянии ожидания"""
     logger.info(f"Пользователь {message.from_user.id} поделился номером телефона (в состоянии ожидания)")
     
     async for session in get_db():
         user_repo = UserRepository(session)
         
-        # Получаем пользователя
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
         if not user:
             # Если пользователь не найден, создаем его с языком по умолчанию
             await message.answer("Ошибка: пользователь не найден. Пожалуйста, начните с /start")
@@ -152,7 +150,7 @@ async def process_contact_in_waiting_state(message: Message, state: FSMContext):
 
 # Также оставим общий обработчик контактов на всякий случай
 @common_router.message(F.contact)
-async def process_contact_general(message: Message, state: FSMContext):
+async def process_contact_general(message: Message, state: FSMContext, user: Optional[User] = None):
     """Общий обработчик полученного контакта"""
     logger.info(f"Пользователь {message.from_user.id} поделился номером телефона (общий обработчик)")
     
@@ -160,22 +158,17 @@ async def process_contact_general(message: Message, state: FSMContext):
         user_repo = UserRepository(session)
         
         # Проверяем, есть ли пользователь
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
         if not user:
             # Если пользователя нет, просим начать с /start
             await message.answer("Пожалуйста, сначала выберите язык с помощью команды /start")
             return
         
-        # Обновляем номер телефона
-        await user_repo.update_user_profile(
+        # Обновляем номер телефона и получаем актуального пользователя
+        user = await user_repo.update_user_profile(
             telegram_id=message.from_user.id,
             phone=message.contact.phone_number
         )
         
-        # Обновляем пользователя
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
         await message.answer(
             get_welcome_text(user.language),
             reply_markup=get_main_menu_keyboard(user.language)
@@ -183,23 +176,19 @@ async def process_contact_general(message: Message, state: FSMContext):
         await state.set_state(ClientState.main_menu)
 
 @common_router.message(F.text.contains("❌"))
-async def cmd_cancel(message: Message, state: FSMContext):
+async def cmd_cancel(message: Message, state: FSMContext, user: Optional[User] = None):
     """Обработка отмены"""
     logger.info(f"Пользователь {message.from_user.id} нажал отмену")
     
-    async for session in get_db():
-        user_repo = UserRepository(session)
-        user = await user_repo.get_user_by_telegram_id(message.from_user.id)
-        
-        if user:
-            await message.answer(
-                "Действие отменено. Главное меню:" if user.language == "ru" else "Амал бекор карда шуд. Менюи асосӣ:",
-                reply_markup=get_main_menu_keyboard(user.language)
-            )
-            await state.set_state(ClientState.main_menu)
-        else:
-            # Если пользователя нет, просим начать заново
-            await message.answer("Пожалуйста, начните с команды /start")
+    if user:
+        await message.answer(
+            "Действие отменено. Главное меню:" if user.language == "ru" else "Амал бекор карда шуд. Менюи асосӣ:",
+            reply_markup=get_main_menu_keyboard(user.language)
+        )
+        await state.set_state(ClientState.main_menu)
+    else:
+        # Если пользователя нет, просим начать заново
+        await message.answer("Пожалуйста, начните с команды /start")
 
 def get_welcome_text(language: str = "ru", is_admin: bool = False):
     """Получение приветственного текста"""
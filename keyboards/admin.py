@@ -1,6 +1,6 @@
 # keyboards/admin.py - дополняем существующий файл
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, KeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 
 def get_admin_main_keyboard(role: str = "admin_cn"):
     """Главное меню админа"""
@@ -29,6 +29,30 @@ def get_admin_main_keyboard(role: str = "admin_cn"):
     keyboard.adjust(2, 2, 2, 1, 1)
     return keyboard.as_markup()
 
+def get_admin_main_menu(role: str = "admin_cn", language: str = "ru"):
+    """Меню склада (обработчики admin_china / admin_tajikistan различают кнопки по эмодзи)"""
+    buttons = {
+        "admin_cn": {
+            "ru": ["➕ Добавить товары", "🔄 Массовое обновление", "📊 Отчеты",
+                   "🔍 Проверить товар", "⬅️ Назад"],
+            "tj": ["➕ Илова кардани маҳсулот", "🔄 Навсозии оммавӣ", "📊 Ҳисоботҳо",
+                   "🔍 Санҷиши маҳсулот", "⬅️ Бозгашт"]
+        },
+        "admin_tj": {
+            "ru": ["✅ Подтвердить прибытие", "✏️ Изменить статус", "🚚 Доставка до дверей",
+                   "📊 Отчеты", "⬅️ Назад"],
+            "tj": ["✅ Тасдиқи расидан", "✏️ Тағйири ҳолат", "🚚 Расонидан то дар",
+                   "📊 Ҳисоботҳо", "⬅️ Бозгашт"]
+        }
+    }
+    texts = buttons.get(role, buttons["admin_cn"])
+
+    keyboard = ReplyKeyboardBuilder()
+    for text in texts.get(language, texts["ru"]):
+        keyboard.add(KeyboardButton(text=text))
+    keyboard.adjust(2)
+    return keyboard.as_markup(resize_keyboard=True)
+
 def get_status_update_menu_keyboard():
     """Меню обновления статусов"""
     keyboard = InlineKeyboardBuilder()
@@ -41,27 +65,27 @@ def get_status_update_menu_keyboard():
     keyboard.adjust(2, 1, 1)
     return keyboard.as_markup()
 
-def get_status_keyboard(is_bulk: bool = False):
-    """Клавиатура выбора статуса"""
+def get_status_keyboard(is_bulk: bool = False, prefix: str = None):
+    """Клавиатура выбора статуса (коды - имена ProductStatus)"""
     statuses = [
         ("CREATED", "📝 Создан"),
-        ("IN_CHINA_WAREHOUSE", "🇨🇳 В Китае"),
+        ("CHINA_WAREHOUSE", "🇨🇳 На складе в Китае"),
         ("IN_TRANSIT", "✈️ В пути"),
-        ("ARRIVED_TJ", "🇹🇯 Прибыл в TJ"),
-        ("READY_FOR_PICKUP", "✅ Готов к выдаче"),
+        ("TAJIKISTAN_WAREHOUSE", "🇹🇯 Прибыл в TJ"),
         ("DELIVERED", "📦 Доставлен"),
-        ("CANCELLED", "❌ Отменен"),
-        ("PROBLEM", "⚠️ Проблема"),
+        ("COMPLETED", "✅ Завершен"),
     ]
     
+    if prefix is None:
+        prefix = "bulk_status_" if is_bulk else "set_status_"
+    
     keyboard = InlineKeyboardBuilder()
     
     for status_code, status_text in statuses:
-        callback_data = f"bulk_status_{status_code}" if is_bulk else f"set_status_{status_code}"
-        keyboard.button(text=status_text, callback_data=callback_data)
+        keyboard.button(text=status_text, callback_data=f"{prefix}{status_code}")
     
     keyboard.button(text="🔙 Назад", callback_data="admin_update_status")
-    keyboard.adjust(2, 2, 2, 2, 1)
+    keyboard.adjust(2, 2, 2, 1)
     return keyboard.as_markup()
 
 def get_reports_keyboard():
@@ -79,6 +103,12 @@ def get_reports_keyboard():
     keyboard.adjust(2, 2, 2, 1)
     return keyboard.as_markup()
 
+def get_report_cancel_keyboard(job_id: int):
+    """Кнопка отмены формируемого отчета"""
+    keyboard = InlineKeyboardBuilder()
+    keyboard.button(text="❌ Отменить", callback_data=f"report_cancel_{job_id}")
+    return keyboard.as_markup()
+
 def get_back_to_admin_keyboard():
     """Кнопка назад в админ-меню"""
     keyboard = InlineKeyboardBuilder()
@@ -1,7 +1,235 @@
+"""
+Расчет стоимости доставки для оптовиков по тарифам маршрутов.
+
+Тарифы хранятся в файле TARIFFS_FILE (JSON с номером версии) и
+загружаются один раз. Таблицы диапазонов веса компилируются в
+отсортированные массивы верхних границ - цена находится двоичным поиском
+(bisect), а тексты тарифов на ru/tj рендерятся при загрузке версии.
+Диапазон действует до своей верхней границы включительно: веса между
+диапазонами таблицы получают цену следующего диапазона, а веса больше
+последней границы - цену последнего.
+
+Изменение файла подхватывается без перезапуска: не чаще раза в
+TARIFFS_RELOAD_INTERVAL секунд проверяется время изменения файла, новая
+версия полностью собирается и подменяет старую одним присваиванием.
+Ошибочный файл не применяется - остается предыдущая версия.
+"""
+import json
+import logging
+import math
+import os
+import re
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+ROUTE_URUMCHI = "Urumchi → Khujand"
+ROUTE_YIWU = "Yiwu → Khujand"
+
+LANGUAGES = ("ru", "tj")
+
+
+@dataclass(frozen=True)
+class PriceBands:
+    """Диапазоны веса (по возрастанию верхней границы) и их цены"""
+    lower: Tuple[float, ...]
+    bounds: Tuple[float, ...]
+    prices: Tuple[float, ...]
+
+    @classmethod
+    def compile(cls, table: Sequence[dict]) -> "PriceBands":
+        rows = sorted(table, key=lambda row: row["max"])
+        if not rows:
+            raise ValueError("Пустая таблица цен")
+        return cls(
+            lower=tuple(float(row["min"]) for row in rows),
+            bounds=tuple(float(row["max"]) for row in rows),
+            prices=tuple(float(row["price"]) for row in rows)
+        )
+
+    def index(self, weight_kg: float) -> int:
+        """Номер диапазона: первый, верхняя граница которого не меньше веса"""
+        return min(bisect_left(self.bounds, weight_kg), len(self.bounds) - 1)
+
+    def price(self, weight_kg: float) -> float:
+        return self.prices[self.index(weight_kg)]
+
+
+@dataclass(frozen=True)
+class Tariff:
+    """Скомпилированный тариф маршрута"""
+    route: str
+    titles: Dict[str, str]
+    per_cubic: PriceBands
+    per_kg: PriceBands
+    cubic_price_max_weight: float
+
+    def quote(self, volume_cubic_meters: float, weight_kg: float) -> float:
+        if weight_kg <= self.cubic_price_max_weight:
+            return volume_cubic_meters * self.per_cubic.price(weight_kg)
+        return weight_kg * self.per_kg.price(weight_kg)
+
+
+def _format_weight(value: float) -> str:
+    return f"{value:g}"
+
+
+def _format_price(value: float, per_kg: bool) -> str:
+    return f"${value:.2f}" if per_kg else f"${value:g}"
+
+
+def render_tariff_text(tariff: Tariff, language: str) -> str:
+    """Текст тарифов маршрута (выполняется один раз при загрузке версии)"""
+    t = {
+        "ru": {
+            "title": "Тарифы",
+            "cubic": "Для грузов до {w} кг (цена за м³)",
+            "kg": "Для грузов от {w} кг (цена за кг)",
+            "up_to": "до",
+            "per_cubic": "за м³",
+            "per_kg": "за кг",
+        },
+        "tj": {
+            "title": "Тарифҳои",
+            "cubic": "Барои борҳои то {w} кг (нарх барои м³)",
+            "kg": "Барои борҳои аз {w} кг (нарх барои кг)",
+            "up_to": "то",
+            "per_cubic": "барои м³",
+            "per_kg": "барои кг",
+        },
+    }[language]
+
+    def band_lines(bands: PriceBands, unit: str, per_kg: bool, open_end: bool):
+        lines = []
+        for low, high, price in zip(bands.lower, bands.bounds, bands.prices):
+            label = f"{t['up_to']} {_format_weight(high)}" if low <= 0 else f"{_format_weight(low)}–{_format_weight(high)}"
+            lines.append(f"{label} kg: {_format_price(price, per_kg)} {unit}")
+        if open_end:
+            # Вес больше последней границы - по цене последнего диапазона
+            lines.append(f">{_format_weight(bands.bounds[-1])} кг: {_format_price(bands.prices[-1], per_kg)} {unit}")
+        return lines
+
+    max_weight = tariff.cubic_price_max_weight
+    title = tariff.titles.get(language) or tariff.route
+    parts = [f"📊 <b>{t['title']} {title}:</b>", ""]
+    parts.append(f"<b>{t['cubic'].format(w=_format_weight(max_weight))}:</b>")
+    parts += band_lines(tariff.per_cubic, t["per_cubic"], per_kg=False, open_end=False)
+    parts.append("")
+    parts.append(f"<b>{t['kg'].format(w=_format_weight(max_weight + 1))}:</b>")
+    parts += band_lines(tariff.per_kg, t["per_kg"], per_kg=True, open_end=True)
+    return "\n".join(parts)
+
+
+@dataclass(frozen=True)
+class TariffBook:
+    """Версия тарифов: скомпилированные маршруты и готовые тексты"""
+    version: int
+    tariffs: Dict[str, Tariff]
+    texts: Dict[Tuple[str, str], str]  # (маршрут, язык) -> текст
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TariffBook":
+        max_weight = float(data.get("cubic_price_max_weight", 200))
+        tariffs = {
+            route: Tariff(
+                route=route,
+                titles=table.get("title", {}),
+                per_cubic=PriceBands.compile(table["price_per_cubic"]),
+                per_kg=PriceBands.compile(table["price_per_kg"]),
+                cubic_price_max_weight=max_weight
+            )
+            for route, table in data["routes"].items()
+        }
+        if ROUTE_YIWU not in tariffs:
+            raise ValueError(f"Нет тарифа маршрута {ROUTE_YIWU}")
+        texts = {
+            (route, language): render_tariff_text(tariff, language)
+            for route, tariff in tariffs.items()
+            for language in LANGUAGES
+        }
+        return cls(version=int(data["version"]), tariffs=tariffs, texts=texts)
+
+    def get_tariff(self, route: str) -> Tariff:
+        """Тариф маршрута (неизвестный маршрут считается как Yiwu → Khujand)"""
+        return self.tariffs.get(route) or self.tariffs[ROUTE_YIWU]
+
+    def get_text(self, route: str, language: str) -> str:
+        route = route if route in self.tariffs else ROUTE_YIWU
+        return self.texts.get((route, language)) or self.texts[(route, "ru")]
+
+
+class TariffStore:
+    """Текущая версия тарифов из JSON-файла с перезагрузкой при изменении"""
+
+    def __init__(self, path: str, reload_interval: float = 30):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._book: Optional[TariffBook] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+
+    def _file_signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> TariffBook:
+        """Чтение и сборка тарифов; текущая версия подменяется только при успехе"""
+        signature = self._file_signature()
+        with open(self.path, encoding="utf-8") as f:
+            book = TariffBook.from_dict(json.load(f))
+        self._book = book
+        self._signature = signature
+        logger.info(f"Тарифы загружены: версия {book.version} ({self.path})")
+        return book
+
+    def reload_if_changed(self) -> bool:
+        """Перезагрузка, если файл изменился (ошибки - в лог, версия остается прежней)"""
+        try:
+            signature = self._file_signature()
+            if signature == self._signature:
+                return False
+            self.load()
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Не повторяем попытку, пока файл снова не изменится
+            try:
+                self._signature = self._file_signature()
+            except OSError:
+                pass
+            logger.error(f"Тарифы из {self.path} не применены: {e}")
+            return False
+
+    @property
+    def book(self) -> TariffBook:
+        if self._book is None:
+            self._checked_at = time.monotonic()
+            return self.load()
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            self.reload_if_changed()
+        return self._book
+
+
+tariff_store = TariffStore(settings.TARIFFS_FILE, settings.TARIFFS_RELOAD_INTERVAL)
+
+
+def get_tariff(route: str) -> Tariff:
+    """Тариф маршрута текущей версии"""
+    return tariff_store.book.get_tariff(route)
+
+
 def calculate_delivery_cost(volume_cubic_meters: float, weight_kg: float, route: str) -> float:
     """
     Рассчитать стоимость доставки для оптовиков по таблицам
     
+    До 200 кг включительно - цена за куб, от 201 кг - цена за кг.
+    
     Args:
         volume_cubic_meters: Объем в кубических метрах
         weight_kg: Вес в килограммах
@@ -10,120 +238,137 @@ def calculate_delivery_cost(volume_cubic_meters: float, weight_kg: float, route:
     Returns:
         Стоимость в USD
     """
-    # Таблицы цен для Urumchi → Khujand
-    urumchi_prices = {
-        # Цена за куб (для легких объемных грузов)
-        "price_per_cubic": {
-            (0, 100): 170,    # > 100 kg
-            (101, 150): 180,  # 101–150
-            (151, 200): 200,  # 151–200
-        },
-        # Цена за кг (для тяжелых грузов)
-        "price_per_kg": {
-            (230, 250): 0.90,   # 230–250
-            (251, 300): 0.80,   # 251–300
-            (301, 350): 0.75,   # 301–350
-            (351, 450): 0.70,   # 351–450
-            (451, 500): 0.65,   # 451–500
-            (551, 650): 0.60,   # 551–650
-            (651, 850): 0.55,   # 651–850
-            (851, 950): 0.50,   # 851–950
-            (951, 1500): 0.45,  # 951–1500
-        }
-    }
+    return get_tariff(route).quote(volume_cubic_meters, weight_kg)
+
+
+def quote_batch(volumes, weights, route: str):
+    """
+    Стоимость доставки для массива грузов одного маршрута (например, всей
+    накладной) за один вызов
     
-    # Таблицы цен для Yiwu → Khujand
-    yiwu_prices = {
-        # Цена за куб (для легких объемных грузов)
-        "price_per_cubic": {
-            (0, 100): 200,    # > 100 kg
-            (101, 150): 210,  # 101–150
-            (151, 200): 230,  # 151–200
-        },
-        # Цена за кг (для тяжелых грузов)
-        "price_per_kg": {
-            (201, 250): 1.03,   # 201–250
-            (251, 300): 0.93,   # 251–300
-            (301, 350): 0.88,   # 301–350
-            (351, 450): 0.83,   # 351–450
-            (451, 500): 0.78,   # 451–500
-            (501, 650): 0.73,   # 501–650
-            (651, 900): 0.68,   # 651–900
-            (951, 1000): 0.63,  # 951–1000
-            (1001, 1500): 0.58, # 1001–1500
-        }
-    }
+    Args:
+        volumes: Объемы в кубических метрах (массив NumPy или последовательность)
+        weights: Веса в килограммах
+        route: Маршрут
+        
+    Returns:
+        numpy.ndarray: Стоимости в USD
+    """
+    import numpy as np
     
-    # Выбираем нужную таблицу цен
-    if route == "Urumchi → Khujand":
-        prices = urumchi_prices
-    else:  # Yiwu → Khujand
-        prices = yiwu_prices
+    tariff = get_tariff(route)
+    volumes = np.asarray(volumes, dtype=float)
+    weights = np.asarray(weights, dtype=float)
     
-    # ВЫБОР РАСЧЕТА ПО ЛОГИКЕ:
-    # 1. Если вес до 200 кг включительно - используем ЦЕНУ ЗА КУБ
-    # 2. Если вес от 201 кг и выше - используем ЦЕНУ ЗА КГ
+    def prices(bands: PriceBands):
+        # searchsorted(side="left") - тот же поиск, что и bisect_left
+        index = np.minimum(np.searchsorted(bands.bounds, weights, side="left"), len(bands.bounds) - 1)
+        return np.asarray(bands.prices)[index]
     
-    # Определяем, использовать ли цену за куб или за кг
-    use_cubic_price = False
-    calculation_type = ""
-    price_per_unit = 0
+    return np.where(
+        weights <= tariff.cubic_price_max_weight,
+        volumes * prices(tariff.per_cubic),
+        weights * prices(tariff.per_kg)
+    )
+
+# Максимум коробок в одном расчете
+MAX_BOXES = 200
+
+_NUMBER = r"(\d+(?:[.,]\d+)?)"
+_SEPARATOR = r"\s*[xх×*]\s*"
+# "ДлинаxШиринаxВысота Вес": размеры в метрах, вес в кг
+_BOX_LINE = re.compile(
+    rf"^\s*{_NUMBER}{_SEPARATOR}{_NUMBER}{_SEPARATOR}{_NUMBER}[\s,;]+{_NUMBER}\s*(?:кг|kg)?\s*$",
+    re.IGNORECASE
+)
+
+
+@dataclass(frozen=True)
+class Box:
+    """Коробка: размеры в метрах, вес в кг"""
+    length_m: float
+    width_m: float
+    height_m: float
+    weight_kg: float
+
+    @property
+    def volume(self) -> float:
+        return self.length_m * self.width_m * self.height_m
+
+
+@dataclass(frozen=True)
+class RouteQuote:
+    """Стоимость сборного груза по одному маршруту"""
+    route: str
+    by_volume: bool  # True - цена за м³, False - цена за кг
+    price_per_unit: float
+    cost: float
+
+
+@dataclass(frozen=True)
+class ShipmentQuote:
+    """Сравнение маршрутов для сборного груза (по возрастанию стоимости)"""
+    box_count: int
+    total_volume: float
+    total_weight: float
+    routes: List[RouteQuote]
+
+
+def parse_boxes(text: str) -> Tuple[List[Box], List[str]]:
+    """
+    Коробки из сообщения: по одной на строку, "ДxШxВ вес"
+    (например, "0.6x0.4x0.5 18"; разделитель x, х, × или *)
     
-    if weight_kg <= 200:
-        # Используем цену за куб (легкие объемные грузы)
-        use_cubic_price = True
-        calculation_type = "по объему (цена за м³)"
-        
-        # Ищем подходящий диапазон веса для цены за куб
-        for (min_weight, max_weight), price in prices["price_per_cubic"].items():
-            if min_weight <= weight_kg <= max_weight:
-                price_per_unit = price
-                return volume_cubic_meters * price
-        
-        # Если вес не попал в диапазон (например, 0-100, 101-150, 151-200)
-        # то берем последний доступный диапазон
-        if weight_kg > 150:
-            price_per_unit = prices["price_per_cubic"][(151, 200)]
-        elif weight_kg > 100:
-            price_per_unit = prices["price_per_cubic"][(101, 150)]
-        else:
-            price_per_unit = prices["price_per_cubic"][(0, 100)]
-            
-        return volume_cubic_meters * price_per_unit
-        
-    else:
-        # Используем цену за кг (тяжелые грузы)
-        use_cubic_price = False
-        calculation_type = "по весу (цена за кг)"
-        
-        # Для Urumchi маршрута диапазон начинается с 230 кг
-        # Для Yiwu маршрута диапазон начинается с 201 кг
-        # Поэтому для весов 201-229 для Urumchi используем минимальный диапазон
-        if route == "Urumchi → Khujand" and weight_kg < 230:
-            # Для веса 201-229 кг используем цену как для 230-250
-            price_per_unit = prices["price_per_kg"][(230, 250)]
-            return weight_kg * price_per_unit
-        
-        # Ищем подходящий диапазон веса для цены за кг
-        for (min_weight, max_weight), price in prices["price_per_kg"].items():
-            if min_weight <= weight_kg <= max_weight:
-                price_per_unit = price
-                return weight_kg * price
-        
-        # Если вес больше 1500 кг - используем максимальный диапазон
-        if weight_kg > 1500:
-            # Для Urumchi
-            if route == "Urumchi → Khujand":
-                price_per_unit = prices["price_per_kg"][(951, 1500)]
-            else:  # Yiwu
-                price_per_unit = prices["price_per_kg"][(1001, 1500)]
-            return weight_kg * price_per_unit
-        
-        # Если не нашли подходящий диапазон (должно быть покрыто выше)
-        # Берем максимальный доступный диапазон
-        max_range = max(prices["price_per_kg"].keys(), key=lambda x: x[1])
-        price_per_unit = prices["price_per_kg"][max_range]
-        return weight_kg * price_per_unit
+    Returns:
+        Tuple[List[Box], List[str]]: коробки и строки, которые не удалось разобрать
+    """
+    boxes = []
+    invalid = []
+    for line in (text or "").splitlines():
+        if not line.strip():
+            continue
+        match = _BOX_LINE.match(line)
+        values = [float(v.replace(",", ".")) for v in match.groups()] if match else None
+        if not values or any(v <= 0 for v in values):
+            invalid.append(line.strip())
+            continue
+        boxes.append(Box(*values))
+    return boxes, invalid
+
+
+def quote_shipment(boxes: Sequence[Box], routes: Optional[Sequence[str]] = None) -> ShipmentQuote:
+    """
+    Стоимость сборного груза: суммарные объем и вес всех коробок
+    оцениваются по тарифу каждого маршрута за один проход
+    
+    Args:
+        boxes: Коробки груза
+        routes: Маршруты для сравнения (по умолчанию - все маршруты тарифов)
+    """
+    book = tariff_store.book
+    total_volume = math.fsum(box.volume for box in boxes)
+    total_weight = math.fsum(box.weight_kg for box in boxes)
+    
+    quotes = []
+    for route in routes or list(book.tariffs):
+        tariff = book.get_tariff(route)
+        by_volume = total_weight <= tariff.cubic_price_max_weight
+        bands = tariff.per_cubic if by_volume else tariff.per_kg
+        price = bands.price(total_weight)
+        quotes.append(RouteQuote(
+            route=tariff.route,
+            by_volume=by_volume,
+            price_per_unit=price,
+            cost=(total_volume if by_volume else total_weight) * price
+        ))
+    
+    quotes.sort(key=lambda quote: quote.cost)
+    return ShipmentQuote(
+        box_count=len(boxes),
+        total_volume=total_volume,
+        total_weight=total_weight,
+        routes=quotes
+    )
 
 def calculate_volume(length_m: float, width_m: float, height_m: float) -> float:
     """
@@ -148,86 +393,9 @@ def get_price_table_info(route: str, language: str = "ru") -> str:
         language: Язык
         
     Returns:
-        Строка с информацией о тарифах
+        Строка с информацией о тарифах (подготовлена при загрузке тарифов)
     """
-    if route == "Urumchi → Khujand":
-        if language == "ru":
-            return """📊 <b>Тарифы Urumchi → Khujand:</b>
-
-<b>Для грузов до 200 кг (цена за м³):</b>
-> 100 kg: $170 за м³
-101–150 kg: $180 за м³
-151–200 kg: $200 за м³
-
-<b>Для грузов от 201 кг (цена за кг):</b>
-230–250 kg: $0.90 за кг
-251–300 kg: $0.80 за кг
-301–350 kg: $0.75 за кг
-351–450 kg: $0.70 за кг
-451–500 kg: $0.65 за кг
-551–650 kg: $0.60 за кг
-651–850 kg: $0.55 за кг
-851–950 kg: $0.50 за кг
-951–1500 kg: $0.45 за кг
->1500 кг: $0.45 за кг"""
-        else:  # tj
-            return """📊 <b>Тарифҳои Урумчӣ → Хуҷанд:</b>
-
-<b>Барои борҳои то 200 кг (нарх барои м³):</b>
-> 100 kg: $170 барои м³
-101–150 kg: $180 барои м³
-151–200 kg: $200 барои м³
-
-<b>Барои борҳои аз 201 кг (нарх барои кг):</b>
-230–250 kg: $0.90 барои кг
-251–300 kg: $0.80 барои кг
-301–350 kg: $0.75 барои кг
-351–450 kg: $0.70 барои кг
-451–500 kg: $0.65 барои кг
-551–650 kg: $0.60 барои кг
-651–850 kg: $0.55 барои кг
-851–950 kg: $0.50 барои кг
-951–1500 kg: $0.45 барои кг
->1500 кг: $0.45 барои кг"""
-    else:  # Yiwu → Khujand
-        if language == "ru":
-            return """📊 <b>Тарифы Yiwu → Khujand:</b>
-
-<b>Для грузов до 200 кг (цена за м³):</b>
-> 100 kg: $200 за м³
-101–150 kg: $210 за м³
-151–200 kg: $230 за м³
-
-<b>Для грузов от 201 кг (цена за кг):</b>
-201–250 kg: $1.03 за кг
-251–300 kg: $0.93 за кг
-301–350 kg: $0.88 за кг
-351–450 kg: $0.83 за кг
-451–500 kg: $0.78 за кг
-501–650 kg: $0.73 за кг
-651–900 kg: $0.68 за кг
-951–1000 kg: $0.63 за кг
-1001–1500 kg: $0.58 за кг
->1500 кг: $0.58 за кг"""
-        else:  # tj
-            return """📊 <b>Тарифҳои Иву → Хуҷанд:</b>
-
-<b>Барои борҳои то 200 кг (нарх барои м³):</b>
-> 100 kg: $200 барои м³
-101–150 kg: $210 барои м³
-151–200 kg: $230 барои м³
-
-<b>Барои борҳои аз 201 кг (нарх барои кг):</b>
-201–250 kg: $1.03 барои кг
-251–300 kg: $0.93 барои кг
-301–350 kg: $0.88 барои кг
-351–450 kg: $0.83 барои кг
-451–500 kg: $0.78 барои кг
-501–650 kg: $0.73 барои кг
-651–900 kg: $0.68 барои кг
-951–1000 kg: $0.63 барои кг
-1001–1500 kg: $0.58 барои кг
->1500 кг: $0.58 барои кг"""
+    return tariff_store.book.get_text(route, language)
 
 def get_calculation_type(weight_kg: float, route: str, language: str = "ru") -> str:
     """
@@ -241,7 +409,7 @@ def get_calculation_type(weight_kg: float, route: str, language: str = "ru") ->
     Returns:
         Строка с типом расчета
     """
-    if weight_kg <= 200:
+    if weight_kg <= get_tariff(route).cubic_price_max_weight:
         if language == "ru":
             return "по объему (цена за м³)"
         else:
@@ -1,14 +1,54 @@
-import asyncio
+"""
+Экспорт товаров в Excel.
+
+Файлы строятся в процессах ReportExecutor (services.report_executor):
+здесь из базы и ORM-объектов готовятся простые кортежи строк, а
+openpyxl работает в воркере, не занимая поток событий бота.
+"""
 import os
+import tempfile
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
+from enum import Enum
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import Product
+from services.report_executor import report_executor, ReportTask
+from services.report_workers import spool_batch, write_spooled_rows_xlsx, write_styled_report
+
+# Сколько строк читать из базы за один раз при выгрузке
+EXPORT_BATCH_SIZE = 1000
+
+# Колонки полной выгрузки базы: (заголовок, столбец, ширина)
+DATABASE_EXPORT_COLUMNS = [
+    ("ID", Product.id, 8),
+    ("Трек-код", Product.track_code, 20),
+    ("Название", Product.product_name, 30),
+    ("Категория", Product.product_category, 15),
+    ("Количество", Product.quantity, 12),
+    ("Цена за ед. ($)", Product.unit_price_usd, 14),
+    ("Общая стоимость ($)", Product.total_value_usd, 18),
+    ("Вес (кг)", Product.weight_kg, 10),
+    ("Статус", Product.status, 22),
+    ("Страна отправления", Product.country_from, 18),
+    ("Тип доставки", Product.delivery_type, 15),
+    ("Дата отправки", Product.send_date, 18),
+    ("Дата прибытия", Product.arrival_date, 18),
+    ("Хрупкий", Product.fragile, 10),
+    ("Батарея", Product.has_battery, 10),
+    ("Жидкость", Product.is_liquid, 10),
+    ("Дата создания", Product.created_at, 18),
+    ("Дата обновления", Product.updated_at, 18),
+]
 
-async def generate_excel_report(products: List[Product], period: str, language: str = "ru") -> str:
+async def generate_excel_report(
+    products: List[Product],
+    period: str,
+    language: str = "ru",
+    task: Optional[ReportTask] = None
+) -> str:
     """
     Генерация Excel отчета
     
@@ -16,14 +56,11 @@ async def generate_excel_report(products: List[Product], period: str, language:
         products: Список товаров
         period: Период отчета ('week', 'month', 'year')
         language: Язык отчета
+        task: Отчет ReportExecutor (для отмены); по умолчанию создается новый
         
     Returns:
         Путь к файлу
     """
-    # Создаем рабочую книгу
-    wb = Workbook()
-    ws = wb.active
-    
     # Названия колонок в зависимости от языка
     headers = {
         "ru": [
@@ -52,66 +89,45 @@ async def generate_excel_report(products: List[Product], period: str, language:
         ]
     }
     
-    # Заголовки
-    ws.append(headers[language])
-    
-    # Настройка стилей для заголовков
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    alignment = Alignment(horizontal="center", vertical="center")
-    thin_border = Border(
-        left=Side(style='thin'), 
-        right=Side(style='thin'),
-        top=Side(style='thin'), 
-        bottom=Side(style='thin')
-    )
-    
-    # Применяем стили к заголовкам
-    for col in range(1, len(headers[language]) + 1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = alignment
-        cell.border = thin_border
-    
-    # Заполняем данные
-    for i, product in enumerate(products, 2):
-        # Перевод статусов
-        status_translation = {
-            "ru": {
-                "created": "Создан",
-                "china_warehouse": "На складе Китай",
-                "in_transit": "В пути",
-                "tajikistan_warehouse": "На складе Таджикистан",
-                "delivered": "Доставлен",
-                "completed": "Завершен"
-            },
-            "tj": {
-                "created": "Сохта шудааст",
-                "china_warehouse": "Дар анбори Чин",
-                "in_transit": "Дар роҳ",
-                "tajikistan_warehouse": "Дар анбори Тоҷикистон",
-                "delivered": "Расонида шуд",
-                "completed": "Анҷом ёфт"
-            }
+    # Перевод статусов
+    status_translation = {
+        "ru": {
+            "created": "Создан",
+            "china_warehouse": "На складе Китай",
+            "in_transit": "В пути",
+            "tajikistan_warehouse": "На складе Таджикистан",
+            "delivered": "Доставлен",
+            "completed": "Завершен"
+        },
+        "tj": {
+            "created": "Сохта шудааст",
+            "china_warehouse": "Дар анбори Чин",
+            "in_transit": "Дар роҳ",
+            "tajikistan_warehouse": "Дар анбори Тоҷикистон",
+            "delivered": "Расонида шуд",
+            "completed": "Анҷом ёфт"
         }
-        
-        # Перевод статусов доставки до дверей
-        door_delivery_translation = {
-            "ru": {
-                "pending": "В ожидании",
-                "delivered": "Доставлено",
-                "cancelled": "Отменено"
-            },
-            "tj": {
-                "pending": "Дар интизорӣ",
-                "delivered": "Расонида шуд",
-                "cancelled": "Бекор карда шуд"
-            }
+    }
+    
+    # Перевод статусов доставки до дверей
+    door_delivery_translation = {
+        "ru": {
+            "pending": "В ожидании",
+            "delivered": "Доставлено",
+            "cancelled": "Отменено"
+        },
+        "tj": {
+            "pending": "Дар интизорӣ",
+            "delivered": "Расонида шуд",
+            "cancelled": "Бекор карда шуд"
         }
-        
-        row = [
-            i - 1,  # №
+    }
+    
+    # Строки отчета - простые значения для воркера
+    rows = []
+    for i, product in enumerate(products, 1):
+        rows.append((
+            i,  # №
             product.track_code,
             status_translation[language].get(product.status.value, product.status.value),
             product.country_from or "-",
@@ -124,35 +140,7 @@ async def generate_excel_report(products: List[Product], period: str, language:
                 product.door_delivery_status.value
             ),
             product.created_at.strftime("%d.%m.%Y %H:%M")
-        ]
-        
-        ws.append(row)
-        
-        # Применяем стили к данным
-        for col in range(1, len(row) + 1):
-            cell = ws.cell(row=i, column=col)
-            cell.border = thin_border
-            if col in [1, 7, 8, 10]:  # Центрируем числовые и даты
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Настройка ширины колонок
-    column_widths = [5, 20, 15, 15, 15, 10, 15, 15, 15, 15]
-    for i, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(i)].width = width
-    
-    # Добавляем итоговую строку
-    total_row = len(products) + 2
-    ws.cell(row=total_row, column=1, value="Итого:" if language == "ru" else "Ҷамъ:")
-    ws.cell(row=total_row, column=2, value=len(products))
-    
-    # Объединяем ячейки для итоговой строки
-    ws.merge_cells(start_row=total_row, start_column=1, end_row=total_row, end_column=len(headers[language]))
-    
-    # Стиль для итоговой строки
-    total_cell = ws.cell(row=total_row, column=1)
-    total_cell.font = Font(bold=True, color="FFFFFF")
-    total_cell.fill = PatternFill(start_color="FF6600", end_color="FF6600", fill_type="solid")
-    total_cell.alignment = Alignment(horizontal="center", vertical="center")
+        ))
     
     # Создаем папку для отчетов, если ее нет
     os.makedirs("reports", exist_ok=True)
@@ -161,25 +149,35 @@ async def generate_excel_report(products: List[Product], period: str, language:
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"reports/report_{period}_{timestamp}.xlsx"
     
-    # Сохраняем файл
-    wb.save(filename)
-    
-    return filename
+    return await _run_report(
+        task,
+        write_styled_report,
+        filename,
+        headers[language],
+        rows,
+        [5, 20, 15, 15, 15, 10, 15, 15, 15, 15],
+        header_color="366092",
+        center_columns=(1, 7, 8, 10),
+        bordered=True,
+        total_label="Итого:" if language == "ru" else "Ҷамъ:"
+    )
 
-async def generate_delivery_report(deliveries: List[Product], language: str = "ru") -> str:
+async def generate_delivery_report(
+    deliveries: List[Product],
+    language: str = "ru",
+    task: Optional[ReportTask] = None
+) -> str:
     """
     Генерация отчета по доставке до дверей
     
     Args:
         deliveries: Список товаров с доставкой до дверей
         language: Язык отчета
+        task: Отчет ReportExecutor (для отмены); по умолчанию создается новый
         
     Returns:
         Путь к файлу
     """
-    wb = Workbook()
-    ws = wb.active
-    
     headers = {
         "ru": [
             "№",
@@ -201,35 +199,137 @@ async def generate_delivery_report(deliveries: List[Product], language: str = "r
         ]
     }
     
-    ws.append(headers[language])
-    
-    # Стили заголовков
-    for col in range(1, len(headers[language]) + 1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    for i, delivery in enumerate(deliveries, 2):
-        row = [
-            i - 1,
+    rows = []
+    for i, delivery in enumerate(deliveries, 1):
+        rows.append((
+            i,
             delivery.track_code,
             delivery.user.full_name if delivery.user else "-",
             delivery.user.phone if delivery.user else "-",
             delivery.delivery_address or "-",
             delivery.door_delivery_status.value,
             delivery.created_at.strftime("%d.%m.%Y %H:%M")
-        ]
-        ws.append(row)
-    
-    # Настройка ширины колонок
-    column_widths = [5, 20, 20, 15, 30, 15, 15]
-    for i, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(i)].width = width
+        ))
     
-    # Сохраняем файл
+    os.makedirs("reports", exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"reports/delivery_report_{timestamp}.xlsx"
-    wb.save(filename)
     
-    return filename
\ No newline at end of file
+    return await _run_report(
+        task,
+        write_styled_report,
+        filename,
+        headers[language],
+        rows,
+        [5, 20, 20, 15, 30, 15, 15],
+        header_color="4F81BD"
+    )
+
+async def _run_report(task: Optional[ReportTask], func, *args, **kwargs) -> Any:
+    """Выполнение функции воркера в пуле процессов"""
+    own_task = task is None
+    if own_task:
+        task = report_executor.create_task()
+    try:
+        return await report_executor.run(task, func, *args, **kwargs)
+    finally:
+        if own_task:
+            report_executor.finish(task)
+
+
+@dataclass
+class StreamedExport:
+    """Готовая выгрузка: путь к файлу и итоги"""
+    path: str
+    row_count: int
+    total_value_usd: float
+    average_value_usd: float
+    average_weight_kg: float
+
+    def close(self) -> None:
+        """Удаление файла выгрузки"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _export_value(value: Any) -> Any:
+    """Значение ячейки: Enum - текстом, флаги - Да/Нет"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, bool):
+        return "Да" if value else "Нет"
+    return value
+
+
+async def export_products_streaming(
+    session: AsyncSession,
+    columns: Optional[List[Tuple[str, Any, int]]] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    task: Optional[ReportTask] = None,
+    on_progress: Optional[Callable[[int, Optional[int]], Awaitable[None]]] = None
+) -> StreamedExport:
+    """
+    Выгрузка всех товаров в xlsx с постоянным расходом памяти.
+
+    Строки читаются порциями через серверный курсор (yield_per) как
+    кортежи значений, без ORM-объектов, и порциями пишутся в
+    промежуточный файл. Книгу openpyxl (write_only) из этого файла
+    строит воркер ReportExecutor, поток событий бота остается свободным.
+    on_progress(обработано строк, всего строк) вызывается после каждой
+    порции и перед построением файла.
+
+    Raises:
+        ReportCancelled: выгрузка отменена через task
+    """
+    columns = columns or DATABASE_EXPORT_COLUMNS
+    headers = [header for header, _, _ in columns]
+    widths = [width for _, _, width in columns]
+    value_column = headers.index("Общая стоимость ($)") if "Общая стоимость ($)" in headers else None
+    weight_column = headers.index("Вес (кг)") if "Вес (кг)" in headers else None
+
+    spool = tempfile.NamedTemporaryFile(prefix="export-", suffix=".rows", delete=False)
+    out_path = spool.name[:-len(".rows")] + ".xlsx"
+    try:
+        total = None
+        if on_progress is not None:
+            total = (await session.execute(select(func.count(Product.id)))).scalar() or 0
+        row_count = 0
+        with spool:
+            query = (
+                select(*[column for _, column, _ in columns])
+                .order_by(Product.id)
+                .execution_options(yield_per=batch_size)
+            )
+            result = await session.stream(query)
+            async for partition in result.partitions(batch_size):
+                if task is not None:
+                    task.raise_if_cancelled()
+                spool_batch(spool, [tuple(_export_value(value) for value in row) for row in partition])
+                row_count += len(partition)
+                if on_progress is not None:
+                    await on_progress(row_count, total)
+
+        if on_progress is not None:
+            # Все строки прочитаны - дальше строится файл
+            await on_progress(row_count, row_count)
+
+        stats = await _run_report(
+            task,
+            write_spooled_rows_xlsx,
+            spool.name,
+            out_path,
+            headers,
+            widths,
+            value_column=value_column,
+            weight_column=weight_column
+        )
+    except BaseException:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+    finally:
+        os.remove(spool.name)
+
+    return StreamedExport(path=out_path, **stats)
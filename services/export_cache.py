@@ -0,0 +1,159 @@
+"""
+Кэш готовых выгрузок.
+
+Файл выгрузки однозначно определяется видом выгрузки, языком и
+"водяным знаком" данных: максимальным updated_at и числом товаров.
+Пока данные не менялись, повторная выгрузка отдает тот же файл (и тот же
+file_id Telegram - без повторной загрузки). Файлы хранятся в
+EXPORT_CACHE_DIR, при превышении EXPORT_CACHE_MAX_MB удаляются давно
+не использованные.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_INDEX_FILE = "index.json"
+
+
+@dataclass
+class CachedExport:
+    """Запись кэша выгрузок"""
+    key: str
+    path: str
+    size: int
+    row_count: int
+    created_at: float
+    last_used: float
+    file_id: Optional[str] = None
+
+
+def make_export_key(kind: str, language: str, max_updated_at: Optional[datetime], row_count: int) -> str:
+    """Ключ кэша по виду выгрузки, языку и водяному знаку данных"""
+    watermark = max_updated_at.isoformat() if max_updated_at else "-"
+    raw = f"{kind}:{language}:{watermark}:{row_count}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+class ExportCache:
+    """Ограниченный по размеру кэш файлов выгрузок на диске"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: Optional[Dict[str, CachedExport]] = None
+        self.hits = 0
+        self.misses = 0
+
+    # ---- индекс ----
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, _INDEX_FILE)
+
+    def _load(self) -> Dict[str, CachedExport]:
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self._index_path(), encoding="utf-8") as f:
+                    for item in json.load(f):
+                        entry = CachedExport(**item)
+                        if os.path.exists(entry.path):
+                            self._entries[entry.key] = entry
+            except FileNotFoundError:
+                pass
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Индекс кэша выгрузок поврежден, кэш очищен: {e}")
+        return self._entries
+
+    def _save(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([asdict(entry) for entry in self._load().values()], f, ensure_ascii=False)
+        os.replace(tmp_path, self._index_path())
+
+    # ---- операции ----
+
+    def get(self, key: str) -> Optional[CachedExport]:
+        """Запись кэша (None, если ее нет или файл удален)"""
+        entry = self._load().get(key)
+        if entry is None or not os.path.exists(entry.path):
+            if entry is not None:
+                del self._entries[key]
+                self._save()
+            self.misses += 1
+            return None
+        entry.last_used = time.time()
+        self._save()
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, source_path: str, row_count: int) -> CachedExport:
+        """Перенос готового файла в кэш"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"export_{key}.xlsx")
+        shutil.move(source_path, path)
+
+        now = time.time()
+        entry = CachedExport(
+            key=key,
+            path=path,
+            size=os.path.getsize(path),
+            row_count=row_count,
+            created_at=now,
+            last_used=now
+        )
+        self._load()[key] = entry
+        self._evict(keep=key)
+        self._save()
+        return entry
+
+    def owns(self, path: Optional[str]) -> bool:
+        """Файл принадлежит кэшу (его нельзя удалять после отправки)"""
+        return bool(path) and os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.directory)
+
+    def set_file_id(self, path: str, file_id: Optional[str]) -> None:
+        """Запоминание file_id Telegram для файла кэша (None - сброс)"""
+        for entry in self._load().values():
+            if entry.path == path:
+                entry.file_id = file_id
+                self._save()
+                return
+
+    def _evict(self, keep: str) -> None:
+        """Удаление давно не использованных файлов сверх max_bytes"""
+        entries = self._load()
+        total = sum(entry.size for entry in entries.values())
+        for entry in sorted(entries.values(), key=lambda e: e.last_used):
+            if total <= self.max_bytes:
+                break
+            if entry.key == keep:
+                continue
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            total -= entry.size
+            del entries[entry.key]
+            logger.info(f"Выгрузка {entry.key} удалена из кэша ({entry.size} байт)")
+
+    def stats(self) -> Dict[str, int]:
+        entries = self._load()
+        return {
+            "files": len(entries),
+            "bytes": sum(entry.size for entry in entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+export_cache = ExportCache(settings.EXPORT_CACHE_DIR, settings.EXPORT_CACHE_MAX_MB * 1024 * 1024)
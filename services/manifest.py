@@ -0,0 +1,360 @@
+"""
+Загрузка товаров из манифеста склада (CSV или XLSX).
+
+Файл читается построчно (csv.reader, openpyxl read_only) и проверяется
+в процессе report_executor: разбор большого xlsx занимает процессор и
+остановил бы обработку сообщений бота. В процесс бота возвращаются
+готовые строки, которые вставляются порциями по MANIFEST_BATCH_SIZE: на
+порцию - запросы владельцев и существующих кодов и одна вставка
+(ProductRepository.import_products).
+
+Трек-код в каждой строке обязателен: по нему повторная загрузка того же
+файла пропускает уже добавленные товары. Коды для этикеток без кода
+перевозчика заранее выдает services/track_code.py.
+
+Итог по каждой строке (добавлена, конфликт, ошибка) попадает в отчет,
+который отправляется администратору файлом.
+"""
+import csv
+import io
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database.models import ProductCategory, ProductStatus
+from database.repository import ProductRepository, UserRepository
+from database.session import async_session_maker
+from services.track_code import validate_track_code, INVALID_TRACK_CODE_TEXTS
+from services.report_executor import report_executor
+from services.track_index import track_code_index
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_EXTENSIONS = (".csv", ".txt", ".xlsx")
+
+# Строк на одну вставку
+MANIFEST_BATCH_SIZE = 500
+
+# Заголовки столбцов (без регистра, пробелов, знаков и пояснений в скобках)
+COLUMN_ALIASES = {
+    "track_code": ("треккод", "трек", "trackcode", "track", "tracknumber"),
+    "phone": ("телефон", "тел", "phone"),
+    "telegram_id": ("telegramid", "telegram", "tgid", "телеграм"),
+    "product_name": ("название", "наименование", "товар", "name", "productname"),
+    "product_category": ("категория", "category"),
+    "product_description": ("описание", "description"),
+    "quantity": ("количество", "колво", "quantity", "qty"),
+    "unit_price_usd": ("цена", "price", "unitprice", "unitpriceusd"),
+    "weight_kg": ("вес", "weight", "weightkg"),
+    "length_cm": ("длина", "length", "lengthcm"),
+    "width_cm": ("ширина", "width", "widthcm"),
+    "height_cm": ("высота", "height", "heightcm"),
+    "dimensions": ("габариты", "размеры", "dimensions", "dims"),
+}
+_ALIAS_TO_FIELD = {alias: name for name, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+_CATEGORIES = {
+    **{category.value: category for category in ProductCategory},
+    **{category.name.lower(): category for category in ProductCategory},
+}
+
+_DIMENSIONS = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*[xх×*]\s*(\d+(?:[.,]\d+)?)\s*[xх×*]\s*(\d+(?:[.,]\d+)?)\s*$", re.I)
+
+# Итоги строк в отчете
+RESULT_ADDED = "добавлен"
+RESULT_CONFLICT = "уже существует"
+
+
+class ManifestError(Exception):
+    """Файл нельзя загрузить (формат, заголовок, размер)"""
+
+
+@dataclass
+class ManifestRow:
+    """Проверенная строка манифеста"""
+    line: int
+    track_code: str
+    phone: Optional[str]
+    telegram_id: Optional[int]
+    values: Dict[str, Any]
+
+
+@dataclass
+class ManifestResult:
+    """Итог загрузки манифеста"""
+    rows: int = 0
+    inserted: int = 0
+    conflicts: int = 0
+    errors: int = 0
+    notified: int = 0
+    truncated: bool = False  # строки сверх max_rows не загружены
+    seconds: float = 0.0
+    # (номер строки, трек-код, итог) по всем строкам файла
+    report: List[Tuple[int, str, str]] = field(default_factory=list)
+
+    def add(self, line: int, track_code: Optional[str], outcome: str) -> None:
+        self.report.append((line, track_code or "", outcome))
+
+    def problems(self) -> List[Tuple[int, str, str]]:
+        return [item for item in self.report if item[2] != RESULT_ADDED]
+
+    def report_csv(self) -> bytes:
+        """Отчет по строкам (CSV для Excel: BOM и «;»)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+        writer.writerow(["Строка", "Трек-код", "Результат"])
+        writer.writerows(sorted(self.report))
+        return buffer.getvalue().encode("utf-8-sig")
+
+
+def read_rows(path: str, filename: str) -> Iterator[List[Any]]:
+    """Строки файла как списки значений (потоком)"""
+    extension = os.path.splitext(filename.lower())[1]
+    if extension == ".xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    elif extension in (".csv", ".txt"):
+        with open(path, newline="", encoding="utf-8-sig", errors="replace") as file:
+            sample = file.read(8192)
+            file.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            yield from csv.reader(file, dialect)
+    else:
+        raise ManifestError(f"Поддерживаются файлы {', '.join(MANIFEST_EXTENSIONS)}")
+
+
+def _header_key(value: Any) -> str:
+    text = re.sub(r"\(.*?\)", "", str(value or "")).lower().replace("ё", "е")
+    return re.sub(r"[^0-9a-zа-я]", "", text)
+
+
+def map_header(header: List[Any]) -> Dict[str, int]:
+    """Поле -> номер столбца"""
+    columns = {}
+    for index, value in enumerate(header):
+        name = _ALIAS_TO_FIELD.get(_header_key(value))
+        if name and name not in columns:
+            columns[name] = index
+    if "track_code" not in columns:
+        raise ManifestError("Не найден заголовок: нужен столбец «Трек-код» в первой строке")
+    return columns
+
+
+def _cell(row: List[Any], columns: Dict[str, int], name: str) -> str:
+    index = columns.get(name)
+    if index is None or index >= len(row) or row[index] is None:
+        return ""
+    value = row[index]
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # числа из Excel: 992901234567.0
+    return str(value).strip()
+
+
+def _number(text: str, label: str, minimum: float = 0) -> Optional[float]:
+    if not text:
+        return None
+    try:
+        value = float(text.replace(",", ".").replace(" ", ""))
+    except ValueError:
+        raise ValueError(f"{label}: не число «{text}»")
+    if value < minimum:
+        raise ValueError(f"{label}: должно быть не меньше {minimum:g}")
+    return value
+
+
+def parse_row(line: int, row: List[Any], columns: Dict[str, int]) -> ManifestRow:
+    """
+    Проверка строки манифеста
+
+    Raises:
+        ValueError: текст ошибки для отчета
+    """
+    raw_code = _cell(row, columns, "track_code")
+    if not raw_code:
+        raise ValueError("нужен трек-код (без него повторная загрузка добавит товар еще раз)")
+    track_code, reason = validate_track_code(raw_code)
+    if reason:
+        raise ValueError(f"трек-код: {INVALID_TRACK_CODE_TEXTS[reason]['ru']}")
+
+    phone = re.sub(r"\D", "", _cell(row, columns, "phone")) or None
+    if phone and len(phone) < 9:
+        raise ValueError(f"телефон: слишком короткий номер «{phone}»")
+
+    telegram_id = None
+    raw_telegram_id = _cell(row, columns, "telegram_id")
+    if raw_telegram_id:
+        if not raw_telegram_id.isdigit():
+            raise ValueError(f"telegram id: не число «{raw_telegram_id}»")
+        telegram_id = int(raw_telegram_id)
+
+    values: Dict[str, Any] = {
+        "product_name": _cell(row, columns, "product_name")[:200] or None,
+        "product_description": _cell(row, columns, "product_description")[:500] or None,
+        "product_category": None,
+        "weight_kg": _number(_cell(row, columns, "weight_kg"), "вес") or 0.0,
+        "unit_price_usd": _number(_cell(row, columns, "unit_price_usd"), "цена") or 0.0,
+    }
+
+    category = _cell(row, columns, "product_category")
+    if category:
+        values["product_category"] = _CATEGORIES.get(category.lower())
+        if values["product_category"] is None:
+            raise ValueError(f"категория: «{category}», допустимо: {', '.join(c.value for c in ProductCategory)}")
+
+    quantity = _number(_cell(row, columns, "quantity"), "количество", minimum=1)
+    if quantity is not None and not quantity.is_integer():
+        raise ValueError("количество: должно быть целым")
+    values["quantity"] = int(quantity or 1)
+    values["total_value_usd"] = values["unit_price_usd"] * values["quantity"]
+
+    dimensions = _cell(row, columns, "dimensions")
+    if dimensions:
+        match = _DIMENSIONS.match(dimensions)
+        if not match:
+            raise ValueError(f"габариты: ожидается ДxШxВ в см, получено «{dimensions}»")
+        sizes = [float(part.replace(",", ".")) for part in match.groups()]
+    else:
+        sizes = [
+            _number(_cell(row, columns, "length_cm"), "длина"),
+            _number(_cell(row, columns, "width_cm"), "ширина"),
+            _number(_cell(row, columns, "height_cm"), "высота"),
+        ]
+    values["length_cm"], values["width_cm"], values["height_cm"] = sizes
+
+    return ManifestRow(line, track_code, phone, telegram_id, values)
+
+
+def parse_manifest(rows: Iterable[List[Any]], result: ManifestResult, max_rows: int) -> Iterator[ManifestRow]:
+    """Проверенные строки манифеста; ошибки и повторы кодов записываются в result"""
+    rows = iter(rows)
+    columns = None
+    for header in rows:
+        if any(value not in (None, "") for value in header):
+            columns = map_header(header)
+            break
+    if columns is None:
+        raise ManifestError("Файл пустой")
+
+    seen: Dict[str, int] = {}
+    for line, row in enumerate(rows, start=2):
+        if not any(value not in (None, "") for value in row):
+            continue
+        if result.rows >= max_rows:
+            result.truncated = True
+            break
+        result.rows += 1
+        try:
+            parsed = parse_row(line, row, columns)
+        except ValueError as e:
+            result.errors += 1
+            result.add(line, _cell(row, columns, "track_code"), f"ошибка: {e}")
+            continue
+        if parsed.track_code in seen:
+            result.errors += 1
+            result.add(line, parsed.track_code, f"ошибка: повтор кода из строки {seen[parsed.track_code]}")
+            continue
+        seen[parsed.track_code] = line
+        yield parsed
+
+
+def parse_manifest_file(
+    path: str,
+    filename: str,
+    max_rows: int,
+    cancel_path: Optional[str] = None
+) -> Tuple[List[ManifestRow], ManifestResult]:
+    """Чтение и проверка всего файла (выполняется в процессе report_executor)"""
+    result = ManifestResult()
+    rows = list(parse_manifest(read_rows(path, filename), result, max_rows))
+    return rows, result
+
+
+async def _import_batch(batch: List[ManifestRow], status: ProductStatus, result: ManifestResult) -> None:
+    async with async_session_maker() as session:
+        user_repo = UserRepository(session)
+        product_repo = ProductRepository(session)
+
+        by_telegram_id = await user_repo.get_users_by_telegram_ids(
+            [row.telegram_id for row in batch if row.telegram_id is not None]
+        )
+        by_phone = await user_repo.get_users_by_phones([row.phone for row in batch if row.phone])
+        existing = await product_repo.get_existing_track_codes([row.track_code for row in batch])
+
+        accepted = []
+        for row in batch:
+            if row.track_code in existing:
+                result.conflicts += 1
+                result.add(row.line, row.track_code, RESULT_CONFLICT)
+                continue
+            owner = None
+            if row.telegram_id is not None:
+                owner = by_telegram_id.get(row.telegram_id)
+            elif row.phone:
+                owner = by_phone.get(row.phone)
+            if (row.telegram_id is not None or row.phone) and owner is None:
+                result.errors += 1
+                result.add(row.line, row.track_code, "ошибка: владелец не зарегистрирован в боте")
+                continue
+            accepted.append((row, owner.id if owner else None))
+
+        values = [
+            {**row.values, "track_code": row.track_code, "user_id": user_id, "country_from": "China"}
+            for row, user_id in accepted
+        ]
+        inserted = await product_repo.import_products(values, status) if values else []
+
+    inserted_codes = {track_code for _, track_code, _ in inserted}
+    for row, _ in accepted:
+        if row.track_code in inserted_codes:
+            track_code_index.add(row.track_code)
+            result.add(row.line, row.track_code, RESULT_ADDED)
+        else:
+            # Код добавил кто-то другой между проверкой и вставкой
+            result.conflicts += 1
+            result.add(row.line, row.track_code, RESULT_CONFLICT)
+    result.inserted += len(inserted)
+    result.notified += sum(1 for _, _, user_id in inserted if user_id is not None)
+
+
+async def import_manifest(
+    path: str,
+    filename: str,
+    status: ProductStatus = ProductStatus.CHINA_WAREHOUSE,
+    max_rows: int = 20000
+) -> ManifestResult:
+    """
+    Загрузка манифеста: проверка строк в процессе пула и вставка порциями
+
+    Порции фиксируются по отдельности: при ошибке базы уже вставленные
+    порции остаются, а в отчете видно, до какой строки дошла загрузка.
+
+    Raises:
+        ManifestError: файл нельзя загрузить
+    """
+    started = time.monotonic()
+    task = report_executor.create_task()
+    try:
+        rows, result = await report_executor.run(task, parse_manifest_file, path, filename, max_rows)
+    finally:
+        report_executor.finish(task)
+    for start in range(0, len(rows), MANIFEST_BATCH_SIZE):
+        await _import_batch(rows[start:start + MANIFEST_BATCH_SIZE], status, result)
+    result.seconds = time.monotonic() - started
+    logger.info(
+        f"Манифест {filename}: строк {result.rows}, добавлено {result.inserted}, "
+        f"конфликтов {result.conflicts}, ошибок {result.errors}, "
+        f"{result.seconds:.1f} с"
+    )
+    return result
@@ -0,0 +1,157 @@
+"""
+Уведомления клиентов о смене статуса товаров.
+
+ProductRepository при массовом обновлении статуса в той же транзакции
+записывает строки в status_notifications (outbox). Обработчик собирает
+неотправленные строки по владельцам и отправляет каждому одну сводку на
+его языке; частоту отправки ограничивает services/send_queue.py.
+Отправленные строки отмечаются в базе, поэтому после перезапуска
+рассылка продолжается с того же места.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from config import settings
+from database.repository import NotificationRepository
+from database.session import async_session_maker
+from utils.helpers import get_status_text, pack_messages
+
+logger = logging.getLogger(__name__)
+
+# Сколько пользователей обрабатывать за один проход
+USERS_PER_BATCH = 100
+
+# Через сколько дней удалять отправленные уведомления
+KEEP_SENT_DAYS = 7
+
+
+def render_digest(items: List[tuple], language: str) -> List[str]:
+    """
+    Сводка по товарам пользователя (последний статус каждого товара)
+
+    Args:
+        items: (трек-код, статус, название) в порядке изменения
+    """
+    latest = {}
+    for track_code, status, name in items:
+        latest.pop(track_code, None)
+        latest[track_code] = (status, name)
+
+    header = {
+        "ru": "📬 <b>Статус ваших товаров изменился</b>",
+        "tj": "📬 <b>Статуси маҳсулоти шумо тағйир ёфт</b>"
+    }.get(language, "📬 <b>Статус ваших товаров изменился</b>")
+
+    blocks = []
+    for track_code, (status, name) in latest.items():
+        line = f"🎯 <code>{track_code}</code> - {get_status_text(status.value, language)}"
+        if name:
+            line += f"\n   🏷️ {name}"
+        blocks.append(line)
+    return pack_messages(blocks, header=header)
+
+
+class StatusNotifier:
+    """Рассылка сводок о смене статуса"""
+
+    def __init__(self, concurrency: int = 20, poll_interval: float = 30):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.bot: Optional[Bot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self.sent_digests = 0
+
+    def start(self, bot: Bot) -> None:
+        self.bot = bot
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановка (неотправленные сводки будут отправлены после перезапуска)"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self) -> None:
+        """Сигнал о новых уведомлениях (вызывается после фиксации статусов)"""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        last_purge = None
+        while True:
+            self._wakeup.clear()
+            try:
+                async with async_session_maker() as session:
+                    user_ids = await NotificationRepository(session).get_pending_user_ids(USERS_PER_BATCH)
+            except Exception as e:
+                logger.error(f"Ошибка чтения очереди уведомлений: {e}")
+                user_ids = []
+
+            if user_ids:
+                semaphore = asyncio.Semaphore(self.concurrency)
+                results = await asyncio.gather(
+                    *(self._notify_user(user_id, semaphore) for user_id in user_ids)
+                )
+                # Если ни одна сводка не ушла (сеть, ошибка базы) - пауза перед повтором
+                if any(results):
+                    continue
+            elif last_purge is None or datetime.utcnow() - last_purge > timedelta(hours=1):
+                last_purge = datetime.utcnow()
+                await self._purge()
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _notify_user(self, user_id: int, semaphore: asyncio.Semaphore) -> bool:
+        """Сводка одному пользователю; True, если его уведомления обработаны"""
+        async with semaphore:
+            try:
+                async with async_session_maker() as session:
+                    repo = NotificationRepository(session)
+                    user, pending = await repo.get_pending_for_user(user_id)
+                    if not pending:
+                        return True
+
+                    ids = [notification.id for notification, _ in pending]
+                    if user is not None and user.telegram_id:
+                        items = [(n.track_code, n.status, name) for n, name in pending]
+                        try:
+                            for text in render_digest(items, user.language or "ru"):
+                                await self.bot.send_message(user.telegram_id, text, parse_mode="HTML")
+                            self.sent_digests += 1
+                        except (TelegramBadRequest, TelegramForbiddenError) as e:
+                            # Повтор не поможет (бот заблокирован, чат недоступен)
+                            logger.info(f"Сводка пользователю {user_id} не доставлена: {e}")
+
+                    await repo.mark_sent(ids)
+                    return True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Ошибка отправки сводки пользователю {user_id}: {e}")
+                return False
+
+    async def _purge(self) -> None:
+        try:
+            async with async_session_maker() as session:
+                removed = await NotificationRepository(session).purge_sent(
+                    datetime.utcnow() - timedelta(days=KEEP_SENT_DAYS)
+                )
+            if removed:
+                logger.info(f"Удалено отправленных уведомлений: {removed}")
+        except Exception as e:
+            logger.warning(f"Ошибка очистки уведомлений: {e}")
+
+
+status_notifier = StatusNotifier(
+    concurrency=settings.NOTIFY_CONCURRENCY,
+    poll_interval=settings.NOTIFY_POLL_INTERVAL
+)
@@ -0,0 +1,157 @@
+"""
+Выполнение тяжелых отчетов в отдельных процессах.
+
+Построение xlsx (openpyxl) - чистая нагрузка на процессор. В потоке
+событий бота оно останавливает обработку сообщений всех пользователей,
+а в потоке - упирается в GIL. Поэтому отчеты строятся в пуле процессов
+ProcessPoolExecutor: обработчик подготавливает простые кортежи строк,
+передает их воркеру и ждет готовый файл.
+
+Число процессов и одновременно выполняемых отчетов задается настройками
+REPORT_WORKERS и REPORT_MAX_CONCURRENCY. Отчет можно отменить: если
+воркер еще не начал работу, задача снимается из очереди, иначе он
+увидит флаг отмены и прервется сам.
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from config import settings
+from services.report_workers import ReportCancelled
+
+logger = logging.getLogger(__name__)
+
+
+class ReportTask:
+    """Отчет, выполняемый (или ожидающий выполнения) в ReportExecutor"""
+
+    def __init__(self, task_id: str):
+        self.id = task_id
+        self.cancel_path = os.path.join(tempfile.gettempdir(), f"cargobot-report-{task_id}.cancel")
+        self.future: Optional[asyncio.Future] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return os.path.exists(self.cancel_path)
+
+    def raise_if_cancelled(self) -> None:
+        """Проверка отмены на стороне бота (например, между порциями строк)"""
+        if self.cancelled:
+            raise ReportCancelled()
+
+    def cancel(self) -> None:
+        open(self.cancel_path, "a").close()
+        if self.future is not None:
+            self.future.cancel()
+
+    def cleanup(self) -> None:
+        try:
+            os.remove(self.cancel_path)
+        except FileNotFoundError:
+            pass
+
+
+class ReportExecutor:
+    """Пул процессов для построения отчетов"""
+
+    def __init__(self, max_workers: int = 2, max_concurrency: int = 2, timeout: Optional[float] = None):
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, ReportTask] = {}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: воркер не наследует потоки и соединения процесса бота
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def create_task(self) -> ReportTask:
+        """Новый отчет (его id можно передать в кнопку отмены)"""
+        task = ReportTask(uuid.uuid4().hex[:12])
+        self._tasks[task.id] = task
+        return task
+
+    def cancel(self, task_id: str) -> bool:
+        """Отмена отчета по id (False, если отчет уже завершен)"""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def finish(self, task: ReportTask) -> None:
+        """Освобождение отчета после завершения"""
+        self._tasks.pop(task.id, None)
+        task.cleanup()
+
+    async def run(self, task: ReportTask, func: Callable, *args, **kwargs) -> Any:
+        """
+        Выполнение func(*args, cancel_path=..., **kwargs) в процессе пула
+
+        func и аргументы должны сериализоваться pickle: функция уровня
+        модуля и простые значения, без ORM-объектов.
+
+        Raises:
+            ReportCancelled: отчет отменен
+            asyncio.TimeoutError: отчет не построен за timeout секунд
+        """
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            task.raise_if_cancelled()
+            call = functools.partial(func, *args, cancel_path=task.cancel_path, **kwargs)
+            task.future = loop.run_in_executor(self._get_pool(), call)
+            try:
+                return await asyncio.wait_for(task.future, self.timeout)
+            except asyncio.CancelledError:
+                # Отмена через task.cancel() или отмена ожидающего обработчика
+                if not task.cancelled:
+                    task.cancel()
+                    raise
+                raise ReportCancelled()
+            except asyncio.TimeoutError:
+                task.cancel()
+                raise
+            except BrokenProcessPool:
+                # Воркер упал (например, нехватка памяти) - следующий отчет создаст новый пул
+                logger.error("Пул процессов отчетов поврежден, будет создан заново")
+                self._pool = None
+                raise
+            finally:
+                task.future = None
+
+    @property
+    def active_count(self) -> int:
+        return len(self._tasks)
+
+    def shutdown(self) -> None:
+        """Остановка пула (незапущенные отчеты отменяются)"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+report_executor = ReportExecutor(
+    max_workers=settings.REPORT_WORKERS,
+    max_concurrency=settings.REPORT_MAX_CONCURRENCY,
+    timeout=settings.REPORT_TIMEOUT or None
+)
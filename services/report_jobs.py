@@ -0,0 +1,479 @@
+"""
+Фоновая очередь отчетов.
+
+Обработчик только ставит отчет в очередь (таблица report_jobs) и сразу
+отвечает. Обработчики очереди строят отчет, по мере чтения строк
+обновляют сообщение с прогрессом и отправляют готовый файл всем
+получателям. Одинаковые запросы, поступившие пока отчет строится,
+объединяются в одно задание. Готовые выгрузки берутся из кэша
+(services/export_cache.py), если данные с тех пор не менялись.
+
+Очередь хранится в базе, поэтому переживает перезапуск: прерванные
+задания строятся заново, а неотправленные результаты досылаются.
+
+Отмена тоже идет через базу: при BOT_WORKERS > 1 кнопку «Отменить»
+обрабатывает процесс-обработчик, а очередь работает в принимающем
+процессе. Отмена только помечает задание в базе, процесс с очередью
+замечает ее за POLL_INTERVAL (строящийся отчет) или при повторной
+доставке (задание в очереди) и сам рассылает уведомления.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.types import FSInputFile
+
+from config import settings
+from database.models import ReportJob, ReportJobStatus
+from database.repository import ReportJobRepository, ProductRepository
+from database.session import async_session_maker
+from keyboards.admin import get_back_to_admin_keyboard, get_report_cancel_keyboard
+from services.excel_export import export_products_streaming
+from services.export_cache import export_cache, make_export_key
+from services.report_executor import report_executor, ReportTask
+from services.report_workers import ReportCancelled
+
+logger = logging.getLogger(__name__)
+
+# Не чаще, чем раз в столько секунд, обновлять сообщение с прогрессом
+PROGRESS_INTERVAL = 3.0
+# Как часто проверять очередь без явного сигнала (секунды)
+POLL_INTERVAL = 5.0
+# Как часто повторять доставку, не удавшуюся из-за ошибок сети (секунды)
+REDELIVER_INTERVAL = 60.0
+
+REPORT_TITLES = {
+    "database_export": {"ru": "Выгрузка базы данных", "tj": "Экспорти пойгоҳи маълумот"},
+}
+
+# Итог ReportJobQueue.cancel
+CANCEL_CANCELLED = "cancelled"  # задание отменено
+CANCEL_DETACHED = "detached"  # отписан только этот получатель, отчет ждут другие
+CANCEL_FINISHED = "finished"  # задание уже завершено
+CANCEL_NOT_SUBSCRIBED = "not_subscribed"  # чат не получатель задания
+
+ProgressCallback = Callable[[int, Optional[int]], Awaitable[None]]
+
+
+@dataclass
+class ReportOutput:
+    """Готовый файл отчета"""
+    path: str
+    filename: str
+    caption: Dict[str, str]  # {язык: подпись}
+    file_id: Optional[str] = None  # file_id Telegram, если файл уже отправлялся
+
+
+async def run_database_export(params: dict, task: ReportTask, on_progress: ProgressCallback) -> Optional[ReportOutput]:
+    """Полная выгрузка товаров в Excel (None, если товаров нет)"""
+    async with async_session_maker() as session:
+        max_updated_at, row_count = await ProductRepository(session).get_data_watermark()
+        # Заголовки файла всегда на русском, язык влияет только на подпись
+        key = make_export_key("database_export", "ru", max_updated_at, row_count)
+        cached = export_cache.get(key)
+        if cached is None:
+            if not row_count:
+                return None
+            export = await export_products_streaming(session, task=task, on_progress=on_progress)
+            if not export.row_count:
+                export.close()
+                return None
+            cached = export_cache.put(key, export.path, export.row_count)
+        else:
+            logger.info(f"Выгрузка базы данных взята из кэша ({cached.key})")
+
+    now = datetime.now()
+    return ReportOutput(
+        path=cached.path,
+        filename=f"database_export_{now.strftime('%Y%m%d_%H%M%S')}.xlsx",
+        caption={
+            "ru": f"📊 Экспорт базы данных\n"
+                  f"📅 Дата: {now.strftime('%d.%m.%Y %H:%M')}\n"
+                  f"📦 Товаров: {cached.row_count}",
+            "tj": f"📊 Экспорти пойгоҳи маълумот\n"
+                  f"📅 Сана: {now.strftime('%d.%m.%Y %H:%M')}\n"
+                  f"📦 Миқдори маҳсулот: {cached.row_count}",
+        },
+        file_id=cached.file_id
+    )
+
+
+# Построители отчетов по виду задания
+REPORT_RUNNERS: Dict[str, Callable[[dict, ReportTask, ProgressCallback], Awaitable[Optional[ReportOutput]]]] = {
+    "database_export": run_database_export,
+}
+
+
+def _text(texts: Dict[str, str], language: Optional[str]) -> str:
+    return texts.get(language or "ru", texts["ru"])
+
+
+def queued_text(kind: str, created: bool, language: str = "ru") -> str:
+    """Ответ администратору при постановке отчета в очередь"""
+    title = _text(REPORT_TITLES.get(kind, {"ru": kind}), language)
+    if language == "tj":
+        note = "Ин ҳисобот аллакай сохта мешавад, файл баъд аз тайёр шудан меояд." if not created \
+            else "Бот кор карданро давом медиҳад, файл алоҳида меояд."
+        return f"⏳ {title}: дар навбат\n{note}"
+    note = "Такой отчет уже формируется - файл придет, когда он будет готов." if not created \
+        else "Бот продолжает работать, файл придет отдельным сообщением."
+    return f"⏳ {title}: в очереди\n{note}"
+
+
+def _progress_text(kind: str, progress: int, total: Optional[int], language: str) -> str:
+    title = _text(REPORT_TITLES.get(kind, {"ru": kind}), language)
+    if total is not None and progress >= total:
+        building = "Файл сохта мешавад..." if language == "tj" else "Формирование файла..."
+        return f"🛠 {title}\n{building}"
+    label = "Сатрҳо коркард шуд" if language == "tj" else "Обработано строк"
+    if total:
+        return f"⏳ {title}\n{label}: {progress} / {total} ({progress * 100 // total}%)"
+    return f"⏳ {title}\n{label}: {progress}"
+
+
+def _result_text(job: ReportJob, language: str) -> str:
+    """Сообщение для заданий без файла"""
+    title = _text(REPORT_TITLES.get(job.kind, {"ru": job.kind}), language)
+    if job.status == ReportJobStatus.CANCELLED:
+        return f"🚫 {title}: " + ("бекор карда шуд" if language == "tj" else "отменена")
+    if job.status == ReportJobStatus.FAILED or job.result_path:
+        return f"❌ {title}: " + ("хато ҳангоми сохтан" if language == "tj" else "не удалось сформировать")
+    return "❌ " + ("Маълумот барои ҳисобот нест" if language == "tj" else "Нет данных для отчета")
+
+
+class ReportJobQueue:
+    """Обработчики фоновой очереди отчетов"""
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self.bot: Optional[Bot] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._enqueue_lock = asyncio.Lock()
+        self._running: Dict[int, ReportTask] = {}
+        self._last_progress: Dict[int, float] = {}
+        self._delivering: set = set()
+
+    async def enqueue(
+        self,
+        kind: str,
+        chat_id: int,
+        message_id: Optional[int] = None,
+        params: Optional[dict] = None,
+        language: str = "ru"
+    ) -> Tuple[int, bool]:
+        """
+        Постановка отчета в очередь
+
+        Returns:
+            tuple: (id задания, создано ли новое задание)
+        """
+        if kind not in REPORT_RUNNERS:
+            raise ValueError(f"Неизвестный вид отчета: {kind}")
+
+        # Поиск активного задания и добавление получателя - без гонок между обработчиками
+        async with self._enqueue_lock:
+            async with async_session_maker() as session:
+                job, created = await ReportJobRepository(session).enqueue(
+                    kind, params, chat_id, message_id, language
+                )
+        self._wakeup.set()
+        logger.info(f"Отчет {kind}: задание {job.id} ({'новое' if created else 'присоединение'})")
+        return job.id, created
+
+    async def cancel(self, job_id: int, chat_id: int) -> str:
+        """
+        Отмена задания получателем chat_id
+
+        Если отчет ждут и другие получатели, отписывается только chat_id,
+        а отчет строится дальше.
+
+        Returns:
+            str: CANCEL_CANCELLED, CANCEL_DETACHED, CANCEL_FINISHED или CANCEL_NOT_SUBSCRIBED
+        """
+        async with async_session_maker() as session:
+            repo = ReportJobRepository(session)
+            job = await repo.get_job(job_id)
+            if job is None or job.status not in ReportJobRepository.ACTIVE_STATUSES:
+                return CANCEL_FINISHED
+            subscribers = [s for s in await repo.get_subscribers(job_id) if not s.delivered]
+            own = [s.id for s in subscribers if s.chat_id == chat_id]
+            if not own:
+                return CANCEL_NOT_SUBSCRIBED
+            if len(own) < len(subscribers):
+                await repo.remove_subscribers(own)
+                logger.info(f"Отчет {job_id}: чат {chat_id} отписан, задание продолжается")
+                return CANCEL_DETACHED
+            cancelled = await repo.finish(job_id, ReportJobStatus.CANCELLED)
+        if not cancelled:
+            return CANCEL_FINISHED
+
+        task = self._running.get(job_id)
+        if task is not None:
+            # Обработчик увидит отмену и сам разошлет уведомления
+            task.cancel()
+        elif self.bot is not None:
+            await self._deliver(job_id)
+        # Иначе очередь работает в другом процессе: он увидит отмену в базе
+        return CANCEL_CANCELLED
+
+    def start(self, bot: Bot) -> None:
+        """Запуск обработчиков очереди"""
+        self.bot = bot
+        self._worker_tasks = [asyncio.create_task(self._recover())]
+        self._worker_tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Остановка (прерванные задания будут построены после перезапуска)"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def _worker(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                async with async_session_maker() as session:
+                    job = await ReportJobRepository(session).claim_next()
+            except Exception as e:
+                logger.error(f"Ошибка чтения очереди отчетов: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run_job(job)
+
+    async def _run_job(self, job: ReportJob) -> None:
+        runner = REPORT_RUNNERS.get(job.kind)
+        task = report_executor.create_task()
+        self._running[job.id] = task
+        watcher = asyncio.create_task(self._watch_cancel(job.id, task))
+        output = None
+        try:
+            if runner is None:
+                raise ValueError(f"Неизвестный вид отчета: {job.kind}")
+            params = json.loads(job.params or "{}")
+            output = await runner(params, task, functools.partial(self._on_progress, job))
+            status, error = ReportJobStatus.DONE, None
+        except ReportCancelled:
+            status, error = ReportJobStatus.CANCELLED, None
+        except Exception as e:
+            logger.error(f"Ошибка построения отчета {job.id} ({job.kind}): {e}", exc_info=True)
+            status, error = ReportJobStatus.FAILED, str(e)
+        finally:
+            watcher.cancel()
+            report_executor.finish(task)
+            self._running.pop(job.id, None)
+            self._last_progress.pop(job.id, None)
+
+        async with async_session_maker() as session:
+            finished = await ReportJobRepository(session).finish(
+                job.id,
+                status,
+                result_path=output.path if output else None,
+                result_filename=output.filename if output else None,
+                result_caption=output.caption if output else None,
+                file_id=output.file_id if output else None,
+                error=error
+            )
+        if not finished and output is not None and not export_cache.owns(output.path):
+            # Задание отменили, пока строился файл
+            _remove_file(output.path)
+
+        await self._deliver(job.id)
+
+    async def _watch_cancel(self, job_id: int, task: ReportTask) -> None:
+        """Отмена задания из другого процесса (статус CANCELLED в базе)"""
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            try:
+                async with async_session_maker() as session:
+                    job = await ReportJobRepository(session).get_job(job_id)
+            except Exception as e:
+                logger.warning(f"Ошибка проверки отмены отчета {job_id}: {e}")
+                continue
+            if job is None or job.status == ReportJobStatus.CANCELLED:
+                task.cancel()
+                return
+
+    async def _get_progress_subscribers(self, job_id: int) -> List[Tuple[int, int, str]]:
+        """
+        Получатели с сообщением прогресса
+
+        Читаются из базы при каждом обновлении (не чаще PROGRESS_INTERVAL):
+        получателей добавляют и отписывают процессы-обработчики.
+        """
+        async with async_session_maker() as session:
+            subscribers = await ReportJobRepository(session).get_subscribers(job_id)
+        return [(s.chat_id, s.message_id, s.language) for s in subscribers if s.message_id]
+
+    async def _on_progress(self, job: ReportJob, progress: int, total: Optional[int]) -> None:
+        """Обновление прогресса в базе и в сообщениях (не чаще PROGRESS_INTERVAL)"""
+        now = time.monotonic()
+        final = total is not None and progress >= total
+        if not final and now - self._last_progress.get(job.id, 0.0) < PROGRESS_INTERVAL:
+            return
+        self._last_progress[job.id] = now
+
+        async with async_session_maker() as session:
+            await ReportJobRepository(session).set_progress(job.id, progress, total)
+
+        for chat_id, message_id, language in await self._get_progress_subscribers(job.id):
+            try:
+                await self.bot.edit_message_text(
+                    _progress_text(job.kind, progress, total, language),
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    reply_markup=get_report_cancel_keyboard(job.id)
+                )
+            except (TelegramBadRequest, TelegramForbiddenError):
+                # Сообщение удалено или текст не изменился
+                pass
+            except Exception as e:
+                logger.warning(f"Не удалось обновить прогресс отчета {job.id}: {e}")
+
+    async def _deliver(self, job_id: int) -> None:
+        """Отправка результата всем получателям, которые его еще не получили"""
+        if job_id in self._delivering:
+            return
+        self._delivering.add(job_id)
+        try:
+            await self._deliver_job(job_id)
+        finally:
+            self._delivering.discard(job_id)
+
+    async def _deliver_job(self, job_id: int) -> None:
+        async with async_session_maker() as session:
+            repo = ReportJobRepository(session)
+            job = await repo.get_job(job_id)
+            if job is None or job.status in ReportJobRepository.ACTIVE_STATUSES:
+                return
+
+            caption = json.loads(job.result_caption) if job.result_caption else {}
+            file_id = job.file_id
+            has_file = job.status == ReportJobStatus.DONE and (
+                file_id or (job.result_path and os.path.exists(job.result_path))
+            )
+            if job.status == ReportJobStatus.DONE and job.result_path and not has_file:
+                logger.error(f"Файл отчета {job_id} не найден: {job.result_path}")
+
+            failed = False
+            for subscriber in await repo.get_undelivered(job_id):
+                try:
+                    if has_file:
+                        sent_file_id = await self._send_document(
+                            subscriber.chat_id,
+                            file_id,
+                            job.result_path,
+                            job.result_filename,
+                            _text(caption, subscriber.language) if caption else None
+                        )
+                        if sent_file_id and sent_file_id != file_id:
+                            # Остальным получателям (и из кэша) - тот же файл без повторной загрузки
+                            file_id = sent_file_id
+                            await repo.set_file_id(job_id, file_id)
+                            if export_cache.owns(job.result_path):
+                                export_cache.set_file_id(job.result_path, file_id)
+                    else:
+                        await self.bot.send_message(
+                            subscriber.chat_id,
+                            _result_text(job, subscriber.language),
+                            reply_markup=get_back_to_admin_keyboard()
+                        )
+                except (TelegramBadRequest, TelegramForbiddenError) as e:
+                    # Повтор не поможет (бот заблокирован, чат недоступен)
+                    logger.warning(f"Отчет {job_id} не доставлен в чат {subscriber.chat_id}: {e}")
+                except Exception as e:
+                    logger.warning(f"Ошибка доставки отчета {job_id} в чат {subscriber.chat_id}: {e}")
+                    failed = True
+                    continue
+
+                if subscriber.message_id:
+                    try:
+                        await self.bot.delete_message(subscriber.chat_id, subscriber.message_id)
+                    except Exception:
+                        pass
+                await repo.mark_delivered(subscriber.id)
+
+            if not failed and job.result_path and file_id and not export_cache.owns(job.result_path):
+                # Все получили файл, дальше он отправляется по file_id
+                _remove_file(job.result_path)
+
+    async def _send_document(
+        self,
+        chat_id: int,
+        file_id: Optional[str],
+        path: Optional[str],
+        filename: Optional[str],
+        caption: Optional[str]
+    ) -> Optional[str]:
+        """
+        Отправка файла по file_id, а если он недействителен - загрузкой с диска
+
+        Returns:
+            str: file_id отправленного документа
+        """
+        if file_id:
+            try:
+                await self.bot.send_document(
+                    chat_id, file_id, caption=caption, reply_markup=get_back_to_admin_keyboard()
+                )
+                return file_id
+            except TelegramBadRequest as e:
+                if not path or not os.path.exists(path):
+                    raise
+                logger.warning(f"file_id выгрузки недействителен, файл загружается заново: {e}")
+
+        message = await self.bot.send_document(
+            chat_id,
+            FSInputFile(path, filename=filename),
+            caption=caption,
+            reply_markup=get_back_to_admin_keyboard()
+        )
+        return message.document.file_id if message.document else None
+
+    async def _recover(self) -> None:
+        """Восстановление после перезапуска и повтор неудавшихся доставок"""
+        try:
+            async with async_session_maker() as session:
+                requeued = await ReportJobRepository(session).requeue_running()
+            if requeued:
+                logger.info(f"Возвращено в очередь прерванных отчетов: {requeued}")
+                self._wakeup.set()
+        except Exception as e:
+            logger.error(f"Ошибка восстановления очереди отчетов: {e}")
+
+        while True:
+            try:
+                async with async_session_maker() as session:
+                    job_ids = await ReportJobRepository(session).get_finished_undelivered_ids()
+                for job_id in job_ids:
+                    await self._deliver(job_id)
+            except Exception as e:
+                logger.error(f"Ошибка повторной доставки отчетов: {e}")
+            await asyncio.sleep(REDELIVER_INTERVAL)
+
+
+def _remove_file(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+report_job_queue = ReportJobQueue(workers=settings.REPORT_MAX_CONCURRENCY)
@@ -0,0 +1,189 @@
+"""
+Построение файлов отчетов в процессах ReportExecutor.
+
+Модуль не импортирует aiogram и базу данных: воркеры получают только
+простые значения (кортежи строк и пути к файлам), поэтому процесс
+запускается быстро, а данные передаются без ORM-объектов.
+"""
+import os
+import pickle
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.utils import get_column_letter
+
+# Как часто (в строках) воркер проверяет флаг отмены
+CANCEL_CHECK_EVERY = 5000
+
+
+class ReportCancelled(Exception):
+    """Построение отчета отменено"""
+
+
+def check_cancelled(cancel_path: Optional[str]) -> None:
+    """Отмена передается воркеру файлом-флагом (работает между процессами)"""
+    if cancel_path and os.path.exists(cancel_path):
+        raise ReportCancelled()
+
+
+def spool_batch(spool_file, rows: List[tuple]) -> None:
+    """Запись порции строк в промежуточный файл для воркера"""
+    pickle.dump(rows, spool_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def iter_spooled_batches(spool_path: str) -> Iterator[List[tuple]]:
+    """Чтение порций строк, записанных spool_batch"""
+    with open(spool_path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _header_cells(ws, headers: Sequence[str], color: str) -> List[WriteOnlyCell]:
+    cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        cells.append(cell)
+    return cells
+
+
+def write_spooled_rows_xlsx(
+    spool_path: str,
+    out_path: str,
+    headers: Sequence[str],
+    widths: Sequence[int],
+    sheet_title: str = "Товары",
+    value_column: Optional[int] = None,
+    weight_column: Optional[int] = None,
+    cancel_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    xlsx из строк промежуточного файла (openpyxl write_only, постоянная память)
+
+    Returns:
+        dict: row_count, total_value_usd, average_value_usd, average_weight_kg
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title)
+    stats_ws = wb.create_sheet("Статистика")
+    for i, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    ws.freeze_panes = "A2"
+    ws.append(_header_cells(ws, headers, "366092"))
+
+    row_count = 0
+    total_value = 0.0
+    value_count = 0
+    total_weight = 0.0
+    weight_count = 0
+
+    for batch in iter_spooled_batches(spool_path):
+        check_cancelled(cancel_path)
+        for row in batch:
+            ws.append(row)
+            row_count += 1
+            if value_column is not None and row[value_column] is not None:
+                total_value += row[value_column]
+                value_count += 1
+            if weight_column is not None and row[weight_column] is not None:
+                total_weight += row[weight_column]
+                weight_count += 1
+
+    average_value = total_value / value_count if value_count else 0.0
+    average_weight = total_weight / weight_count if weight_count else 0.0
+
+    stats_ws.column_dimensions["A"].width = 22
+    stats_ws.column_dimensions["B"].width = 18
+    stats_ws.append(_header_cells(stats_ws, ["Показатель", "Значение"], "366092"))
+    stats_ws.append(["Всего товаров", row_count])
+    stats_ws.append(["Средняя стоимость", round(average_value, 2)])
+    stats_ws.append(["Средний вес", round(average_weight, 2)])
+    stats_ws.append(["Общая стоимость", round(total_value, 2)])
+
+    check_cancelled(cancel_path)
+    wb.save(out_path)
+
+    return {
+        "row_count": row_count,
+        "total_value_usd": total_value,
+        "average_value_usd": average_value,
+        "average_weight_kg": average_weight,
+    }
+
+
+def write_styled_report(
+    out_path: str,
+    headers: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    column_widths: Sequence[int],
+    header_color: str = "366092",
+    center_columns: Sequence[int] = (),
+    bordered: bool = False,
+    total_label: Optional[str] = None,
+    cancel_path: Optional[str] = None
+) -> str:
+    """
+    Небольшой оформленный отчет (обычная книга openpyxl со стилями)
+
+    Returns:
+        str: путь к файлу
+    """
+    wb = Workbook()
+    ws = wb.active
+
+    ws.append(list(headers))
+
+    thin_border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+
+    # Стили заголовков
+    for col in range(1, len(headers) + 1):
+        cell = ws.cell(row=1, column=col)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color=header_color, end_color=header_color, fill_type="solid")
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        if bordered:
+            cell.border = thin_border
+
+    for i, row in enumerate(rows, 2):
+        if i % CANCEL_CHECK_EVERY == 0:
+            check_cancelled(cancel_path)
+        ws.append(list(row))
+        if bordered or center_columns:
+            for col in range(1, len(row) + 1):
+                cell = ws.cell(row=i, column=col)
+                if bordered:
+                    cell.border = thin_border
+                if col in center_columns:  # Центрируем числовые и даты
+                    cell.alignment = Alignment(horizontal="center", vertical="center")
+
+    # Настройка ширины колонок
+    for i, width in enumerate(column_widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+
+    # Итоговая строка
+    if total_label is not None:
+        total_row = len(rows) + 2
+        ws.cell(row=total_row, column=1, value=total_label)
+        ws.cell(row=total_row, column=2, value=len(rows))
+        ws.merge_cells(start_row=total_row, start_column=1, end_row=total_row, end_column=len(headers))
+
+        total_cell = ws.cell(row=total_row, column=1)
+        total_cell.font = Font(bold=True, color="FFFFFF")
+        total_cell.fill = PatternFill(start_color="FF6600", end_color="FF6600", fill_type="solid")
+        total_cell.alignment = Alignment(horizontal="center", vertical="center")
+
+    check_cancelled(cancel_path)
+    wb.save(out_path)
+    return out_path
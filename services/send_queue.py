@@ -0,0 +1,292 @@
+"""
+Ограничение частоты исходящих сообщений Telegram.
+
+Telegram допускает около 30 сообщений в секунду на бота и примерно одно
+сообщение в секунду в один чат; при превышении API отвечает 429
+(RetryAfter). SendScheduler подключается к сессии бота как
+request-middleware: каждый запрос отправки или редактирования ждет
+токены в корзине чата и в общей корзине, а на RetryAfter повторяется
+после указанной паузы.
+
+Для рассылок без ожидания результата есть notify(): сообщения ставятся
+в очередь чата, и идущие подряд тексты одному чату склеиваются в одно
+сообщение, пока оно помещается в лимит длины.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+
+from config import settings
+from utils.helpers import TELEGRAM_MESSAGE_LIMIT, telegram_length
+
+logger = logging.getLogger(__name__)
+
+ChatId = Union[int, str]
+
+# Методы, на которые распространяются лимиты Telegram
+_LIMITED_METHOD_PREFIXES = ("Send", "Edit", "Copy", "Forward")
+
+# Корзины чатов, не использовавшиеся дольше этого времени, удаляются
+_IDLE_BUCKET_TTL = 60.0
+_PRUNE_EVERY = 1000
+
+# Сколько последних задержек отправки учитывается в среднем
+_LATENCY_WINDOW = 1000
+
+# Разделитель склеенных текстов
+_MERGE_SEPARATOR = "\n\n"
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не более capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.last_used = self.updated  # последняя выдача токена или пауза
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        """Ожидание токена (ожидающие обслуживаются по очереди)"""
+        async with self._lock:
+            self._refill()
+            # Цикл: пока ждали, корзину могли приостановить (pause)
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+            self.last_used = time.monotonic()
+
+    def pause(self, seconds: float) -> None:
+        """Запрет отправки на seconds секунд (после RetryAfter)"""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+        self.last_used = time.monotonic()
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return not self._lock.locked() and self.tokens >= self.capacity
+
+
+@dataclass
+class _Outgoing:
+    """Текст в очереди notify()"""
+    text: str
+    parse_mode: Optional[str]
+    reply_markup: Any
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """Планировщик исходящих запросов бота с лимитами частоты"""
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        max_retries: int = 3
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.bot: Optional[Bot] = None
+
+        self._chat_buckets: Dict[ChatId, TokenBucket] = {}
+        self._buckets_created = 0
+        self._outbox: Dict[ChatId, Deque[_Outgoing]] = {}
+        self._drainers: Dict[ChatId, asyncio.Task] = {}
+
+        # Метрики
+        self.waiting = 0
+        self.max_waiting = 0
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self.merged = 0
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._latency_max = 0.0
+
+    def set_global_rate(self, rate: float) -> None:
+        """Общий лимит процесса (при нескольких процессах лимит бота делится между ними)"""
+        self.global_bucket = TokenBucket(rate, max(rate, 1))
+
+    def install(self, bot: Bot) -> None:
+        """Подключение к сессии бота (все запросы отправки идут через лимиты)"""
+        self.bot = bot
+        bot.session.middleware(self)
+
+    # ---- request-middleware ----
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not type(method).__name__.startswith(_LIMITED_METHOD_PREFIXES):
+            return await make_request(bot, method)
+
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            await self._acquire(chat_id)
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                self.retries += 1
+                self._chat_bucket(chat_id).pause(e.retry_after)
+                if attempt > self.max_retries:
+                    self.failed += 1
+                    raise
+                logger.warning(
+                    f"Лимит Telegram для чата {chat_id}: повтор {type(method).__name__} "
+                    f"через {e.retry_after} с (попытка {attempt})"
+                )
+                continue
+            self._record_latency(time.monotonic() - started)
+            return result
+
+    def _chat_bucket(self, chat_id: ChatId) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            self._buckets_created += 1
+            if self._buckets_created % _PRUNE_EVERY == 0:
+                self._prune_buckets()
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune_buckets(self) -> None:
+        """Удаление корзин чатов, которые давно ничего не отправляли"""
+        now = time.monotonic()
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            # updated сдвигает сам idle (пополнение), поэтому - last_used
+            if now - bucket.last_used > _IDLE_BUCKET_TTL and bucket.idle:
+                del self._chat_buckets[chat_id]
+
+    async def _acquire(self, chat_id: ChatId) -> None:
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            # Сначала корзина чата: медленный чат не держит общие токены
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+        finally:
+            self.waiting -= 1
+
+    def _record_latency(self, seconds: float) -> None:
+        self.sent += 1
+        self._latencies.append(seconds)
+        self._latency_max = max(self._latency_max, seconds)
+
+    # ---- очередь рассылок ----
+
+    def notify(
+        self,
+        chat_id: ChatId,
+        text: str,
+        parse_mode: Optional[str] = "HTML",
+        reply_markup: Any = None
+    ) -> None:
+        """
+        Отправка текста без ожидания результата
+
+        Если в очереди чата уже ждет текст без клавиатуры с тем же
+        parse_mode, новый текст дописывается к нему.
+        """
+        if self.bot is None:
+            raise RuntimeError("SendScheduler не подключен к боту (install)")
+
+        outbox = self._outbox.setdefault(chat_id, deque())
+        if outbox and self._merge(outbox[-1], text, parse_mode, reply_markup):
+            self.merged += 1
+        else:
+            outbox.append(_Outgoing(text, parse_mode, reply_markup))
+
+        drainer = self._drainers.get(chat_id)
+        if drainer is None or drainer.done():
+            self._drainers[chat_id] = asyncio.create_task(self._drain(chat_id))
+
+    @staticmethod
+    def _merge(last: _Outgoing, text: str, parse_mode: Optional[str], reply_markup: Any) -> bool:
+        if last.reply_markup is not None or last.parse_mode != parse_mode:
+            return False
+        merged = f"{last.text}{_MERGE_SEPARATOR}{text}"
+        if telegram_length(merged) > TELEGRAM_MESSAGE_LIMIT:
+            return False
+        last.text = merged
+        last.reply_markup = reply_markup
+        return True
+
+    async def _drain(self, chat_id: ChatId) -> None:
+        outbox = self._outbox[chat_id]
+        try:
+            while outbox:
+                item = outbox.popleft()
+                try:
+                    await self.bot.send_message(
+                        chat_id,
+                        item.text,
+                        parse_mode=item.parse_mode,
+                        reply_markup=item.reply_markup
+                    )
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning(f"Сообщение в чат {chat_id} не отправлено: {e}")
+        finally:
+            if not outbox:
+                self._outbox.pop(chat_id, None)
+            self._drainers.pop(chat_id, None)
+
+    @property
+    def queued(self) -> int:
+        """Тексты в очереди notify(), еще не переданные на отправку"""
+        return sum(len(outbox) for outbox in self._outbox.values())
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Досылка очереди notify() (не дольше timeout секунд)"""
+        drainers = [task for task in self._drainers.values() if not task.done()]
+        if not drainers:
+            return
+        done, pending = await asyncio.wait(drainers, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"Не досланы сообщения в {len(pending)} чатов")
+
+    def stats(self) -> Dict[str, float]:
+        latencies = self._latencies
+        return {
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "queued": self.queued,
+            "chats": len(self._chat_buckets),
+            "sent": self.sent,
+            "merged": self.merged,
+            "retries": self.retries,
+            "failed": self.failed,
+            "latency_avg_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            "latency_max_ms": self._latency_max * 1000,
+        }
+
+
+send_scheduler = SendScheduler(
+    global_rate=settings.SEND_GLOBAL_RATE,
+    chat_rate=settings.SEND_CHAT_RATE,
+    chat_burst=settings.SEND_CHAT_BURST,
+    max_retries=settings.SEND_MAX_RETRIES
+)
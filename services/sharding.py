@@ -0,0 +1,210 @@
+"""
+Обработка обновлений в нескольких процессах.
+
+Принимающий процесс (polling или вебхук) не выполняет обработчики: он
+определяет пользователя обновления и передает обновление в процесс
+user_id % N. Каждый процесс-обработчик запускает те же роутеры с общими
+базой и хранилищем FSM (sqlite-файл или redis, не memory).
+
+Порядок обновлений одного пользователя сохраняется: все они попадают в
+один процесс, а внутри процесса выстраиваются в цепочку; обновления
+разных пользователей обрабатываются параллельно. Кэш пользователей
+каждого процесса согласован, так как пользователь всегда обрабатывается
+в одном процессе.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue as queue_module
+import signal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Фабрика процесса-обработчика: (номер, число процессов) -> (бот, диспетчер).
+# Должна быть функцией уровня модуля (передается в процесс через pickle).
+WorkerFactory = Callable[[int, int], Tuple[Bot, Dispatcher]]
+
+# Сколько обновлений процесс обрабатывает одновременно
+WORKER_CONCURRENCY = 100
+
+
+def update_user_id(data: Dict[str, Any]) -> int:
+    """
+    Ключ шардирования обновления: id пользователя, иначе id чата,
+    иначе update_id (такие обновления не связаны с диалогом)
+    """
+    for key, event in data.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        user = event.get("from") or event.get("user")
+        if isinstance(user, dict) and "id" in user:
+            return user["id"]
+        chat = event.get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+    return data.get("update_id", 0)
+
+
+def shard_for(user_id: int, workers: int) -> int:
+    return abs(user_id) % workers
+
+
+async def _worker_loop(index: int, updates: multiprocessing.Queue, factory: WorkerFactory, workers: int) -> Dict[str, int]:
+    bot, dp = factory(index, workers)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(WORKER_CONCURRENCY)
+    # Последняя задача каждого пользователя: следующая ждет ее завершения
+    chains: Dict[int, asyncio.Task] = {}
+    stats = {"worker": index, "processed": 0, "errors": 0}
+
+    async def handle(key: int, previous: Optional[asyncio.Task], raw: str) -> None:
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            update = Update.model_validate(json.loads(raw), context={"bot": bot})
+            await dp.feed_update(bot, update)
+            stats["processed"] += 1
+        except Exception as e:
+            stats["errors"] += 1
+            logger.error(f"Обработчик {index}: ошибка обработки обновления: {e}", exc_info=True)
+        finally:
+            semaphore.release()
+            if chains.get(key) is asyncio.current_task():
+                del chains[key]
+
+    await dp.emit_startup(bot=bot)
+    logger.info(f"Обработчик обновлений {index} запущен")
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, updates.get)
+            if raw is None:
+                break
+            await semaphore.acquire()
+            key = update_user_id(json.loads(raw))
+            chains[key] = asyncio.create_task(handle(key, chains.get(key), raw))
+        if chains:
+            await asyncio.wait(list(chains.values()))
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+        logger.info(f"Обработчик обновлений {index} остановлен: {stats}")
+    return stats
+
+
+def run_worker(
+    index: int,
+    updates: multiprocessing.Queue,
+    factory: WorkerFactory,
+    workers: int,
+    results: Optional[multiprocessing.Queue] = None
+) -> None:
+    """Точка входа процесса-обработчика"""
+    # Ctrl+C получает вся группа процессов: останавливает обработчиков
+    # принимающий процесс (через очередь), чтобы они доделали начатое
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - worker{index} - %(name)s - %(levelname)s - %(message)s'
+    )
+    stats = asyncio.run(_worker_loop(index, updates, factory, workers))
+    if results is not None:
+        results.put(stats)
+
+
+class ShardPool:
+    """Процессы-обработчики и распределение обновлений между ними"""
+
+    def __init__(self, workers: int, factory: WorkerFactory, queue_size: int = 10000, collect_stats: bool = False):
+        self.workers = workers
+        self.factory = factory
+        self.queue_size = queue_size
+        self._context = multiprocessing.get_context("spawn")
+        self._queues: List[multiprocessing.Queue] = []
+        self._processes: List[multiprocessing.Process] = []
+        self.results: Optional[multiprocessing.Queue] = self._context.Queue() if collect_stats else None
+        self.dispatched = 0
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=run_worker,
+            args=(index, self._queues[index], self.factory, self.workers, self.results),
+            name=f"bot-worker-{index}"
+        )
+        process.start()
+        return process
+
+    def start(self) -> None:
+        self._queues = [self._context.Queue(self.queue_size) for _ in range(self.workers)]
+        self._processes = [self._spawn(i) for i in range(self.workers)]
+        logger.info(f"Запущено процессов-обработчиков: {self.workers}")
+
+    async def dispatch(self, data: Dict[str, Any]) -> int:
+        """
+        Передача обновления (JSON-объект Telegram) обработчику его пользователя
+
+        Вызывается в порядке получения обновлений. Если очередь обработчика
+        заполнена, вызов ждет в потоке (цикл событий не блокируется) - это
+        сдерживает прием обновлений.
+
+        Returns:
+            int: номер процесса-обработчика
+        """
+        index = shard_for(update_user_id(data), self.workers)
+        if not self._processes[index].is_alive():
+            # Упавший обработчик перезапускается с той же очередью
+            logger.error(f"Обработчик {index} завершился (код {self._processes[index].exitcode}), перезапуск")
+            self._processes[index] = self._spawn(index)
+        updates = self._queues[index]
+        raw = json.dumps(data, ensure_ascii=False)
+        try:
+            updates.put_nowait(raw)
+        except queue_module.Full:
+            await asyncio.get_running_loop().run_in_executor(None, updates.put, raw)
+        self.dispatched += 1
+        return index
+
+    def queue_sizes(self) -> List[int]:
+        sizes = []
+        for updates in self._queues:
+            try:
+                sizes.append(updates.qsize())
+            except NotImplementedError:  # macOS
+                sizes.append(-1)
+        return sizes
+
+    def stop(self, timeout: float = 30) -> None:
+        """Остановка: обработчики доделывают полученные обновления и завершаются"""
+        for updates in self._queues:
+            try:
+                updates.put(None, timeout=timeout)
+            except queue_module.Full:
+                pass
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"Обработчик {process.name} не завершился за {timeout} с, остановка")
+                process.terminate()
+        self._processes = []
+        self._queues = []
+
+
+async def poll_into(bot: Bot, pool: ShardPool, allowed_updates: Optional[List[str]] = None, timeout: int = 30) -> None:
+    """Прием обновлений long polling и передача их обработчикам"""
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=timeout, allowed_updates=allowed_updates)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Ошибка получения обновлений: {e}")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            await pool.dispatch(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+            offset = update.update_id + 1
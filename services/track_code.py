@@ -1,71 +1,256 @@
-import random
-import string
+"""
+Выдача трек-кодов.
+
+Трек-код - префикс, порядковый номер в base36 и контрольный символ
+(алгоритм Луна по модулю 36), например CB000000010. Номера берутся из
+счетчика в базе (таблица counters) блоками: одна транзакция
+резервирует сразу TRACK_CODE_BLOCK_SIZE номеров, дальше коды выдаются
+из памяти. Номера не повторяются, поэтому коды не совпадают ни между
+собой, ни между процессами; неиспользованный остаток блока после
+перезапуска просто пропускается.
+
+Старые коды (18 символов) длиннее новых и с ними не пересекаются.
+
+Введенные пользователем коды сначала нормализуются (регистр, пробелы,
+кириллические буквы, похожие на латинские) и проверяются без обращения
+к базе: контрольный символ новых кодов, структура старых, допустимые
+символы и длина для кодов перевозчиков.
+"""
+import asyncio
+import html
+import logging
+import re
+import unicodedata
 from datetime import datetime
-from typing import Dict, List
-
-class TrackCodeGenerator:
-    """Генератор понятных трек-кодов"""
-    
-    @staticmethod
-    def generate_track_code(user_id: int, product_type: str = "GEN") -> str:
-        """
-        Генерация понятного трек-кода:
-        Формат: TTYYMMDDUSERID{продукт}{случайная часть}
-        
-        TT - тип товара (CN-Китай, US-США, EU-Европа, GEN-общий)
-        YYMMDD - дата (год/месяц/день)
-        USERID - последние 4 цифры ID пользователя
-        продукт - 2 буквы типа продукта
-        случайная часть - 4 случайные буквы
-        """
-        
-        # Типы товаров и их коды
-        product_codes = {
-            "electronics": "EL",
-            "clothing": "CL",
-            "shoes": "SH",
-            "home": "HM",
-            "beauty": "BT",
-            "toys": "TY",
-            "auto": "AU",
-            "sports": "SP",
-            "other": "OT"
-        }
-        
-        # Текущая дата
-        now = datetime.now()
-        date_part = now.strftime("%y%m%d")
-        
-        # ID пользователя (последние 4 цифры)
-        user_part = str(user_id)[-4:].zfill(4)
-        
-        # Код типа товара
-        product_code = product_codes.get(product_type.lower(), "GN")
-        
-        # Случайная часть (4 буквы)
-        random_part = ''.join(random.choices(string.ascii_uppercase, k=4))
-        
-        return f"{product_type.upper()[:2]}{date_part}{user_part}{product_code}{random_part}"
-
-    @staticmethod
-    def decode_track_code(track_code: str) -> Dict[str, str]:
-        """Декодирование трек-кода для понимания его структуры"""
-        if len(track_code) < 18:
-            return {}
-        
-        return {
-            "product_type": track_code[:2],
-            "date": f"20{track_code[2:4]}-{track_code[4:6]}-{track_code[6:8]}",
-            "user_id_suffix": track_code[8:12],
-            "category": track_code[12:14],
-            "random": track_code[14:18]
-        }
-    
-    @staticmethod
-    def generate_bulk_codes(count: int, user_id: int) -> List[str]:
-        """Генерация нескольких уникальных трек-кодов"""
-        codes = set()
-        while len(codes) < count:
-            code = TrackCodeGenerator.generate_track_code(user_id)
-            codes.add(code)
-        return list(codes)
\ No newline at end of file
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from database.repository import CounterRepository
+from database.session import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_BASE = len(ALPHABET)
+_VALUES = {ch: i for i, ch in enumerate(ALPHABET)}
+
+# Длина номера в коде (36^8 ≈ 2.8 трлн номеров; дальше код удлиняется)
+SEQUENCE_WIDTH = 8
+
+# Имя счетчика в таблице counters
+COUNTER_NAME = "track_code"
+
+# Допустимая длина кода (коды перевозчиков вводятся клиентами вручную)
+MIN_TRACK_CODE_LENGTH = 8
+MAX_TRACK_CODE_LENGTH = 50  # Product.track_code
+
+# Кириллические буквы, совпадающие по начертанию с латинскими (после upper())
+_HOMOGLYPHS = str.maketrans({
+    "А": "A", "В": "B", "С": "C", "Е": "E", "Ё": "E", "Н": "H", "І": "I", "Ј": "J",
+    "К": "K", "Қ": "K", "М": "M", "О": "O", "Р": "P", "Ѕ": "S", "Т": "T",
+    "Х": "X", "Ҳ": "X", "У": "Y", "Ү": "Y",
+})
+# Разделители внутри одного кода ("CB 0000 0010", "CB-000000010")
+_CODE_SEPARATORS = re.compile(r"[\s\-_.]+")
+# Разделители кодов в списке
+_LIST_SEPARATORS = re.compile(r"[,;\n]+")
+# Старый формат: тип, ГГММДД, 4 цифры пользователя, категория, 4 случайные буквы
+_LEGACY_CODE = re.compile(r"^[A-Z]{2}\d{10}[A-Z]{6}$")
+
+# Причины отказа (ключи INVALID_TRACK_CODE_TEXTS)
+INVALID_EMPTY = "empty"
+INVALID_CHARS = "chars"
+INVALID_LENGTH = "length"
+INVALID_CHECK = "check"
+INVALID_LEGACY = "legacy"
+
+INVALID_TRACK_CODE_TEXTS = {
+    INVALID_EMPTY: {"ru": "пустой трек-код", "tj": "рамзи холӣ"},
+    INVALID_CHARS: {"ru": "допустимы только латинские буквы и цифры",
+                    "tj": "танҳо ҳарфҳои лотинӣ ва рақамҳо иҷозат аст"},
+    INVALID_LENGTH: {"ru": f"длина от {MIN_TRACK_CODE_LENGTH} до {MAX_TRACK_CODE_LENGTH} символов",
+                     "tj": f"дарозӣ аз {MIN_TRACK_CODE_LENGTH} то {MAX_TRACK_CODE_LENGTH} аломат"},
+    INVALID_CHECK: {"ru": "опечатка: не сходится контрольный символ",
+                    "tj": "хатогӣ: аломати назоратӣ мувофиқ нест"},
+    INVALID_LEGACY: {"ru": "опечатка: неверная дата в трек-коде",
+                     "tj": "хатогӣ: санаи нодуруст дар рамз"},
+}
+
+
+def check_char(body: str) -> str:
+    """Контрольный символ Луна по модулю 36 для строки из ALPHABET"""
+    total = 0
+    factor = 2
+    for ch in reversed(body):
+        addend = factor * _VALUES[ch]
+        total += addend // _BASE + addend % _BASE
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[(_BASE - total % _BASE) % _BASE]
+
+
+def is_valid(code: str) -> bool:
+    """Проверка контрольного символа (ловит замену любого одного символа и почти все перестановки соседних)"""
+    code = code.strip().upper()
+    if len(code) < 2 or any(ch not in _VALUES for ch in code):
+        return False
+    return check_char(code[:-1]) == code[-1]
+
+
+def to_base36(number: int, width: int = SEQUENCE_WIDTH) -> str:
+    digits = []
+    while number:
+        number, digit = divmod(number, _BASE)
+        digits.append(ALPHABET[digit])
+    return "".join(reversed(digits)).rjust(width, "0")
+
+
+def encode(sequence: int, prefix: str) -> str:
+    """Трек-код для порядкового номера"""
+    body = prefix + to_base36(sequence)
+    return body + check_char(body)
+
+
+def decode(code: str, prefix: str) -> Optional[int]:
+    """Порядковый номер трек-кода (None, если код не выдан этим генератором)"""
+    code = code.strip().upper()
+    if not code.startswith(prefix) or len(code) < len(prefix) + SEQUENCE_WIDTH + 1 or not is_valid(code):
+        return None
+    return int(code[len(prefix):-1], _BASE)
+
+
+def decode_track_code(code: str) -> Dict[str, str]:
+    """Разбор трек-кода старого формата (пустой словарь для других кодов)"""
+    if not _LEGACY_CODE.match(code):
+        return {}
+    return {
+        "product_type": code[:2],
+        "date": f"20{code[2:4]}-{code[4:6]}-{code[6:8]}",
+        "user_id_suffix": code[8:12],
+        "category": code[12:14],
+        "random": code[14:18]
+    }
+
+
+def normalize_track_code(raw: str) -> str:
+    """Приведение введенного кода к виду, в котором коды хранятся в базе"""
+    code = unicodedata.normalize("NFKC", raw).upper().translate(_HOMOGLYPHS)
+    return _CODE_SEPARATORS.sub("", code)
+
+
+def validate_track_code(raw: str, prefix: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """
+    Нормализация и проверка трек-кода без обращения к базе
+
+    Returns:
+        tuple: (нормализованный код, причина отказа или None)
+    """
+    code = normalize_track_code(raw)
+    if not code:
+        return code, INVALID_EMPTY
+    if any(ch not in _VALUES for ch in code):
+        return code, INVALID_CHARS
+    if not MIN_TRACK_CODE_LENGTH <= len(code) <= MAX_TRACK_CODE_LENGTH:
+        return code, INVALID_LENGTH
+
+    prefix = prefix or track_code_allocator.prefix
+    if code.startswith(prefix) and len(code) == len(prefix) + SEQUENCE_WIDTH + 1:
+        if not is_valid(code):
+            return code, INVALID_CHECK
+        return code, None
+
+    legacy = decode_track_code(code)
+    if legacy:
+        try:
+            datetime.strptime(legacy["date"], "%Y-%m-%d")
+        except ValueError:
+            return code, INVALID_LEGACY
+    return code, None
+
+
+def parse_track_code_list(text: str) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """
+    Трек-коды из сообщения (через запятую, точку с запятой или с новой строки)
+
+    Returns:
+        tuple: (корректные коды без повторов, [(введенный код, причина отказа)])
+    """
+    codes = []
+    invalid = []
+    for raw in _LIST_SEPARATORS.split(text or ""):
+        raw = raw.strip()
+        if not raw:
+            continue
+        code, reason = validate_track_code(raw)
+        if reason:
+            invalid.append((raw, reason))
+        else:
+            codes.append(code)
+    return list(dict.fromkeys(codes)), invalid
+
+
+def invalid_track_code_text(raw: str, reason: str, language: str) -> str:
+    texts = INVALID_TRACK_CODE_TEXTS[reason]
+    return f"⚠️ <b>{html.escape(raw)}</b> - {texts.get(language, texts['ru'])}"
+
+
+class TrackCodeAllocator:
+    """Выдача трек-кодов из зарезервированных в базе блоков номеров"""
+
+    def __init__(self, prefix: str = "CB", block_size: int = 1000, counter: str = COUNTER_NAME):
+        prefix = prefix.upper()
+        if not prefix or any(ch not in _VALUES for ch in prefix):
+            raise ValueError(f"Префикс трек-кода должен состоять из латинских букв и цифр: {prefix!r}")
+        self.prefix = prefix
+        self.block_size = block_size
+        self.counter = counter
+        self._next = 0
+        self._end = 0  # номер после последнего в текущем блоке
+        self._lock = asyncio.Lock()
+
+    @property
+    def remaining(self) -> int:
+        """Номера, оставшиеся в текущем блоке"""
+        return self._end - self._next
+
+    async def _reserve(self, count: int) -> None:
+        async with async_session_maker() as session:
+            first = await CounterRepository(session).reserve(self.counter, count)
+        self._next, self._end = first, first + count
+        logger.info(f"Зарезервированы номера трек-кодов {first}..{first + count - 1}")
+
+    async def allocate_many(self, count: int) -> List[str]:
+        """count новых трек-кодов (не больше одного обращения к базе)"""
+        if count < 1:
+            raise ValueError("count должен быть больше нуля")
+        async with self._lock:
+            sequences = []
+            if count > self.remaining:
+                # Остаток текущего блока и новый блок, покрывающий недостачу
+                sequences.extend(range(self._next, self._end))
+                await self._reserve(max(self.block_size, count - len(sequences)))
+            take = count - len(sequences)
+            sequences.extend(range(self._next, self._next + take))
+            self._next += take
+        return [encode(sequence, self.prefix) for sequence in sequences]
+
+    async def allocate(self) -> str:
+        """Новый трек-код"""
+        return (await self.allocate_many(1))[0]
+
+    def is_own(self, code: str) -> bool:
+        """Код выдан этим генератором (префикс и контрольный символ верны)"""
+        return decode(code, self.prefix) is not None
+
+
+track_code_allocator = TrackCodeAllocator(
+    prefix=settings.TRACK_CODE_PREFIX,
+    block_size=settings.TRACK_CODE_BLOCK_SIZE
+)
+
+
+async def generate_track_code() -> str:
+    return await track_code_allocator.allocate()
+
+
+async def generate_track_codes(count: int) -> List[str]:
+    return await track_code_allocator.allocate_many(count)
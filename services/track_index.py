@@ -0,0 +1,201 @@
+"""
+Индекс существующих трек-кодов в памяти процесса.
+
+Клиенты чаще всего проверяют и регистрируют коды перевозчиков, которых
+в базе еще нет. Фильтр Блума по всем Product.track_code отвечает «кода
+точно нет» без запроса к базе; положительный ответ проверяется запросом
+как раньше.
+
+Фильтр строится при запуске диспетчера потоковым запросом, новые товары
+этого процесса добавляются сразу (add), товары других процессов
+(обработчики при BOT_WORKERS > 1, второй экземпляр вебхука, загрузка
+манифеста в другом процессе) - периодической дочиткой по id.
+
+Поэтому ответ «кода нет» может устареть: код, добавленный другим
+процессом, виден здесь только после следующей дочитки, то есть до
+TRACK_INDEX_REFRESH секунд. Если дочитка не удавалась дольше
+TRACK_INDEX_MAX_STALENESS секунд (база недоступна, зависла задача),
+отрицательным ответам фильтр не доверяет и все коды проверяются в базе,
+как и пока фильтр не построен.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import settings
+from database.repository import ProductRepository
+from database.session import async_session_maker
+from utils.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+# Дочитка перекрывает последние id: транзакции фиксируются не строго по порядку id
+REFRESH_ID_OVERLAP = 1000
+
+
+class TrackCodeIndex:
+    """Фильтр Блума по трек-кодам с фоновым обновлением"""
+
+    def __init__(
+        self,
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+        refresh_interval: float = 10,
+        max_staleness: float = 30,
+        enabled: bool = True
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.enabled = enabled
+        self.filter: Optional[BloomFilter] = None
+        self._last_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+        # Метрики
+        self.lookups = 0
+        self.positives = 0
+        self.negatives = 0
+        self.stale = 0
+        self.false_positives = 0
+        self.true_negatives = 0
+        self.build_seconds = 0.0
+        self.refreshed_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.filter is not None
+
+    @property
+    def fresh(self) -> bool:
+        """Последняя дочитка была не позже max_staleness секунд назад"""
+        return self.refreshed_at is not None and time.monotonic() - self.refreshed_at <= self.max_staleness
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _load(self, bloom: BloomFilter, after_id: int) -> int:
+        """Добавление в фильтр товаров с id > after_id; возвращает последний id"""
+        last_id = after_id
+        async with async_session_maker() as session:
+            async for rows in ProductRepository(session).stream_track_codes(after_id):
+                for product_id, track_code in rows:
+                    bloom.add(track_code)
+                last_id = max(last_id, rows[-1][0])
+        return last_id
+
+    async def _build(self) -> None:
+        started = time.monotonic()
+        async with async_session_maker() as session:
+            total = await ProductRepository(session).count_products()
+        # Запас на рост: фильтр перестраивается при заполнении
+        bloom = BloomFilter(max(self.capacity, total * 2), self.error_rate)
+        last_id = await self._load(bloom, 0)
+        self.filter, self._last_id = bloom, last_id
+        # Товары, добавленные во время построения (add шли в старый фильтр)
+        await self._refresh()
+        self.build_seconds = time.monotonic() - started
+        logger.info(
+            f"Индекс трек-кодов построен: {bloom.count} кодов, "
+            f"{bloom.memory_bytes / 1024:.0f} KB, {self.build_seconds:.1f} с"
+        )
+
+    async def _refresh(self) -> None:
+        self._last_id = await self._load(self.filter, max(0, self._last_id - REFRESH_ID_OVERLAP))
+        self.refreshed_at = time.monotonic()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self.filter is None or self.filter.count > self.filter.capacity:
+                    await self._build()
+                else:
+                    await self._refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Ошибка обновления индекса трек-кодов: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def add(self, track_code: str) -> None:
+        """Новый товар этого процесса (вызывается после фиксации вставки)"""
+        if self.filter is not None:
+            self.filter.add(track_code)
+
+    def might_exist(self, track_code: str) -> bool:
+        """False - кода точно нет в базе; True - нужно проверить запросом"""
+        self.lookups += 1
+        if self.filter is None:
+            return True
+        if track_code in self.filter:
+            self.positives += 1
+            return True
+        if not self.fresh:
+            # Коды других процессов могли не попасть в фильтр
+            self.stale += 1
+            return True
+        self.negatives += 1
+        self.true_negatives += 1
+        return False
+
+    def split(self, track_codes: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """(коды для проверки в базе, коды, которых точно нет)"""
+        maybe, missing = [], []
+        for track_code in track_codes:
+            (maybe if self.might_exist(track_code) else missing).append(track_code)
+        return maybe, missing
+
+    def record_not_found(self, track_codes: Iterable[str]) -> None:
+        """
+        Коды, проверенные в базе и не найденные
+
+        Ложное срабатывание - только код, который фильтр счел существующим;
+        коды, проверенные из-за устаревшего или еще не построенного фильтра,
+        в эту долю не входят.
+        """
+        if self.filter is None:
+            return
+        for track_code in track_codes:
+            if track_code in self.filter:
+                self.false_positives += 1
+            else:
+                self.true_negatives += 1
+
+    def stats(self) -> Dict[str, float]:
+        bloom = self.filter.stats() if self.filter is not None else {}
+        checked_absent = self.false_positives + self.true_negatives
+        return {
+            "ready": self.ready,
+            "items": bloom.get("items", 0),
+            "capacity": bloom.get("capacity", 0),
+            "memory_kb": bloom.get("memory_bytes", 0) / 1024,
+            "error_rate_expected": bloom.get("error_rate", 0.0),
+            # Доля ложных срабатываний среди отсутствующих в базе кодов
+            "error_rate_observed": self.false_positives / checked_absent if checked_absent else 0.0,
+            "lookups": self.lookups,
+            "positives": self.positives,
+            "negatives": self.negatives,
+            "stale": self.stale,
+            "false_positives": self.false_positives,
+            "true_negatives": self.true_negatives,
+            "build_seconds": self.build_seconds,
+            "refresh_age": time.monotonic() - self.refreshed_at if self.refreshed_at else None,
+        }
+
+
+track_code_index = TrackCodeIndex(
+    capacity=settings.TRACK_INDEX_CAPACITY,
+    error_rate=settings.TRACK_INDEX_ERROR_RATE,
+    refresh_interval=settings.TRACK_INDEX_REFRESH,
+    max_staleness=settings.TRACK_INDEX_MAX_STALENESS,
+    enabled=settings.TRACK_INDEX_ENABLED
+)
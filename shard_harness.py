@@ -0,0 +1,104 @@
+"""
+Локальная проверка шардирования обновлений (services/sharding.py).
+
+Генерирует поток поддельных сообщений от нескольких пользователей и
+передает их процессам-обработчикам через ShardPool - так же, как это
+делает бот при BOT_WORKERS > 1, но без Telegram и базы. Обработчик
+имитирует ввод-вывод и нагрузку на процессор и проверяет, что сообщения
+каждого пользователя пришли по порядку.
+
+    python shard_harness.py --workers 4 --users 200 --updates 20000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+
+from services.sharding import ShardPool
+
+# Имитация работы обработчика: ожидание ввода-вывода (с) и циклы процессора
+HANDLER_IO = 0.005
+HANDLER_CPU = 20000
+
+_last_seq: Dict[int, int] = {}
+
+
+async def on_message(message: Message):
+    user_id = message.from_user.id
+    seq = int(message.text.split()[1])
+
+    await asyncio.sleep(random.uniform(0, HANDLER_IO))
+    total = 0
+    for i in range(HANDLER_CPU):
+        total += i * i
+
+    expected = _last_seq.get(user_id, -1) + 1
+    if seq != expected:
+        raise RuntimeError(f"Нарушен порядок: пользователь {user_id}, сообщение {seq} вместо {expected}")
+    _last_seq[user_id] = seq
+
+
+def harness_worker(index: int, workers: int) -> Tuple[Bot, Dispatcher]:
+    """Фабрика обработчика: бот без обращений к API и один обработчик сообщений"""
+    router = Router()
+    router.message.register(on_message)
+    dp = Dispatcher()
+    dp.include_router(router)
+    return Bot(token="123456:HARNESS"), dp
+
+
+def fake_update(update_id: int, user_id: int, seq: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(datetime.now().timestamp()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": f"seq {seq}",
+        },
+    }
+
+
+def run(workers: int, users: int, updates: int) -> None:
+    pool = ShardPool(workers, harness_worker, collect_stats=True)
+    pool.start()
+
+    async def feed() -> None:
+        seqs: Dict[int, int] = {}
+        for update_id in range(updates):
+            user_id = 1000 + random.randrange(users)
+            seq = seqs.get(user_id, 0)
+            seqs[user_id] = seq + 1
+            await pool.dispatch(fake_update(update_id, user_id, seq))
+
+    started = time.monotonic()
+    asyncio.run(feed())
+    pool.stop(timeout=600)
+    elapsed = time.monotonic() - started
+
+    stats = [pool.results.get() for _ in range(workers)]
+    processed = sum(s["processed"] for s in stats)
+    errors = sum(s["errors"] for s in stats)
+    for s in sorted(stats, key=lambda s: s["worker"]):
+        print(f"  обработчик {s['worker']}: {s['processed']} обновлений, ошибок {s['errors']}")
+    print(f"Обработчиков: {workers}, обновлений: {processed}/{updates}, "
+          f"ошибок порядка: {errors}, время: {elapsed:.1f} с, {processed / elapsed:.0f} обновлений/с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка шардирования обновлений")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.workers, args.users, args.updates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Фильтр Блума: множество строк с ложноположительными ответами, но без ложноотрицательных
+"""
+import hashlib
+import math
+from typing import Dict
+
+
+class BloomFilter:
+    """
+    Фильтр Блума на bytearray
+
+    Размер подбирается под capacity элементов с долей ложных
+    срабатываний error_rate; при переполнении доля растет.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.bits_set = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> bool:
+        """Добавление; False, если ключ (вероятно) уже был"""
+        added = False
+        bits = self._bits
+        for position in self._positions(key):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                self.bits_set += 1
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    @property
+    def expected_error_rate(self) -> float:
+        """Текущая вероятность ложного срабатывания (по заполненности)"""
+        return (self.bits_set / self.size) ** self.hashes
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "items": self.count,
+            "capacity": self.capacity,
+            "hashes": self.hashes,
+            "memory_bytes": self.memory_bytes,
+            "fill": self.bits_set / self.size,
+            "error_rate": self.expected_error_rate,
+        }
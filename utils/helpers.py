@@ -1,5 +1,5 @@
 import re
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime, timedelta
 
 def parse_phone_number(phone: str) -> Optional[str]:
@@ -86,6 +86,26 @@ def calculate_delivery_date(send_date: datetime,
     """
     return send_date + timedelta(days=delivery_days)
 
+def add_months(year: int, month: int, delta: int) -> Tuple[int, int]:
+    """
+    Сдвиг месяца на delta месяцев (delta может быть отрицательным)
+    
+    Returns:
+        Tuple[int, int]: (год, месяц)
+    """
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+def month_range(year: int, month: int) -> Tuple[datetime, datetime]:
+    """
+    Полуоткрытый интервал месяца [начало месяца, начало следующего месяца)
+    
+    Returns:
+        Tuple[datetime, datetime]: (начало, конец)
+    """
+    next_year, next_month = add_months(year, month, 1)
+    return datetime(year, month, 1), datetime(next_year, next_month, 1)
+
 def split_list(input_list: List, chunk_size: int) -> List[List]:
     """
     Разделение списка на части
@@ -99,6 +119,95 @@ def split_list(input_list: List, chunk_size: int) -> List[List]:
     """
     return [input_list[i:i + chunk_size] for i in range(0, len(input_list), chunk_size)]
 
+def get_status_text(status: str, language: str = "ru") -> str:
+    """Получение текста статуса на нужном языке"""
+    status_texts = {
+        "ru": {
+            "created": "Создан",
+            "china_warehouse": "На складе в Китае",
+            "in_transit": "В пути",
+            "tajikistan_warehouse": "На складе в Таджикистане",
+            "delivered": "Доставлен",
+            "completed": "Завершен"
+        },
+        "tj": {
+            "created": "Сохта шудааст",
+            "china_warehouse": "Дар анбори Чин",
+            "in_transit": "Дар роҳ",
+            "tajikistan_warehouse": "Дар анбори Тоҷикистон",
+            "delivered": "Расонида шуд",
+            "completed": "Анҷом ёфт"
+        }
+    }
+    
+    return status_texts.get(language, status_texts["ru"]).get(status, status)
+
+# Максимальная длина текста сообщения Telegram (в единицах UTF-16)
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+def telegram_length(text: str) -> int:
+    """Длина текста так, как ее считает Telegram (эмодзи - две единицы)"""
+    return len(text.encode("utf-16-le")) // 2
+
+def _split_oversized(block: str, limit: int) -> List[str]:
+    """Разбиение блока длиннее лимита по строкам (длинные строки - по символам)"""
+    parts = []
+    current = ""
+    for line in block.split("\n"):
+        while telegram_length(line) > limit:
+            cut = limit
+            while telegram_length(line[:cut]) > limit:
+                cut -= 1
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:cut])
+            line = line[cut:]
+        candidate = f"{current}\n{line}" if current else line
+        if telegram_length(candidate) > limit:
+            parts.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+def pack_messages(
+    blocks: List[str],
+    header: str = "",
+    separator: str = "\n\n",
+    limit: int = TELEGRAM_MESSAGE_LIMIT
+) -> List[str]:
+    """
+    Упаковка блоков текста в минимальное число сообщений
+    
+    Блоки не разрываются между сообщениями (кроме блока длиннее лимита).
+    
+    Args:
+        blocks: Блоки текста в порядке вывода
+        header: Заголовок первого сообщения
+        separator: Разделитель блоков
+        limit: Максимальная длина сообщения
+        
+    Returns:
+        List[str]: Тексты сообщений
+    """
+    messages = []
+    current = header
+    for block in blocks:
+        for part in ([block] if telegram_length(block) <= limit else _split_oversized(block, limit)):
+            candidate = f"{current}{separator}{part}" if current else part
+            if telegram_length(candidate) <= limit:
+                current = candidate
+            else:
+                if current:
+                    messages.append(current)
+                current = part
+    if current:
+        messages.append(current)
+    return messages
+
 def escape_markdown(text: str) -> str:
     """
     Экранирование символов Markdown
@@ -0,0 +1,39 @@
+"""
+Middleware для бота
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from database.session import get_db
+from database.repository import UserRepository
+
+logger = logging.getLogger(__name__)
+
+
+class UserMiddleware(BaseMiddleware):
+    """
+    Загружает пользователя один раз на апдейт и передает его в обработчики
+    через параметр `user` (None, если пользователь еще не зарегистрирован)
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        from_user = data.get("event_from_user")
+        data["user"] = None
+
+        if from_user is not None:
+            try:
+                async for session in get_db():
+                    user_repo = UserRepository(session)
+                    data["user"] = await user_repo.get_cached_user(from_user.id)
+            except Exception as e:
+                logger.error(f"Ошибка загрузки пользователя {from_user.id}: {e}")
+
+        return await handler(event, data)
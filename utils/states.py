@@ -7,6 +7,8 @@ class AdminStates(StatesGroup):
     WAITING_ARRIVAL_DATE = State()
     WAITING_DATE_FOR_BULK_UPDATE = State()
     WAITING_BULK_STATUS = State()
+    WAITING_BULK_TRACK_CODES = State()
+    WAITING_SEARCH_QUERY = State()
     WAITING_PRODUCT_DETAILS = State()
 class LanguageState(StatesGroup):
     choosing_language = State()